@@ -0,0 +1,92 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+# Compound het screen time for one gene with many candidates. Screening every
+# pair, as the screen used to, is only timed up to 1,000 candidates.
+#
+# PYTHONPATH=src:. python3 benchmarks/bench_compound_hets.py
+
+import logging
+import random
+import timeit
+
+from family.families import Person, Family
+from filtering.compound_hets import CompoundHetScreen
+from variants.snv import SNV
+from tests.test_utils import screen_each_pair
+
+TRIOGENOTYPES = ['100', '110', '101', '111', '201', '210']
+SIZES = [10, 100, 1000, 10000]
+MAX_EACH_PAIR = 1000
+
+
+def make_candidates(n_candidates, phased):
+    """
+    one gene with n_candidates het SNVs
+    """
+    rng = random.Random(1)
+    candidates = {}
+    for i in range(n_candidates):
+        var = SNV({'chrom': '2', 'pos': str(1000 + i), 'ref': 'A',
+                   'alt': 'G', 'consequence': 'missense_variant',
+                   'hgnc_id': '12403', 'gt': '0/1', 'gq': '60',
+                   'pid': str(rng.randrange(20)) if phased else '.',
+                   'dnm': '.'})
+        var.set_triogenotype(rng.choice(TRIOGENOTYPES))
+        candidates['2_' + var.pos + '_A_G'] = {'variant': var,
+                                               'mode': {'Biallelic'}}
+    return {'12403': candidates}
+
+
+def screen(candidates, family):
+    variants = {'single_variants': {}, 'compound_hets': dict(candidates)}
+    CompoundHetScreen(variants, family).screen_compound_hets()
+    return variants['compound_hets']
+
+
+def main():
+    logging.disable(logging.INFO)
+    child = Person('fam', 'child', 'dad', 'mum', 'XY', '2')
+    trio = Family(child, Person('fam', 'mum', '0', '0', 'XX', '1'),
+                  Person('fam', 'dad', '0', '0', 'XY', '1'))
+    proband_only = Family(child, None, None)
+
+    for name, family, phased in [('trio', trio, False),
+                                 ('proband only', proband_only, True)]:
+        for size in SIZES:
+            candidates = make_candidates(size, phased)
+            paired = min(timeit.repeat(lambda: screen(candidates, family),
+                                       number=1, repeat=3))
+            if size <= MAX_EACH_PAIR:
+                each_pair = min(timeit.repeat(
+                    lambda: screen_each_pair(candidates, family), number=1,
+                    repeat=3))
+                each_pair = "{:.2f} ms".format(each_pair * 1000)
+            else:
+                each_pair = "not run"
+            print("{}, {} candidates: every pair {}, grouped {:.2f} ms".format(
+                name, size, each_pair, paired * 1000))
+
+
+if __name__ == '__main__':
+    main()
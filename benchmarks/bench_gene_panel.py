@@ -0,0 +1,99 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+# Per-family gene panel setup cost. Before the panel was shared each family
+# parsed the gene file in Filter.filter_trio, now the panel is loaded once
+# per run and each family only receives a reference to it. Also compares
+# parsing the gene file at startup with loading the compiled panel.
+#
+# PYTHONPATH=src python3 benchmarks/bench_gene_panel.py [n_genes] [n_families]
+
+import os
+import sys
+import tempfile
+import timeit
+
+from file_loading.load_genes_and_regions import load_genes, load_gene_panel
+from filtering.filter import Filter
+
+MODES = ['Biallelic', 'Monoallelic', 'Hemizygous', 'X-linked dominant']
+MECHANISMS = ['Loss of function', 'Dominant negative', 'Activating',
+              'Increased gene dosage']
+
+
+def write_gene_file(path, n_genes):
+    """
+    write a DDG2P style gene file, every tenth gene has a second entry
+    """
+    with open(path, 'w') as g:
+        g.write(("\t").join(['chr', 'start', 'stop', 'gene', 'hgnc_id', 'type',
+                             'mode', 'mech', 'syndrome']) + "\n")
+        for i in range(n_genes):
+            chrom = str(i % 22 + 1)
+            start = 1000000 + i * 20000
+            entries = 2 if i % 10 == 0 else 1
+            for e in range(entries):
+                g.write(("\t").join([chrom, str(start), str(start + 15000),
+                                     'GENE' + str(i), str(i),
+                                     'Confirmed DD gene',
+                                     MODES[(i + e) % len(MODES)],
+                                     MECHANISMS[(i + e) % len(MECHANISMS)],
+                                     'SYNDROME ' + str(i)]) + "\n")
+
+
+def main():
+    n_genes = int(sys.argv[1]) if len(sys.argv) > 1 else 2500
+    n_families = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'genes.txt')
+        write_gene_file(path, n_genes)
+
+        # before: every family parsed the gene file
+        before = timeit.timeit(lambda: Filter(None, load_genes(path), None,
+                                              None, tmpdir),
+                               number=n_families) / n_families
+
+        # after: the panel is loaded once and shared
+        panel = load_genes(path)
+        after = timeit.timeit(lambda: Filter(None, panel, None, None, tmpdir),
+                              number=n_families) / n_families
+
+        # startup: parse the text file vs load the compiled panel
+        parse = min(timeit.repeat(lambda: load_genes(path), number=1,
+                                  repeat=20))
+        load_gene_panel(path)
+        compiled = min(timeit.repeat(lambda: load_gene_panel(path), number=1,
+                                     repeat=20))
+
+    print("genes: {}, families: {}".format(n_genes, n_families))
+    print("per-family setup, gene file parsed per family: {:.3f} ms".format(
+        before * 1000))
+    print("per-family setup, shared gene panel:          {:.3f} ms".format(
+        after * 1000))
+    print("startup, parse gene file:     {:.3f} ms".format(parse * 1000))
+    print("startup, load compiled panel: {:.3f} ms".format(compiled * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+# Pre-inheritance filtering time for an exome-sized set of child variants.
+#
+# PYTHONPATH=src python3 benchmarks/bench_preinheritance.py [n_variants]
+
+import logging
+import random
+import sys
+import timeit
+
+from variants.snv import SNV
+from filtering.preinheritance_filtering import PreInheritanceFiltering
+
+CONSEQUENCES = ['missense_variant', 'synonymous_variant', 'intron_variant',
+                'stop_gained', 'splice_region_variant&intron_variant',
+                'frameshift_variant', '3_prime_UTR_variant',
+                'splice_donor_variant&intron_variant']
+TRIOGENOTYPES = ['100', '110', '101', '111', '200', '210', '201', '211']
+
+
+def make_variants(n_variants):
+    """
+    random child variants in 2000 genes, every tenth variant is on X
+    """
+    rng = random.Random(1)
+    child = {}
+    for i in range(n_variants):
+        chrom = 'X' if i % 10 == 0 else str(i % 22 + 1)
+        var = SNV({'chrom': chrom, 'pos': str(1000 + i), 'ref': 'A',
+                   'alt': 'G', 'consequence': rng.choice(CONSEQUENCES),
+                   'hgnc_id': 'HGNC:' + str(rng.randrange(2000)),
+                   'max_af': rng.choice(['.', '0', '0.0001']),
+                   'ddd_af': rng.choice(['.', '0.0001', '0.01']),
+                   'ddd_father_af': rng.choice(['.', '0', '0.001']),
+                   'revel': rng.choice(['.', '0.2', '0.7']),
+                   'dnm': rng.choice(['.', '.', True]),
+                   'gt': '0/1', 'gq': str(rng.randrange(20, 100)),
+                   'sex': 'XY'})
+        var.set_triogenotype(rng.choice(TRIOGENOTYPES))
+        child[chrom + '_' + var.pos + '_A_G'] = var
+    return {'child': child, 'mum': {}, 'dad': {}}
+
+
+def main():
+    n_variants = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    logging.disable(logging.INFO)
+    variants = make_variants(n_variants)
+    elapsed = min(timeit.repeat(
+        lambda: PreInheritanceFiltering(variants).preinheritance_filter(),
+        number=1, repeat=10))
+    passed = sum(len(v) for v in
+                 PreInheritanceFiltering(variants).preinheritance_filter()
+                 .values())
+    print("variants: {}, passed: {}".format(n_variants, passed))
+    print("pre-inheritance filtering: {:.1f} ms".format(elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -22,12 +22,112 @@ THE SOFTWARE.
 """
 
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 
 from utils.parse_args import get_options
 from file_loading.ped_files import create_ped, openped
-from filtering.filter import Filter
-from output.print_results import create_output
+from file_loading.load_genes_and_regions import load_gene_panel
+from file_loading.load_vcfs import get_cohort_vcf, load_cohort_variants, \
+    load_variants
+from file_loading.variant_cache import VariantCache
+from filtering.filter import Filter, get_vcf_regions, get_record_filter
+from filtering.preinheritance_filtering import needs_parental_genotypes
+from output.print_results import ResultsWriter
+from output.checkpoint import Checkpoint, run_fingerprint
+
+# gene panel used by the families filtered in a worker process, set once when
+# the worker starts rather than sent with every family
+worker_genes = None
+
+
+def init_worker(logfile, genes):
+    """
+    Set up a worker process. Logging only needs to be set up where workers
+    are spawned rather than forked
+    """
+    global worker_genes
+    logging.basicConfig(filename=logfile, level=logging.DEBUG)
+    worker_genes = genes
+
+
+def get_variant_cache(args):
+    """
+    the cache of parsed variants, None if it isn't used
+    """
+    if args.variant_cache is None:
+        return None
+    return VariantCache(args.variant_cache,
+                        args.variant_cache_size * 1024 * 1024)
+
+
+def filter_family(family, args, genes, variants=None):
+    """
+    Filter a single family, returns the filtered variants and inheritance
+    report. The family's variants are loaded unless they are given
+    """
+    varfilter = Filter(family, genes, args.known_regions,
+                       args.trusted_variants, args.outdir, args.vcf_reader,
+                       not args.whole_vcf, get_variant_cache(args),
+                       args.audit)
+    return varfilter.filter_trio(variants)
+
+
+def worker_filter_family(family, args, variants=None):
+    """
+    Filter a single family in a worker process
+    """
+    return filter_family(family, args, worker_genes, variants)
+
+
+def filter_families_prefetching(families, family_ids, args, genes):
+    """
+    Filter families one at a time, loading the next family's variants while
+    the current family is filtered. The parents' VCFs are loaded
+    concurrently. At most one family is loaded ahead. Yields the result of
+    each family in turn
+    """
+    vcfregions = get_vcf_regions(genes, args.known_regions,
+                                 args.trusted_variants, not args.whole_vcf)
+    cache = get_variant_cache(args)
+    record_filter = get_record_filter(args.audit)
+    with ThreadPoolExecutor(max_workers=2) as parentloader, \
+            ThreadPoolExecutor(max_workers=1) as prefetcher:
+
+        def load(famid):
+            return load_variants(families[famid], vcfregions, args.vcf_reader,
+                                 parentloader, cache, needs_parental_genotypes,
+                                 record_filter)
+
+        if len(family_ids) > 0:
+            nextload = prefetcher.submit(load, family_ids[0])
+        for i, famid in enumerate(family_ids):
+            variants = nextload.result()
+            if i + 1 < len(family_ids):
+                nextload = prefetcher.submit(load, family_ids[i + 1])
+            yield filter_family(families[famid], args, genes, variants)
+
+
+def checkpointed(family_ids, families, results, checkpoint):
+    """
+    save the result of each family in the checkpoint as it is filtered
+    """
+    for famid, result in zip(family_ids, results):
+        checkpoint.save(famid, families[famid], result)
+        yield result
+
+
+def with_resumed(family_ids, resumed, results):
+    """
+    results for all families in order, taking those of families that have
+    already been filtered from resumed and the rest from results
+    """
+    results = iter(results)
+    for famid in family_ids:
+        if famid in resumed:
+            yield resumed[famid]
+        else:
+            yield next(results)
 
 
 def main():
@@ -50,20 +150,79 @@ def main():
                    args.mum_aff, args.dad_aff)
 
     families = openped(args.ped, args.proband_list)
+    family_ids = list(families.keys())
+    if args.cohort_vcf:
+        for family in families.values():
+            for person in (family.proband, family.mum, family.dad):
+                if person is not None:
+                    person.vcf_path = args.cohort_vcf
+
+    genes = None
+    if args.known_genes:
+        genes = load_gene_panel(args.known_genes,
+                                use_cache=not args.no_gene_cache)
+
+    # results of families saved by an earlier run are reused with --resume
+    checkpoint = None
+    resumed = {}
+    if args.checkpoint_dir:
+        checkpoint = Checkpoint(args.checkpoint_dir, run_fingerprint(
+            args.known_genes, {'whole_vcf': args.whole_vcf},
+            {'known_regions': args.known_regions,
+             'trusted_variants': args.trusted_variants}))
+        if args.resume:
+            resumed = checkpoint.load(families)
+    to_filter = [f for f in family_ids if f not in resumed]
 
-    variants_per_family = {}
-    inheritance_reports_per_family = {}
-    for family in families.keys():
-        varfilter = Filter(families[family], args.known_genes,
-                           args.known_regions, args.trusted_variants,
-                           args.outdir)
-        filtered_variants, inheritance_report = varfilter.filter_trio()
+    # when every family is in one joint VCF it is read once for all of them
+    family_variants = [None] * len(to_filter)
+    cohort_variants = None
+    cohort_vcf = None
+    if args.vcf_reader == 'native' and len(to_filter) > 0:
+        cohort_vcf = get_cohort_vcf(families, args.cohort_vcf)
+    if cohort_vcf is not None:
+        vcfregions = get_vcf_regions(genes, args.known_regions,
+                                     args.trusted_variants, not args.whole_vcf)
+        cohort_variants = load_cohort_variants(
+            {f: families[f] for f in to_filter}, cohort_vcf, vcfregions,
+            get_record_filter(args.audit))
+        family_variants = [cohort_variants.pop(f) for f in to_filter]
 
-        variants_per_family[family] = filtered_variants
-        inheritance_reports_per_family[family] = inheritance_report
+    # each family's results are written as soon as it has been filtered
+    with ResultsWriter(families, args.outdir,
+                       args.report_format) as writer:
+        if args.jobs > 1:
+            # families are independent so can be filtered in separate
+            # processes. Results are taken in submission order so the
+            # output is the same as a serial run
+            executor = ProcessPoolExecutor(max_workers=args.jobs,
+                                           initializer=init_worker,
+                                           initargs=(logfile, genes))
+            futures = [executor.submit(worker_filter_family, families[f],
+                                       args, variants)
+                       for f, variants in zip(to_filter, family_variants)]
+            results = (future.result() for future in futures)
+        elif args.concurrent_loading and cohort_variants is None:
+            executor = None
+            results = filter_families_prefetching(families, to_filter, args,
+                                                  genes)
+        else:
+            executor = None
+            results = (filter_family(families[f], args, genes, variants)
+                       for f, variants in zip(to_filter, family_variants))
 
-    create_output(families, variants_per_family, inheritance_reports_per_family,
-                  args.outdir)
+        if checkpoint is not None:
+            results = checkpointed(to_filter, families, results, checkpoint)
+        try:
+            writer.write_families(family_ids,
+                                  with_resumed(family_ids, resumed, results))
+        finally:
+            if executor is not None:
+                # families which haven't started aren't filtered if writing
+                # the results failed
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=True)
 
 
 if __name__ == "__main__":
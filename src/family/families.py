@@ -28,7 +28,7 @@ class Person(object):
     """
 
     def __init__(self, family_id, person_id, dad_id, mum_id, sex, affected,
-                 path):
+                 path=None):
         # note that a person may be in >1 family if it is a parent
         self.family_id = family_id
         self.person_id = person_id
@@ -0,0 +1,110 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+# bump when Gene or GenePanel change so that old caches are rebuilt
+PANEL_CACHE_VERSION = 2
+PANEL_CACHE_SUFFIX = '.panel.pickle'
+
+
+def panel_cache_path(genes_file):
+    """
+    The compiled panel is written next to the gene file
+    """
+    return genes_file + PANEL_CACHE_SUFFIX
+
+
+def source_checksum(filename):
+    """
+    sha256 of a file's contents
+    """
+    checksum = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def read_panel_cache(genes_file):
+    """
+    Returns the compiled GenePanel for genes_file if there is one and it is
+    still fresh, otherwise None. The cache is fresh if the gene file has the
+    mtime and size recorded in it, or failing that the same checksum (eg the
+    file has been copied or touched but not changed). On a checksum match the
+    new mtime is recorded so that the file isn't checksummed again next time
+    """
+    cachefile = panel_cache_path(genes_file)
+    if not os.path.exists(cachefile):
+        return None
+    try:
+        with open(cachefile, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception as e:
+        logging.debug("Can't read gene panel cache " + cachefile + ": " +
+                      str(e))
+        return None
+
+    if not isinstance(cached, dict) or \
+            cached.get('version') != PANEL_CACHE_VERSION:
+        return None
+
+    stat = os.stat(genes_file)
+    if cached['size'] != stat.st_size:
+        return None
+    if cached['mtime'] != stat.st_mtime_ns:
+        if cached['checksum'] != source_checksum(genes_file):
+            return None
+        write_panel_cache(genes_file, cached['panel'], stat,
+                          cached['checksum'])
+
+    return cached['panel']
+
+
+def write_panel_cache(genes_file, panel, stat, checksum):
+    """
+    Write the compiled panel with the gene file's stat and checksum from
+    before it was parsed. The cache is written to a temporary file and moved
+    into place so that concurrent runs never see a partial cache. A cache
+    that can't be written (eg read only directory) is not an error
+    """
+    cachefile = panel_cache_path(genes_file)
+    cached = {'version': PANEL_CACHE_VERSION, 'mtime': stat.st_mtime_ns,
+              'size': stat.st_size, 'checksum': checksum, 'panel': panel}
+    tmpname = None
+    try:
+        with tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(os.path.abspath(cachefile)),
+                prefix=os.path.basename(cachefile) + '.', delete=False) as f:
+            tmpname = f.name
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, cachefile)
+    except OSError as e:
+        logging.debug("Can't write gene panel cache " + cachefile + ": " +
+                      str(e))
+        if tmpname is not None and os.path.exists(tmpname):
+            os.remove(tmpname)
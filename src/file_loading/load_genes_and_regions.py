@@ -21,40 +21,82 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import os
+from sys import intern
+
+from genes.gene_panel import Gene, GenePanel
+from file_loading.regions import Regions
+from file_loading.gene_panel_cache import read_panel_cache, \
+    write_panel_cache, source_checksum
+
 
 def load_genes(genes_file):
     """
-    load genes from DDG2P
+    load genes from DDG2P, returns a GenePanel of hgnc_id: Gene
     """
     genes = {}
+    # most genes have the same few statuses, modes and mechanisms, so genes
+    # with the same set share a single frozenset of interned strings
+    sets = {}
     with open(genes_file, 'r') as g:
-        lines = g.readlines()
-        for l in lines:
-            if not l.startswith('chr'):
-                linedata = (l).split("\t")
-                chr = linedata[0]
-                start = linedata[1]
-                end = linedata[2]
-                symbol = linedata[3]
-                hgnc_id = linedata[4]
-                status = linedata[5]
-                mode = linedata[6]
-                mechanism = linedata[7]
-                if hgnc_id in genes.keys():
-                    genes[hgnc_id]['status'].add(status)
-                    genes[hgnc_id]['mode'].add(mode)
-                    genes[hgnc_id]['mechanism'].add(mechanism)
-                else:
-                    genes[hgnc_id] = {}
-                    genes[hgnc_id]['chr'] = chr
-                    genes[hgnc_id]['start'] = start
-                    genes[hgnc_id]['end'] = end
-                    genes[hgnc_id]['symbol'] = symbol
-                    genes[hgnc_id]['status'] = set({status})
-                    genes[hgnc_id]['mode'] = set({mode})
-                    genes[hgnc_id]['mechanism'] = set({mechanism})
-
-    return genes
+        for l in g:
+            if l.startswith('chr'):
+                continue
+            linedata = [intern(f) for f in l.rstrip("\n").split("\t")]
+            hgnc_id = linedata[4]
+            if hgnc_id in genes:
+                genes[hgnc_id]['status'].add(linedata[5])
+                genes[hgnc_id]['mode'].add(linedata[6])
+                genes[hgnc_id]['mechanism'].add(linedata[7])
+            else:
+                genes[hgnc_id] = {'chr': linedata[0], 'start': linedata[1],
+                                  'end': linedata[2], 'symbol': linedata[3],
+                                  'status': {linedata[5]},
+                                  'mode': {linedata[6]},
+                                  'mechanism': {linedata[7]}}
+
+    def shared(values):
+        values = frozenset(values)
+        return sets.setdefault(values, values)
+
+    return GenePanel(
+        (hgnc_id, Gene(gene['chr'], gene['start'], gene['end'],
+                       gene['symbol'], shared(gene['status']),
+                       shared(gene['mode']), shared(gene['mechanism'])))
+        for hgnc_id, gene in genes.items())
+
+
+def load_gene_panel(genes_file, use_cache=True):
+    """
+    load genes, using the compiled panel next to the gene file if it is up
+    to date and compiling it if not
+    """
+    if not use_cache:
+        return load_genes(genes_file)
+
+    panel = read_panel_cache(genes_file)
+    if panel is None:
+        # record the file's state before parsing so that a change while it
+        # is being read invalidates the cache
+        stat = os.stat(genes_file)
+        checksum = source_checksum(genes_file)
+        panel = load_genes(genes_file)
+        write_panel_cache(genes_file, panel, stat, checksum)
+    return panel
+
+
+def panel_regions(genes, padding, large_span=None):
+    """
+    merged regions covering the genes in a gene panel, each gene is padded by
+    padding bases on either side. If large_span is set records at least that
+    long are also loaded
+    """
+    regions = Regions(large_span)
+    for chrom, intervals in genes.intervals.items():
+        for start, end, hgncid in intervals:
+            regions.add(chrom, max(1, start - padding), end + padding)
+    regions.merge()
+    return regions
 
 
 def load_regions():
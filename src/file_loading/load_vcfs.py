@@ -23,189 +23,492 @@ THE SOFTWARE.
 import subprocess
 import logging
 import os
+import shlex
+import tempfile
 
-from variants.snv import SNV
+from file_loading.regions import Regions
+from file_loading.vcf_reader import VcfReader, sample_column
+from variants.snv import SNV, genotype_code, standardise_gt
 from variants.cnv import CNV
+from variants.variant import variant_id, split_variant_id
 
+# INFO and FORMAT fields extracted from the VCFs, in the order they are used
+# to populate variant data in readvcf
+INFO_FIELDS = ['Consequence', 'Gene', 'SYMBOL', 'Feature', 'CANONICAL',
+               'MANE_SELECT', 'MANE_PLUS_CLINICAL', 'HGNC_ID', 'MAX_AF',
+               'MAX_AF_POPS', 'DDD_AF', 'DDD_father_AF', 'REVEL', 'PolyPhen',
+               'Protein_position', 'HGVSc', 'HGVSp', 'pp_trio_DNM2', 'pp_DNG',
+               'VAF', 'END', 'SVTYPE', 'SVLEN', 'CNVFILTER', 'HGNC_ID_ALL',
+               'SYMBOL_ALL', 'AC_XX', 'AN_XX', 'nhomalt_XX', 'AC_XY', 'AN_XY',
+               'nhomalt_XY']
+FORMAT_FIELDS = ['GT', 'GQ', 'PID', 'AD', 'CIFER_INHERITANCE', 'CN']
 
-def load_variants(family, outdir, regions=None):
+# column of GT in records of INFO_FIELDS and FORMAT_FIELDS
+GT_COLUMN = 4 + len(INFO_FIELDS) + FORMAT_FIELDS.index('GT')
+
+# only the parents' genotypes are used, MAX_AF is read so that the same
+# common variants are excluded as for the child
+PARENT_INFO_FIELDS = ['MAX_AF']
+PARENT_FORMAT_FIELDS = ['GT']
+
+
+def load_variants(family, regions=None, reader='native', executor=None,
+                  cache=None, parent_lookup=None, record_filter=None):
     """
-    get variants in child and parents
+    get variants in child and parents, if regions are given only child
+    variants in the regions are loaded. The parents' variants are loaded as
+    their genotype codes by variant id. If an executor (thread pool) is given
+    the parents' VCFs are loaded concurrently. If a VariantCache is given
+    each sample's parsed variants are read from and saved to it. If
+    parent_lookup is given parental variants are only loaded at the
+    positions of the child variants it returns True for. If a record_filter
+    is given child variants whose records it rejects aren't loaded
     """
     proband_vcf = family.proband.get_vcf_path()
-    if regions:
-        regionfile = outdir + "/reg.tmp"
-        with open(regionfile, 'w') as rf:
-            for r in regions:
-                rf.write(r + "\n")
-
-        sortedregs = outdir + "/reg.tmp_sorted"
-        sortcmd = "sort -k1,1V -k2,2n -k3,3n " + regionfile + " > " + sortedregs
-        os.system(sortcmd)
-        child_vars = readvcf(proband_vcf, sortedregs, family.proband.get_sex())
-        # remove regions files used for bcftools queries
-        os.system("rm " + regionfile)
-        os.system("rm " + sortedregs)
-    else:
-        child_vars = readvcf(proband_vcf, None, family.proband.get_sex())
+    child_vars = readvcf(proband_vcf, regions, family.proband.get_sex(),
+                         reader, family.proband.get_id(), cache,
+                         record_filter)
 
     mum_vars = {}
     dad_vars = {}
     if not family.has_no_parents():
-        # get a region string from the child variants as we don't need parental
-        # variants which are not in the child
+        # we don't need parental variants which are not in the child so only
+        # load parental variants at the child's variant positions
+        # the regions use the VCF's chromosome name from the variant id, as
+        # the variant's is standardised
+        childregions = Regions()
+        for varid, var in child_vars.items():
+            if parent_lookup is None or parent_lookup(var):
+                childregions.add(split_variant_id(varid)[0], var.pos)
+        childregions.merge()
 
-        childregionfile = outdir + '/childreg.tmp'
-        with open(childregionfile, 'w') as crf:
-            for varid in child_vars.keys():
-                idsplit = varid.split("_")
-                reg = idsplit[0] + "\t" + idsplit[1]
-                crf.write(reg + "\n")
+        if len(childregions) == 0:
+            # no child variants need parental genotypes
+            pass
+        elif family.has_both_parents() and \
+                family.mum.get_vcf_path() == family.dad.get_vcf_path():
+            # joint VCF for both parents, read both in one pass
+            mum_vars, dad_vars = readvcf_samples(
+                family.mum.get_vcf_path(), childregions,
+                [(family.mum.get_id(), 'F'), (family.dad.get_id(), 'M')],
+                reader, cache, genotypes_only=True)
+        elif family.has_both_parents() and executor is not None:
+            mum_future = executor.submit(readvcf, family.mum.get_vcf_path(),
+                                         childregions, 'F', reader,
+                                         family.mum.get_id(), cache,
+                                         genotypes_only=True)
+            dad_future = executor.submit(readvcf, family.dad.get_vcf_path(),
+                                         childregions, 'M', reader,
+                                         family.dad.get_id(), cache,
+                                         genotypes_only=True)
+            mum_vars = mum_future.result()
+            dad_vars = dad_future.result()
+        else:
+            if family.has_mum():
+                mum_vcf = family.mum.get_vcf_path()
+                mum_vars = readvcf(mum_vcf, childregions, 'F', reader,
+                                   family.mum.get_id(), cache,
+                                   genotypes_only=True)
 
-        childsortedregs = outdir + "/childreg.tmp_sorted"
-        childsortcmd = "sort -k1,1V -k2,2n " + childregionfile + " > " \
-                       + childsortedregs
+            if family.has_dad():
+                dad_vcf = family.dad.get_vcf_path()
+                dad_vars = readvcf(dad_vcf, childregions, 'M', reader,
+                                   family.dad.get_id(), cache,
+                                   genotypes_only=True)
 
-        os.system(childsortcmd)
+    variants = {'child': child_vars, 'mum': mum_vars, 'dad': dad_vars}
 
-        if family.has_mum():
-            mum_vcf = family.mum.get_vcf_path()
-            mum_vars = readvcf(mum_vcf, childsortedregs, 'F')
+    return variants
 
-        if family.has_dad():
-            dad_vcf = family.dad.get_vcf_path()
-            dad_vars = readvcf(dad_vcf, childsortedregs, 'M')
 
-        # remove child regions files used for bcftools queries
-        os.system("rm " + childregionfile)
-        os.system("rm " + childsortedregs)
+def get_cohort_vcf(families, cohort_vcf=None):
+    """
+    the joint cohort VCF to read every family from in one pass. This is
+    cohort_vcf if it is given, otherwise the VCF of every member of every
+    family if they are all in the same VCF and it has more than one sample,
+    with every member a sample in it. Otherwise returns None and each family
+    is read separately. The cohort VCF is read by the native reader so BCF
+    isn't used
+    """
+    if cohort_vcf is not None:
+        return None if cohort_vcf.endswith('.bcf') else cohort_vcf
 
-    variants = {'child': child_vars, 'mum': mum_vars, 'dad': dad_vars}
+    vcfs = set()
+    ids = set()
+    for family in families.values():
+        for person in (family.proband, family.mum, family.dad):
+            if person is not None:
+                vcfs.add(person.get_vcf_path())
+                ids.add(person.get_id())
+    if len(vcfs) != 1:
+        return None
+    vcf = vcfs.pop()
+    if vcf.endswith('.bcf'):
+        return None
+    with VcfReader(vcf) as vcfreader:
+        samples = set(vcfreader.samples)
+    if len(samples) > 1 and ids.issubset(samples):
+        return vcf
+    return None
+
+
+def load_cohort_variants(families, filename, regions=None,
+                         record_filter=None):
+    """
+    load the variants of every family from a joint cohort VCF where each
+    person is a sample, reading the VCF once for all of the families.
+    families is a dict of family id: Family, returns a dict of family id:
+    {'child', 'mum', 'dad'} variants. Parental variants are only loaded where
+    the child has the same variant as those are the only ones used, as
+    their genotype codes by variant id. If a record_filter is given child
+    variants whose records it rejects aren't loaded
+    """
+    famids = list(families.keys())
+    variants = {}
+    with VcfReader(filename) as vcfreader:
+        columns = {sample: i for i, sample in enumerate(vcfreader.samples)}
+        trios = []
+        sexes = []
+        for famid in famids:
+            family = families[famid]
+            members = [family.proband, family.mum, family.dad]
+            missing = [p.get_id() for p in members
+                       if p is not None and p.get_id() not in columns]
+            if len(missing) > 0:
+                raise ValueError("Can't find samples " + (", ").join(missing) +
+                                 " in " + filename)
+            trios.append(tuple(None if p is None else columns[p.get_id()]
+                               for p in members))
+            sexes.append((family.proband.get_sex(), 'F', 'M'))
+            variants[famid] = {'child': {}, 'mum': {}, 'dad': {}}
+
+        members = ('child', 'mum', 'dad')
+        for t, m, oldata in vcfreader.query_trios(INFO_FIELDS, FORMAT_FIELDS,
+                                                  regions, trios,
+                                                  record_filter):
+            if m == 0:
+                add_variant(variants[famids[t]]['child'], oldata, sexes[t][m])
+            else:
+                add_genotype(variants[famids[t]][members[m]], oldata,
+                             GT_COLUMN)
+
+    logging.info("Variants loaded from " + filename)
 
     return variants
 
 
-def readvcf(filename, regions, sex):
+def readvcf(filename, regions, sex, reader='native', sample=None,
+            cache=None, record_filter=None, genotypes_only=False):
     """
-    read vcf files and return a dict of variant objects
+    read vcf files and return a dict of variant objects, only variants in
+    regions are loaded if regions are given. sample picks the sample from a
+    multi-sample VCF, otherwise the first sample is used
     """
-    vars = {}
+    return readvcf_samples(filename, regions, [(sample, sex)], reader,
+                           cache, record_filter, genotypes_only)[0]
 
-    # get list of info fields in the vcf
-    infofields_wanted = ['Consequence', 'Gene', 'SYMBOL', 'Feature',
-                         'CANONICAL', 'MANE_SELECT', 'MANE_PLUS_CLINICAL',
-                         'HGNC_ID', 'MAX_AF', 'MAX_AF_POPS', 'DDD_AF',
-                         'DDD_father_AF', 'REVEL', 'PolyPhen',
-                         'Protein_position', 'HGVSc', 'HGVSp', 'pp_trio_DNM2',
-                         'pp_DNG', 'VAF', 'END', 'SVTYPE', 'SVLEN', 'CNVFILTER',
-                         'HGNC_ID_ALL', 'SYMBOL_ALL', 'AC_XX', 'AN_XX',
-                         'nhomalt_XX', 'AC_XY', 'AN_XY', 'nhomalt_XY']
-    formatfields = ['GT', 'GQ', 'PID', 'AD', 'CIFER_INHERITANCE', 'CN']
 
+def readvcf_samples(filename, regions, samples, reader='native', cache=None,
+                    record_filter=None, genotypes_only=False):
+    """
+    read several samples' variants from one VCF, samples is a list of
+    (sample id, sex). Returns a dict of variant objects for each sample. The
+    native reader reads the VCF once for all of the samples. Records
+    rejected by record_filter aren't made into variants, it isn't used with
+    the cache as that holds all of a sample's variants. If genotypes_only is
+    set only GT is read and each sample's SNVs are returned as a dict of
+    variant id: genotype code, as for parents
+    """
+    if reader == 'native' and filename.endswith('.bcf'):
+        # the native reader only reads text VCFs
+        logging.info(filename + " is BCF, using bcftools to read it")
+        reader = 'bcftools'
+
+    if cache is not None:
+        return read_cached_samples(filename, regions, samples, reader, cache,
+                                   genotypes_only)
+
+    if reader != 'native' and regions is not None and \
+            regions.large_span is not None:
+        # bcftools can't also load the large CNVs outside the regions so
+        # the whole VCF is read
+        regions = None
+
+    infofields = INFO_FIELDS
+    formatfields = FORMAT_FIELDS
+    if genotypes_only:
+        infofields = PARENT_INFO_FIELDS
+        formatfields = PARENT_FORMAT_FIELDS
+
+    vars = [{} for s in samples]
+    if reader == 'native':
+        with VcfReader(filename) as vcfreader:
+            columns = sample_columns(vcfreader.samples, samples, filename)
+            for s, oldata in vcfreader.query_samples(
+                    infofields, formatfields, regions, columns,
+                    record_filter):
+                if genotypes_only:
+                    add_genotype(vars[s], oldata)
+                else:
+                    add_variant(vars[s], oldata, samples[s][1])
+    else:
+        # bcftools reads each sample separately. Samples are picked as by
+        # the native reader, a single sample VCF is read whole
+        vcfsamples = bcftools_samples(filename)
+        columns = sample_columns(vcfsamples, samples, filename)
+        for s, (sampleid, sex) in enumerate(samples):
+            sample = None
+            if len(vcfsamples) > 1:
+                sample = vcfsamples[columns[s]]
+            for oldata in bcftools_query(filename, regions, sample,
+                                         infofields, formatfields):
+                if record_filter is not None and len(oldata) > 1 and not (
+                        record_filter.keep_site(oldata) and
+                        record_filter.keep_sample(oldata)):
+                    continue
+                if genotypes_only:
+                    add_genotype(vars[s], oldata)
+                else:
+                    add_variant(vars[s], oldata, sex)
+
+    logging.info("Variants loaded from " + filename)
+
+    return vars
+
+
+def sample_columns(vcfsamples, samples, filename):
+    """
+    column index of each of samples, a list of (sample id, sex), in a VCF
+    with the samples vcfsamples. Raises ValueError if they can't be found
+    """
+    columns = [sample_column(vcfsamples, sampleid, filename)
+               for sampleid, sex in samples]
+    if len(samples) > 1 and len(set(columns)) < len(samples):
+        raise ValueError("Can't find samples " + (", ").join(
+            [str(sampleid) for sampleid, sex in samples]) + " in " +
+                         filename)
+    return columns
+
+
+def read_cached_samples(filename, regions, samples, reader, cache,
+                        genotypes_only=False):
+    """
+    read samples' variants through the variant cache. The cache holds all of
+    a sample's variants so that they can be reused whatever the regions.
+    Samples which aren't cached are read from the whole VCF in one pass and
+    cached, then the variants in the regions are picked out
+    """
+    fields = INFO_FIELDS + FORMAT_FIELDS
+    if genotypes_only:
+        fields = PARENT_INFO_FIELDS + PARENT_FORMAT_FIELDS
+    keys = [cache.key(filename, sampleid, sex, reader, fields)
+            for sampleid, sex in samples]
+    vars = [cache.get(key) for key in keys]
+    missing = [s for s in range(len(samples)) if vars[s] is None]
+    if len(missing) > 0:
+        loaded = readvcf_samples(filename, None,
+                                 [samples[s] for s in missing], reader,
+                                 genotypes_only=genotypes_only)
+        for s, samplevars in zip(missing, loaded):
+            cache.put(keys[s], samplevars)
+            vars[s] = samplevars
+    else:
+        logging.info("Variants loaded from cache for " + filename)
+
+    if regions is None:
+        return vars
+    if genotypes_only:
+        return [{varid: geno for varid, geno in samplevars.items()
+                 if in_regions(regions, varid)} for samplevars in vars]
+    return [{varid: var for varid, var in samplevars.items()
+             if in_regions(regions, varid, var.cnv_end)}
+            for samplevars in vars]
+
+
+def in_regions(regions, varid, cnv_end=None):
+    """
+    would the record a variant came from be read from the regions? Uses the
+    VCF's chromosome name from the variant id, as the variant's is
+    standardised
+    """
+    chrom, pos, ref, alt = split_variant_id(varid)
+    start = int(pos)
+    end = start + len(ref) - 1
+    if cnv_end is not None:
+        end = max(end, cnv_end)
+    return regions.includes(chrom, start, end)
+
+
+def add_variant(vars, oldata, sex):
+    """
+    create a variant from a record of the VCF fields and add it to vars
+    """
+    if len(oldata) < 2:
+        return
+    alt = oldata[3]
+    if alt == '*':  # get rid of any where alt allele is *
+        return
+    # populate hash with variant data
+    varid = variant_id(oldata[0], oldata[1], oldata[2], alt)
+    vdata = {}
+    vdata['chrom'] = oldata[0]
+    vdata['pos'] = oldata[1]
+    vdata['ref'] = oldata[2]
+    vdata['alt'] = alt
+    vdata['consequence'] = oldata[4]
+    vdata['ensg'] = oldata[5]
+    vdata['symbol'] = oldata[6]
+    vdata['feature'] = oldata[7]
+    vdata['canonical'] = oldata[8]
+    vdata['mane'] = oldata[9]
+    vdata['mane_clinical'] = oldata[10]
+    vdata['hgnc_id'] = oldata[11]
+    vdata['max_af'] = oldata[12]
+    vdata['max_af_pops'] = oldata[13]
+    vdata['ddd_af'] = oldata[14]
+    vdata['ddd_father_af'] = oldata[15]
+    vdata['revel'] = oldata[16]
+    vdata['polyphen'] = oldata[17]
+    vdata['protein_position'] = oldata[18]
+    vdata['hgvsc'] = oldata[19]
+    vdata['hgvsp'] = oldata[20]
+    vdata['sex'] = sex
+    vdata['pp_trio_dnm2'] = oldata[21]
+    vdata['pp_dng'] = oldata[22]
+    vdata['vaf'] = oldata[23]
+    vdata['cnv_end'] = oldata[24]
+    vdata['cnv_type'] = oldata[25]
+    vdata['cnv_length'] = oldata[26]
+    vdata['cnv_filter'] = oldata[27]
+    vdata['hgnc_id_all'] = oldata[28]
+    vdata['symbol_all'] = oldata[29]
+    vdata['ac_XX'] = oldata[30]
+    vdata['an_XX'] = oldata[31]
+    vdata['nhomalt_XX'] = oldata[32]
+    vdata['ac_XY'] = oldata[33]
+    vdata['an_XY'] = oldata[34]
+    vdata['nhomalt_XY'] = oldata[35]
+    vdata['gt'] = oldata[36]
+    vdata['gq'] = oldata[37]
+    vdata['pid'] = oldata[38]
+    vdata['ad'] = oldata[39]
+    vdata['cnv_inh'] = oldata[40]
+    vdata['cn'] = oldata[41]
+
+    if not vdata['pp_trio_dnm2'] == '.' or not vdata['pp_dng'] == '.':
+        vdata['dnm'] = True
+    else:
+        vdata['dnm'] = False
+
+    var = SNV
+    if alt in ['<DEL>', '<DUP>']:
+        var = CNV
+    if alt in ['<DEL>', '<DUP>'] and vdata['chrom'] == 'Y':
+        # exclude CNVs on Y
+        logging.info(vdata['chrom'] + "_" + vdata['pos'] + "_" + vdata[
+            'ref'] + " CNV in Y: failed")
+        return
+    vars[varid] = var(vdata)
+
+
+def add_genotype(genotypes, oldata, gt=-1):
+    """
+    add the genotype code of a record to genotypes by the id of the variant
+    it would be, gt is the column of GT in the record. Only SNVs' genotypes
+    are used so other records are skipped. The genotype is checked as for
+    an SNV, so a call with a missing allele raises ValueError
+    """
+    if len(oldata) < 2:
+        return
+    alt = oldata[3]
+    if alt == '*' or alt in ['<DEL>', '<DUP>']:
+        return
+    varid = variant_id(oldata[0], oldata[1], oldata[2], alt)
+    try:
+        genotypes[varid] = genotype_code(standardise_gt(oldata[gt]))
+    except ValueError:
+        logging.error(varid + " invalid genotype: " + oldata[gt])
+        raise
+
+
+def bcftools_query(filename, regions, sample=None, infofields=INFO_FIELDS,
+                   formatfields=FORMAT_FIELDS):
+    """
+    split multiallelic variants, exclude common variants and variants where
+    the genotype is ref and extract the fields needed to create variants
+    using bcftools. If sample is given only that sample is read from a
+    multi-sample VCF. Returns a generator of records split into fields
+    """
     # create infostring containing only the fields present
     info_query = []
-    for inf in infofields_wanted:
+    for inf in infofields:
         info_query.append("%INFO/" + inf)
 
     infostring = ("\t").join(info_query)
     formatstring = ("\t%").join(formatfields)
 
-    if regions is None:
-        bcfcmdroot = "bcftools norm -m - " + filename \
-                     + " | bcftools view -e 'INFO/MAX_AF>0.005 | FORMAT/GT[0]=" \
-                     + '"ref"' \
-                     + "'  | bcftools query -u -f '%CHROM\t%POS\t%REF\t%ALT{0}\t"
+    regionfile = None
+    regionopt = ""
+    if regions is not None:
+        # bcftools reads regions from a file, each query gets its own file so
+        # that families filtered in parallel can't overwrite each other's.
+        # Regions are written with and without a chr prefix as bcftools
+        # skips chromosomes which aren't in the VCF
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.regions',
+                                         delete=False) as rf:
+            regions.write(rf, prefixed=True)
+            regionfile = rf.name
+        regionopt = "-R " + regionfile + " "
+
+    if sample is None:
+        normcmd = "bcftools norm -m - " + regionopt + filename
     else:
-        bcfcmdroot = "bcftools norm -m - -R " + regions + " " + filename + \
-                     " | bcftools view -e 'INFO/MAX_AF>0.005 | FORMAT/GT[0]=" + \
-                     '"ref"' + "'  | bcftools query -u -f '%CHROM\t%POS\t%REF\t%ALT{0}\t"
+        normcmd = "bcftools view -s " + shlex.quote(sample) + " -Ou " + \
+                  regionopt + filename + " | bcftools norm -m - -"
 
-    bcfcmd = bcfcmdroot + infostring + "[\t%" + formatstring + "]\n'"
-    output = runcommand(bcfcmd)
+    bcfcmdroot = normcmd + \
+        " | bcftools view -e 'INFO/MAX_AF>0.005 | FORMAT/GT[0]=" + \
+        '"ref"' + "'  | bcftools query -u -f '%CHROM\t%POS\t%REF\t%ALT{0}\t"
 
-    if not output == "Error in command":
-        outputlines = output.split('\n')
-    else:
-        logging.error("Variants not loaded from " + filename)
+    bcfcmd = bcfcmdroot + infostring + "[\t%" + formatstring + "]\n'"
 
-    for ol in outputlines:
-        oldata = ol.split("\t")
-        if len(oldata) < 2:
-            continue
-        alt = oldata[3]
-        if alt == '*':  # get rid of any where alt allele is *
-            continue
-        # populate hash with variant data
-        varid = ("_").join([oldata[0], oldata[1], oldata[2], alt])
-        vdata = {}
-        vdata['chrom'] = oldata[0]
-        vdata['pos'] = oldata[1]
-        vdata['ref'] = oldata[2]
-        vdata['alt'] = alt
-        vdata['consequence'] = oldata[4]
-        vdata['ensg'] = oldata[5]
-        vdata['symbol'] = oldata[6]
-        vdata['feature'] = oldata[7]
-        vdata['canonical'] = oldata[8]
-        vdata['mane'] = oldata[9]
-        vdata['mane_clinical'] = oldata[10]
-        vdata['hgnc_id'] = oldata[11]
-        vdata['max_af'] = oldata[12]
-        vdata['max_af_pops'] = oldata[13]
-        vdata['ddd_af'] = oldata[14]
-        vdata['ddd_father_af'] = oldata[15]
-        vdata['revel'] = oldata[16]
-        vdata['polyphen'] = oldata[17]
-        vdata['protein_position'] = oldata[18]
-        vdata['hgvsc'] = oldata[19]
-        vdata['hgvsp'] = oldata[20]
-        vdata['sex'] = sex
-        vdata['pp_trio_dnm2'] = oldata[21]
-        vdata['pp_dng'] = oldata[22]
-        vdata['vaf'] = oldata[23]
-        vdata['cnv_end'] = oldata[24]
-        vdata['cnv_type'] = oldata[25]
-        vdata['cnv_length'] = oldata[26]
-        vdata['cnv_filter'] = oldata[27]
-        vdata['hgnc_id_all'] = oldata[28]
-        vdata['symbol_all'] = oldata[29]
-        vdata['ac_XX'] = oldata[30]
-        vdata['an_XX'] = oldata[31]
-        vdata['nhomalt_XX'] = oldata[32]
-        vdata['ac_XY'] = oldata[33]
-        vdata['an_XY'] = oldata[34]
-        vdata['nhomalt_XY'] = oldata[35]
-        vdata['gt'] = oldata[36]
-        vdata['gq'] = oldata[37]
-        vdata['pid'] = oldata[38]
-        vdata['ad'] = oldata[39]
-        vdata['cnv_inh'] = oldata[40]
-        vdata['cn'] = oldata[41]
-
-        if not vdata['pp_trio_dnm2'] == '.' or not vdata['pp_dng'] == '.':
-            vdata['dnm'] = True
-        else:
-            vdata['dnm'] = False
-
-        var = SNV
-        if alt in ['<DEL>', '<DUP>']:
-            var = CNV
-        if alt in ['<DEL>', '<DUP>'] and vdata['chrom'] == 'Y':
-            # exclude CNVs on Y
-            logging.info(vdata['chrom'] + "_" + vdata['pos'] + "_" + vdata[
-                'ref'] + " CNV in Y: failed")
-            continue
-        vars[varid] = var(vdata)
+    return streamcommand(bcfcmd, filename, regionfile)
 
-    logging.info("Variants loaded from " + filename)
 
-    return vars
+def bcftools_samples(filename):
+    """
+    the sample names in a VCF, read with bcftools
+    """
+    return [fields[0] for fields in
+            streamcommand("bcftools query -l " + shlex.quote(filename),
+                          filename) if fields[0] != '']
 
 
-def runcommand(cmd):
+def streamcommand(cmd, filename, tmpfile=None):
+    """
+    run a command and yield its output one line at a time split into fields,
+    so that the full output is never held in memory. tmpfile is removed once
+    the command has finished. Raises CalledProcessError if any command in
+    the pipeline fails, so that a partly read VCF isn't used
+    """
+    # with pipefail the exit status is that of the last command to fail
+    # rather than only that of the last command in the pipeline
+    proc = subprocess.Popen("set -o pipefail; " + cmd, shell=True,
+                            executable='/bin/bash', stdout=subprocess.PIPE,
+                            universal_newlines=True)
+    finished = False
     try:
-        byteoutput = subprocess.check_output(cmd, shell=True)
-        return byteoutput.decode('UTF-8').rstrip()
-    except subprocess.CalledProcessError as e:
-        print(e.output)
-        return "Error in command"
+        for line in proc.stdout:
+            yield line.rstrip("\n").split("\t")
+        finished = True
+    finally:
+        proc.stdout.close()
+        if not finished and proc.poll() is None:
+            # the caller stopped reading early
+            proc.kill()
+        returncode = proc.wait()
+        if tmpfile is not None:
+            os.remove(tmpfile)
+    if returncode != 0:
+        logging.error("Variants not loaded from " + filename)
+        raise subprocess.CalledProcessError(returncode, cmd)
@@ -0,0 +1,141 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import re
+from bisect import bisect_right
+
+
+def chrom_order(chrom):
+    """
+    sort key for natural chromosome order, 1, 2, ... 10, ... X, Y
+    """
+    return [int(p) if p.isdigit() else p for p in re.split(r'(\d+)', chrom)]
+
+
+def standard_chrom(chrom):
+    """
+    chromosome name without a chr prefix, 1-22, X, Y
+    """
+    if chrom.startswith('chr') or chrom.startswith('Chr'):
+        return chrom[3:]
+    return chrom
+
+
+class Regions(object):
+    """
+    Genomic regions to load variants from. Intervals are 1-based and
+    inclusive and are merged per chromosome so that overlap tests are a binary
+    search. If large_span is set records spanning at least that many bases
+    are loaded wherever they are. Chromosomes are stored without a chr prefix
+    and match records from VCFs using either naming
+    """
+
+    def __init__(self, large_span=None):
+        self.intervals = {}
+        self.starts = {}
+        self.ends = {}
+        self.merged = True
+        self.large_span = large_span
+
+    def __len__(self):
+        self.merge()
+        return sum(len(s) for s in self.starts.values())
+
+    def add(self, chrom, start, end=None):
+        """
+        add a region, a region without an end is a single position
+        """
+        chrom = standard_chrom(chrom)
+        start = int(start)
+        if end is None:
+            end = start
+        else:
+            end = int(end)
+        if chrom not in self.intervals:
+            self.intervals[chrom] = []
+        self.intervals[chrom].append((start, end))
+        self.merged = False
+
+    def merge(self):
+        """
+        sort and merge overlapping and adjacent intervals on each chromosome
+        """
+        if self.merged:
+            return
+        self.starts = {}
+        self.ends = {}
+        for chrom in self.intervals.keys():
+            starts = []
+            ends = []
+            for start, end in sorted(self.intervals[chrom]):
+                if len(ends) > 0 and start <= ends[-1] + 1:
+                    if end > ends[-1]:
+                        ends[-1] = end
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.starts[chrom] = starts
+            self.ends[chrom] = ends
+            self.intervals[chrom] = list(zip(starts, ends))
+        self.merged = True
+
+    def overlaps(self, chrom, start, end):
+        """
+        does the interval start-end overlap any region? returns true/false
+        """
+        self.merge()
+        chrom = standard_chrom(chrom)
+        if chrom not in self.starts:
+            return False
+        idx = bisect_right(self.starts[chrom], end) - 1
+        return idx >= 0 and self.ends[chrom][idx] >= start
+
+    def chroms(self):
+        """
+        chromosomes with regions in natural order
+        """
+        return sorted(self.intervals.keys(), key=chrom_order)
+
+    def write(self, handle, prefixed=False):
+        """
+        write the merged regions as tab separated chrom, start, end in
+        natural chromosome order. If prefixed is set each region is also
+        written with a chr prefix, for VCFs which may use either naming
+        """
+        self.merge()
+        for chrom in self.chroms():
+            names = [chrom]
+            if prefixed:
+                names.append('chr' + chrom)
+            for name in names:
+                for start, end in self.intervals[chrom]:
+                    handle.write(name + "\t" + str(start) + "\t" +
+                                 str(end) + "\n")
+
+    def includes(self, chrom, start, end):
+        """
+        should a record spanning start-end be loaded? returns true/false
+        """
+        if self.large_span is not None and end - start + 1 >= self.large_span:
+            return True
+        return self.overlaps(chrom, start, end)
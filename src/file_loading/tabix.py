@@ -0,0 +1,315 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import gzip
+import os
+import struct
+import zlib
+
+from file_loading.regions import standard_chrom
+
+BGZF_MAGIC = b'\x1f\x8b\x08\x04'
+
+
+def reg2bins(beg, end, min_shift, depth):
+    """
+    bins that may contain records overlapping beg-end (0-based, end
+    exclusive), as in htslib
+    """
+    bins = []
+    end -= 1
+    shift = min_shift + depth * 3
+    offset = 0
+    for level in range(depth + 1):
+        bins.extend(range(offset + (beg >> shift), offset + (end >> shift) + 1))
+        shift -= 3
+        offset += 1 << (level * 3)
+    return bins
+
+
+def bin_level_offset(level):
+    """
+    number of the first bin at a level of the binning scheme
+    """
+    return ((1 << (level * 3)) - 1) // 7
+
+
+def merge_chunks(chunks):
+    """
+    sort chunks of virtual offsets and merge any that overlap or touch
+    """
+    merged = []
+    for beg, end in sorted(chunks):
+        if len(merged) > 0 and beg <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((beg, end))
+    return merged
+
+
+def find_index(filename):
+    """
+    path of the tabix (.tbi) or CSI (.csi) index of a bgzipped file, None if
+    there is no index or it is older than the file
+    """
+    for suffix in ('.tbi', '.csi'):
+        indexfile = filename + suffix
+        if os.path.exists(indexfile):
+            if os.path.getmtime(indexfile) < os.path.getmtime(filename):
+                return None
+            return indexfile
+    return None
+
+
+class TabixIndex(object):
+    """
+    tabix or CSI index of a bgzipped VCF, used to find the chunks of the file
+    (pairs of BGZF virtual offsets) holding records in a region
+    """
+
+    def __init__(self, names, min_shift, depth, bins, linear, loffsets):
+        self.names = names
+        self.refs = {name: i for i, name in enumerate(names)}
+        # regions name chromosomes without a chr prefix
+        for i, name in enumerate(names):
+            self.refs.setdefault(standard_chrom(name), i)
+        self.min_shift = min_shift
+        self.depth = depth
+        # per reference, bin: [(beg, end)] chunks
+        self.bins = bins
+        # per reference, tabix linear index or CSI per-bin offsets
+        self.linear = linear
+        self.loffsets = loffsets
+
+    @classmethod
+    def from_file(cls, indexfile):
+        """
+        read a .tbi or .csi index
+        """
+        with open(indexfile, 'rb') as f:
+            data = gzip.decompress(f.read())
+        if data[:4] == b'TBI\x01':
+            return cls.read_tbi(data)
+        elif data[:4] == b'CSI\x01':
+            return cls.read_csi(data)
+        raise ValueError(indexfile + " is not a tabix or CSI index")
+
+    @staticmethod
+    def read_names(data, offset):
+        """
+        read the tabix header (format, columns, meta, skip, names), returns
+        the sequence names and the offset after the header
+        """
+        l_nm = struct.unpack_from('<i', data, offset + 24)[0]
+        offset += 28
+        names = data[offset:offset + l_nm].split(b'\x00')
+        return [n.decode() for n in names if n != b''], offset + l_nm
+
+    @classmethod
+    def read_tbi(cls, data):
+        n_ref = struct.unpack_from('<i', data, 4)[0]
+        names, offset = cls.read_names(data, 8)
+        bins = []
+        linear = []
+        for r in range(n_ref):
+            refbins = {}
+            n_bin = struct.unpack_from('<i', data, offset)[0]
+            offset += 4
+            for b in range(n_bin):
+                binno, n_chunk = struct.unpack_from('<Ii', data, offset)
+                offset += 8
+                chunks = struct.unpack_from('<' + 'Q' * 2 * n_chunk, data,
+                                            offset)
+                offset += 16 * n_chunk
+                refbins[binno] = list(zip(chunks[::2], chunks[1::2]))
+            n_intv = struct.unpack_from('<i', data, offset)[0]
+            offset += 4
+            linear.append(struct.unpack_from('<' + 'Q' * n_intv, data, offset))
+            offset += 8 * n_intv
+            bins.append(refbins)
+        return cls(names, 14, 5, bins, linear, None)
+
+    @classmethod
+    def read_csi(cls, data):
+        min_shift, depth, l_aux = struct.unpack_from('<iii', data, 4)
+        offset = 16
+        names = []
+        if l_aux >= 28:
+            names = cls.read_names(data, offset)[0]
+        offset += l_aux
+        n_ref = struct.unpack_from('<i', data, offset)[0]
+        offset += 4
+        bins = []
+        loffsets = []
+        for r in range(n_ref):
+            refbins = {}
+            refloffsets = {}
+            n_bin = struct.unpack_from('<i', data, offset)[0]
+            offset += 4
+            for b in range(n_bin):
+                binno, loffset, n_chunk = struct.unpack_from('<IQi', data,
+                                                             offset)
+                offset += 16
+                chunks = struct.unpack_from('<' + 'Q' * 2 * n_chunk, data,
+                                            offset)
+                offset += 16 * n_chunk
+                refbins[binno] = list(zip(chunks[::2], chunks[1::2]))
+                refloffsets[binno] = loffset
+            bins.append(refbins)
+            loffsets.append(refloffsets)
+        return cls(names, min_shift, depth, bins, None, loffsets)
+
+    def min_offset(self, ref, beg):
+        """
+        smallest virtual offset of a record that can overlap position beg
+        (0-based)
+        """
+        if self.linear is not None:
+            linear = self.linear[ref]
+            if len(linear) == 0:
+                return 0
+            return linear[min(beg >> self.min_shift, len(linear) - 1)]
+        # CSI, offset of the smallest bin containing beg that is in the index
+        binno = bin_level_offset(self.depth) + (beg >> self.min_shift)
+        while True:
+            if binno in self.loffsets[ref]:
+                return self.loffsets[ref][binno]
+            if binno == 0:
+                return 0
+            binno = (binno - 1) >> 3
+
+    def chunks(self, chrom, start, end):
+        """
+        chunks holding the records that may overlap start-end (1-based,
+        inclusive)
+        """
+        if chrom not in self.refs:
+            return []
+        ref = self.refs[chrom]
+        minoffset = self.min_offset(ref, start - 1)
+        chunks = []
+        for binno in reg2bins(start - 1, end, self.min_shift, self.depth):
+            for chunk in self.bins[ref].get(binno, []):
+                if chunk[1] > minoffset:
+                    chunks.append(chunk)
+        return chunks
+
+    def large_record_chunks(self, span):
+        """
+        chunks holding every record spanning at least span bases. A record is
+        indexed in the smallest bin that contains it, so these are the chunks
+        of the bins at levels at least as large as span
+        """
+        level = 0
+        while level < self.depth and \
+                1 << (self.min_shift + 3 * (self.depth - level - 1)) >= span:
+            level += 1
+        lastbin = bin_level_offset(level + 1)
+        chunks = []
+        for refbins in self.bins:
+            for binno, binchunks in refbins.items():
+                if binno < lastbin:
+                    chunks.extend(binchunks)
+        return chunks
+
+
+class BgzfReader(object):
+    """
+    read lines from a bgzipped file starting at BGZF virtual offsets
+    """
+
+    def __init__(self, filename):
+        self.handle = open(filename, 'rb')
+        self.block_offset = None
+        self.block_data = b''
+        self.next_block = 0
+
+    def close(self):
+        self.handle.close()
+
+    def load_block(self, coffset):
+        """
+        read and decompress the block starting at file offset coffset
+        """
+        if coffset == self.block_offset:
+            return
+        self.handle.seek(coffset)
+        header = self.handle.read(12)
+        if len(header) < 12:
+            # end of file
+            self.block_offset = coffset
+            self.block_data = b''
+            self.next_block = coffset
+            return
+        if header[:4] != BGZF_MAGIC:
+            raise ValueError(self.handle.name + " is not bgzipped")
+        xlen = struct.unpack('<H', header[10:12])[0]
+        extra = self.handle.read(xlen)
+        bsize = None
+        i = 0
+        while i + 4 <= xlen:
+            slen = struct.unpack('<H', extra[i + 2:i + 4])[0]
+            if extra[i:i + 2] == b'BC':
+                bsize = struct.unpack('<H', extra[i + 4:i + 6])[0]
+            i += 4 + slen
+        if bsize is None:
+            raise ValueError(self.handle.name + " is not bgzipped")
+        cdata = self.handle.read(bsize - xlen - 19)
+        self.block_offset = coffset
+        self.block_data = zlib.decompress(cdata, -15)
+        self.next_block = coffset + bsize + 1
+
+    def lines(self, start, end):
+        """
+        yield the lines that start at or after virtual offset start and
+        before virtual offset end
+        """
+        coffset = start >> 16
+        uoffset = start & 0xffff
+        self.load_block(coffset)
+        while True:
+            if uoffset >= len(self.block_data):
+                if self.next_block == self.block_offset:
+                    return
+                coffset = self.next_block
+                uoffset = 0
+                self.load_block(coffset)
+                continue
+            if (coffset << 16 | uoffset) >= end:
+                return
+            parts = []
+            while True:
+                newline = self.block_data.find(b'\n', uoffset)
+                if newline != -1:
+                    parts.append(self.block_data[uoffset:newline])
+                    uoffset = newline + 1
+                    break
+                parts.append(self.block_data[uoffset:])
+                if self.next_block == self.block_offset:
+                    uoffset = len(self.block_data)
+                    break
+                coffset = self.next_block
+                uoffset = 0
+                self.load_block(coffset)
+            yield b''.join(parts).decode()
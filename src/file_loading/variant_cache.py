@@ -0,0 +1,130 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+from file_loading.gene_panel_cache import source_checksum
+from file_loading.tabix import find_index
+
+# bump when the variant classes change so that old cached variants are not
+# loaded
+VARIANT_CACHE_VERSION = 2
+VARIANT_CACHE_SUFFIX = '.variants.pickle'
+
+
+class VariantCache(object):
+    """
+    On disk cache of the parsed variants of each sample in a VCF. Entries are
+    named by a hash of everything the variants depend on: the VCF's path,
+    size and mtime, a checksum of its index, the sample and its sex, the
+    reader and the fields read. When the cache grows over max_bytes the
+    least recently used entries are removed
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, filename, sample, sex, reader, fields):
+        """
+        the cache key of a sample's variants
+        """
+        stat = os.stat(filename)
+        indexfile = find_index(filename)
+        index = source_checksum(indexfile) if indexfile is not None else None
+        keydata = [VARIANT_CACHE_VERSION, os.path.abspath(filename),
+                   stat.st_size, stat.st_mtime_ns, index, sample, sex, reader,
+                   fields]
+        return hashlib.sha256(json.dumps(keydata).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + VARIANT_CACHE_SUFFIX)
+
+    def get(self, key):
+        """
+        the cached variants for key, None if they aren't in the cache
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                variants = pickle.load(f)
+            # the mtime records when an entry was last used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.debug("Can't read variant cache " + path + ": " + str(e))
+            return None
+        return variants
+
+    def put(self, key, variants):
+        """
+        add variants to the cache. The entry is written to a temporary file
+        and moved into place so that concurrent runs never see a partial
+        entry. A cache that can't be written is not an error
+        """
+        path = self.path(key)
+        tmpname = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir,
+                                             prefix=key + '.',
+                                             delete=False) as f:
+                tmpname = f.name
+                pickle.dump(variants, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, path)
+        except OSError as e:
+            logging.debug("Can't write variant cache " + path + ": " + str(e))
+            if tmpname is not None and os.path.exists(tmpname):
+                os.remove(tmpname)
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        remove the least recently used entries until the cache fits in
+        max_bytes
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(VARIANT_CACHE_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
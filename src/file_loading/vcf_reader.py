@@ -0,0 +1,390 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import gzip
+import logging
+import re
+
+from file_loading.tabix import BGZF_MAGIC, BgzfReader, TabixIndex, \
+    find_index, merge_chunks
+
+GT_SEPARATOR = re.compile(r'([/|])')
+
+
+def open_vcf(filename):
+    """
+    open a plain text, gzipped or bgzipped (multi-member gzip) VCF as text
+    """
+    with open(filename, 'rb') as f:
+        magic = f.read(2)
+    if magic == b'\x1f\x8b':
+        return gzip.open(filename, 'rt')
+    return open(filename, 'r')
+
+
+class VcfReader(object):
+    """
+    In-process VCF reader. Produces the same records as
+
+    bcftools norm -m - | bcftools view -e 'INFO/MAX_AF>0.005 |
+    FORMAT/GT[0]="ref"' | bcftools query
+
+    so that VCFs can be loaded without bcftools
+    """
+
+    def __init__(self, filename, max_af=0.005):
+        self.filename = filename
+        self.max_af = max_af
+        self.info_number = {}
+        self.format_number = {}
+        self.samples = []
+        self.handle = open_vcf(filename)
+        self.read_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.handle.close()
+
+    def read_header(self):
+        """
+        get the Number of each INFO and FORMAT field and the sample names
+        """
+        for l in self.handle:
+            if l.startswith('##INFO=<') or l.startswith('##FORMAT=<'):
+                fieldid = re.search(r'[<,]ID=([^,>]+)', l)
+                number = re.search(r'[<,]Number=([^,>]+)', l)
+                if fieldid is None or number is None:
+                    continue
+                if l.startswith('##INFO'):
+                    self.info_number[fieldid.group(1)] = number.group(1)
+                else:
+                    self.format_number[fieldid.group(1)] = number.group(1)
+            elif l.startswith('#CHROM'):
+                self.samples = l.rstrip("\n").split("\t")[9:]
+                break
+
+    def load_index(self):
+        """
+        load the tabix or CSI index of a bgzipped VCF, None if the VCF isn't
+        bgzipped or has no usable index
+        """
+        with open(self.filename, 'rb') as f:
+            if f.read(4) != BGZF_MAGIC:
+                return None
+        indexfile = find_index(self.filename)
+        if indexfile is None:
+            return None
+        try:
+            return TabixIndex.from_file(indexfile)
+        except (OSError, ValueError, EOFError) as e:
+            logging.info("Can't use index " + indexfile + ": " + str(e))
+            return None
+
+    def lines(self, regions=None):
+        """
+        iterate through the data lines of the VCF split into columns. If
+        regions are given and the VCF is indexed only the parts of the file
+        that can hold records in the regions are read
+        """
+        if regions is not None:
+            index = self.load_index()
+            if index is not None:
+                for l in self.indexed_lines(index, regions):
+                    yield l.rstrip("\r").split("\t")
+                return
+        for l in self.handle:
+            yield l.rstrip("\n").split("\t")
+
+    def indexed_lines(self, index, regions):
+        """
+        read the lines in the index chunks overlapping the regions in file
+        order, each line is read once however many regions it overlaps
+        """
+        regions.merge()
+        chunks = []
+        for chrom, intervals in regions.intervals.items():
+            for start, end in intervals:
+                chunks.extend(index.chunks(chrom, start, end))
+        if regions.large_span is not None:
+            chunks.extend(index.large_record_chunks(regions.large_span))
+        reader = BgzfReader(self.filename)
+        try:
+            for beg, end in merge_chunks(chunks):
+                for l in reader.lines(beg, end):
+                    yield l
+        finally:
+            reader.close()
+
+    def query(self, infofields, formatfields, regions=None, sample=0,
+              record_filter=None):
+        """
+        iterate through records split into one record per ALT allele,
+        returning CHROM, POS, REF, ALT, the INFO fields and FORMAT fields
+        for one sample. Missing values are '.'
+        """
+        for s, record in self.query_samples(infofields, formatfields, regions,
+                                            [sample], record_filter):
+            yield record
+
+    def query_samples(self, infofields, formatfields, regions=None,
+                      samples=(0,), record_filter=None):
+        """
+        as query, but for several samples (column indexes) in one pass over
+        the VCF. Yields (position of the sample in samples, record), a record
+        is only returned for the samples whose genotype isn't ref. If a
+        record_filter is given records it rejects are skipped, the FORMAT
+        fields are only decoded for records which pass its keep_site test
+        """
+        for fields, alts, info in self.records(regions):
+            sampleinfos = None
+            for i in range(1, len(alts) + 1):
+                infovalues = self.info_values(info, infofields, i, len(alts))
+                if self.is_common(infofields, infovalues):
+                    continue
+                variant = fields[:2] + [fields[3], alts[i - 1]] + infovalues
+                if record_filter is not None and \
+                        not record_filter.keep_site(variant):
+                    continue
+                if sampleinfos is None:
+                    formatkeys = fields[8].split(':') if len(fields) > 9 \
+                        else []
+                    sampleinfos = [self.sample_info(fields, formatkeys,
+                                                    sample)
+                                   for sample in samples]
+                for s, sampleinfo in enumerate(sampleinfos):
+                    formatvalues = self.format_values(sampleinfo,
+                                                      formatfields, i,
+                                                      len(alts))
+                    if formatvalues is None:
+                        continue
+                    record = variant + formatvalues
+                    if record_filter is not None and \
+                            not record_filter.keep_sample(record):
+                        continue
+                    yield s, record
+
+    def query_trios(self, infofields, formatfields, regions=None, trios=(),
+                    record_filter=None):
+        """
+        records for many trios in one pass over a joint VCF. trios is a list
+        of (child, mum, dad) column indexes, mum or dad is None if the parent
+        is missing. Yields (trio index, member index 0-2 for child, mum, dad,
+        record). Parents are only decoded and returned for the alleles the
+        child has. If a record_filter is given it is applied to the child's
+        records, parents aren't decoded where it rejects the child's
+        """
+        for fields, alts, info in self.records(regions):
+            formatkeys = fields[8].split(':') if len(fields) > 9 else []
+            sampleinfos = {}
+            for i in range(1, len(alts) + 1):
+                infovalues = self.info_values(info, infofields, i, len(alts))
+                if self.is_common(infofields, infovalues):
+                    continue
+                variant = fields[:2] + [fields[3], alts[i - 1]] + infovalues
+                if record_filter is not None and \
+                        not record_filter.keep_site(variant):
+                    continue
+                for t, trio in enumerate(trios):
+                    for m, column in enumerate(trio):
+                        if column is None:
+                            continue
+                        if column not in sampleinfos:
+                            sampleinfos[column] = self.sample_info(
+                                fields, formatkeys, column)
+                        formatvalues = self.format_values(
+                            sampleinfos[column], formatfields, i, len(alts))
+                        if formatvalues is None:
+                            if m == 0:
+                                # parents aren't needed where the child is ref
+                                break
+                            continue
+                        if m == 0 and record_filter is not None and \
+                                not record_filter.keep_sample(
+                                    variant + formatvalues):
+                            break
+                        yield t, m, variant + formatvalues
+
+    def records(self, regions=None):
+        """
+        iterate through the records in regions, yields the record split into
+        columns, its ALT alleles and parsed INFO
+        """
+        for fields in self.lines(regions):
+            if regions is not None:
+                pos = int(fields[1])
+                end = pos + len(fields[3]) - 1
+                info_end = get_info_value(fields[7], 'END')
+                if info_end is not None and info_end.isdigit():
+                    end = max(end, int(info_end))
+                if not regions.includes(fields[0], pos, end):
+                    continue
+            yield fields, fields[4].split(','), parse_info(fields[7])
+
+    def info_values(self, info, infofields, allele, nalts):
+        """
+        values of the INFO fields for one ALT allele
+        """
+        return [self.allele_value(info.get(inf), self.info_number.get(inf),
+                                  allele, nalts) for inf in infofields]
+
+    @staticmethod
+    def sample_info(fields, formatkeys, column):
+        """
+        dict of FORMAT key: value for the sample in a column
+        """
+        if len(fields) > 9 + column:
+            return dict(zip(formatkeys, fields[9 + column].split(':')))
+        return {}
+
+    def format_values(self, sampleinfo, formatfields, allele, nalts):
+        """
+        values of the FORMAT fields of a sample for one ALT allele, None if
+        the sample's genotype for the allele is ref
+        """
+        gt = sampleinfo.get('GT')
+        if gt is not None and nalts > 1:
+            gt = split_gt(gt, allele)
+        if gt is not None and is_ref(gt):
+            return None
+        formatvalues = []
+        for fmt in formatfields:
+            if fmt == 'GT':
+                value = gt
+            else:
+                value = self.allele_value(sampleinfo.get(fmt),
+                                          self.format_number.get(fmt), allele,
+                                          nalts)
+            if value is None or value == '':
+                value = '.'
+            formatvalues.append(value)
+        return formatvalues
+
+    def is_common(self, infofields, infovalues):
+        """
+        is MAX_AF above the maximum allele frequency?
+        """
+        if 'MAX_AF' in infofields:
+            max_af = infovalues[infofields.index('MAX_AF')]
+            for af in max_af.split(','):
+                try:
+                    if float(af) > self.max_af:
+                        return True
+                except ValueError:
+                    continue
+        return False
+
+    @staticmethod
+    def allele_value(value, number, allele, nalts):
+        """
+        get the value of a field for one ALT allele, Number=A, R and G
+        fields are split in the same way as bcftools norm -m -
+        """
+        if value is None:
+            return '.'
+        if nalts == 1 or number not in ('A', 'R', 'G'):
+            return value
+        values = value.split(',')
+        if number == 'A' and len(values) == nalts:
+            return values[allele - 1]
+        elif number == 'R' and len(values) == nalts + 1:
+            return values[0] + ',' + values[allele]
+        elif number == 'G' and len(values) == (nalts + 1) * (nalts + 2) // 2:
+            het = allele * (allele + 1) // 2
+            return (',').join([values[0], values[het], values[het + allele]])
+        return value
+
+
+def sample_column(samples, sampleid, filename):
+    """
+    column index of a sample in a VCF with samples. A single sample VCF is
+    read whatever its sample is called, as is the first sample if sampleid
+    is None. Raises ValueError if a multi-sample VCF doesn't have the sample
+    """
+    if sampleid in samples:
+        return samples.index(sampleid)
+    if sampleid is None or len(samples) <= 1:
+        return 0
+    raise ValueError("Can't find sample " + sampleid + " in " + filename)
+
+
+def parse_info(info):
+    """
+    parse an INFO column into a dict, flags are given a value of 1
+    """
+    infodict = {}
+    if info == '.':
+        return infodict
+    for entry in info.split(';'):
+        key, sep, value = entry.partition('=')
+        if sep == '':
+            value = '1'
+        infodict[key] = value
+    return infodict
+
+
+def get_info_value(info, key):
+    """
+    get a single value from an INFO column without parsing the rest
+    """
+    start = info.find(key + '=')
+    while start > 0 and info[start - 1] != ';':
+        start = info.find(key + '=', start + 1)
+    if start == -1:
+        return None
+    start += len(key) + 1
+    end = info.find(';', start)
+    if end == -1:
+        end = len(info)
+    return info[start:end]
+
+
+def split_gt(gt, allele):
+    """
+    recode a genotype for one ALT allele of a split multiallelic record, the
+    allele becomes 1 and other ALT alleles become 0
+    """
+    parts = GT_SEPARATOR.split(gt)
+    for i in range(0, len(parts), 2):
+        if parts[i] == '.' or parts[i] == '0':
+            continue
+        elif parts[i] == str(allele):
+            parts[i] = '1'
+        else:
+            parts[i] = '0'
+    return ('').join(parts)
+
+
+def is_ref(gt):
+    """
+    is the genotype homozygous reference? missing genotypes are not ref
+    """
+    alleles = GT_SEPARATOR.split(gt)[::2]
+    for a in alleles:
+        if a != '0':
+            return False
+    return True
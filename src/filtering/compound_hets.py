@@ -22,8 +22,9 @@ THE SOFTWARE.
 """
 
 import logging
-from itertools import combinations
-from utils.utils import common_elements
+from bisect import bisect_right
+
+from variants.consequences import MISSENSE_EQUIVALENT
 
 
 class CompoundHetScreen(object):
@@ -36,84 +37,172 @@ class CompoundHetScreen(object):
         self.family = family
 
     def screen_compound_hets(self):
-        # sort out compound hets
+        """
+        keep the compound het candidates which pair with at least one other
+        candidate in the same gene
+        """
         compound_het_passes = {}
-        for gn in self.candidate_variants['compound_hets'].keys():
-            # print(gn)
-            if len(self.candidate_variants['compound_hets'][gn].keys()) < 2:
-                for v in self.candidate_variants['compound_hets'][gn].keys():
+        for gn, candidates in self.candidate_variants['compound_hets'].items():
+            if len(candidates) < 2:
+                for v in candidates.keys():
                     logging.info(
                         v + " failed compound het screen: <2 vars in hgnc " + gn)
+                continue
+
+            varids = list(candidates.keys())
+            variants = [candidates[v]['variant'] for v in varids]
+            paired = []
+            for i, partner in enumerate(self.first_partners(variants)):
+                if partner is None:
+                    logging.info(varids[i] + " failed compound het screen: "
+                                             "no compatible variant in hgnc " +
+                                 gn)
+                else:
+                    paired.append((min(i, partner), i))
+            if len(paired) == 0:
+                continue
 
-            combs_to_screen = list(
-                combinations(
-                    self.candidate_variants['compound_hets'][gn].keys(), 2))
-            for pair in combs_to_screen:
-                var1 = self.candidate_variants['compound_hets'][gn][pair[0]][
-                    'variant']
-                var2 = self.candidate_variants['compound_hets'][gn][pair[1]][
-                    'variant']
-
-                if var1 != var2:
-                    if self.is_compound_pair(pair[0], var1, pair[1], var2):
-                        if not gn in compound_het_passes.keys():
-                            compound_het_passes[gn] = {}
-                        if not pair[0] in compound_het_passes[gn].keys():
-                            compound_het_passes[gn][pair[0]] = {}
-                        if not pair[1] in compound_het_passes[gn].keys():
-                            compound_het_passes[gn][pair[1]] = {}
-
-                        compound_het_passes[gn][pair[0]]['variant'] = var1
-                        compound_het_passes[gn][pair[0]]['mode'] = \
-                            self.candidate_variants['compound_hets'][gn][
-                                pair[0]][
-                                'mode']
-                        compound_het_passes[gn][pair[1]]['variant'] = var2
-                        compound_het_passes[gn][pair[1]]['mode'] = \
-                            self.candidate_variants['compound_hets'][gn][
-                                pair[1]][
-                                'mode']
+            # list variants in the order that screening each pair in turn
+            # would first find them
+            compound_het_passes[gn] = {}
+            for first, i in sorted(paired):
+                compound_het_passes[gn][varids[i]] = {
+                    'variant': variants[i],
+                    'mode': candidates[varids[i]]['mode']}
 
         self.candidate_variants['compound_hets'] = compound_het_passes
 
+    def first_partners(self, variants):
+        """
+        for each variant in a gene the index of the first other variant it
+        could be a compound het with, None if there isn't one
+        """
+        if self.family.has_no_parents():
+            return self.first_partners_no_parents(variants)
+        elif self.family.has_both_parents():
+            return self.first_partners_both_parents(variants)
+        # todo screening of compound hets with one parent
+        return [None] * len(variants)
+
+    def first_partners_no_parents(self, variants):
+        """
+        without parents a pair fails if both variants are missense or
+        equivalent or if they are in the same phase set
+        """
+        pids = [var.pid for var in variants]
+        allvars = list(range(len(variants)))
+        not_missense = [i for i in allvars if not
+                        variants[i].consequence_mask & MISSENSE_EQUIVALENT]
+
+        def firsts(indices):
+            # the first variant, and the first in a different phase set
+            if len(indices) == 0:
+                return None, None
+            for i in indices:
+                if pids[i] != pids[indices[0]]:
+                    return indices[0], i
+            return indices[0], None
+
+        firsts_all = firsts(allvars)
+        firsts_not_missense = firsts(not_missense)
+
+        partners = []
+        for i, var in enumerate(variants):
+            if var.consequence_mask & MISSENSE_EQUIVALENT:
+                indices = not_missense
+                first, other_pid = firsts_not_missense
+            else:
+                indices = allvars
+                first, other_pid = firsts_all
+            if first is None:
+                partners.append(None)
+            elif pids[i] == '.':
+                # unphased, any other variant will do
+                if first != i:
+                    partners.append(first)
+                elif len(indices) > 1:
+                    partners.append(indices[1])
+                else:
+                    partners.append(None)
+            elif pids[first] != pids[i]:
+                partners.append(first)
+            else:
+                partners.append(other_pid)
+        return partners
+
+    def first_partners_both_parents(self, variants):
+        """
+        with both parents whether two variants pair only depends on a few of
+        their properties. Variants are grouped on these and each pair of
+        groups is tested once
+        """
+        groups = {}
+        for i, var in enumerate(variants):
+            groups.setdefault(self.pair_group(var), []).append(i)
+        groups = list(groups.values())
+        # pairs[a][b] - the first variant of a pair in group a pairs with the
+        # second in group b
+        pairs = [[self.pair_failure(variants[a[0]], variants[b[0]]) is None
+                  for b in groups] for a in groups]
+
+        partners = [None] * len(variants)
+        for a, agroup in enumerate(groups):
+            for b, bgroup in enumerate(groups):
+                if not (pairs[a][b] or pairs[b][a]):
+                    continue
+                for i in agroup:
+                    partner = None
+                    if pairs[b][a] and bgroup[0] < i:
+                        partner = bgroup[0]
+                    elif pairs[a][b]:
+                        later = bisect_right(bgroup, i)
+                        if later < len(bgroup):
+                            partner = bgroup[later]
+                    if partner is not None and (partners[i] is None or
+                                                partner < partners[i]):
+                        partners[i] = partner
+        return partners
+
+    def pair_group(self, var):
+        """
+        the properties of a variant which decide whether it pairs with
+        another when there are both parents
+        """
+        return (var.chrom == 'X', var.is_cnv(), var.triogenotype,
+                var.dnm == True, var.cn == 1)
+
     def is_compound_pair(self, varid1, var1, varid2, var2):
         """
         Test to see if a pair of variants could be a compound het
         """
+        failure = self.pair_failure(var1, var2)
+        if failure is None:
+            return True
+        logging.info(varid1 + " " + varid2 + " " + failure)
+        return False
 
+    def pair_failure(self, var1, var2):
+        """
+        Why a pair of variants can't be a compound het, None if they can
+        """
         if self.family.has_no_parents():
             # If there are no parents and the variants are not both missense
             # or in frame del/ins then pass
-            missense_equiv = ['missense_variant', 'inframe_deletion',
-                              'inframe_insertion']
-            var1cqs = var1.consequence.split('&')
-            var2cqs = var2.consequence.split('&')
-            var1_missense_equiv = common_elements(missense_equiv, var1cqs)
-            var2_missense_equiv = common_elements(missense_equiv, var2cqs)
-            if len(var1_missense_equiv) > 0 and len(var2_missense_equiv) > 0:
-            # if var1.consequence.find(
-            #         "missense_variant") and var2.consequence.find(
-            #     "missense_variant"):
-                logging.info(varid1 + " " + varid2
-                             + " failed compound het screen, no parents and "
-                               "both missense or equivalent")
-                return False
+            if var1.consequence_mask & MISSENSE_EQUIVALENT and \
+                    var2.consequence_mask & MISSENSE_EQUIVALENT:
+                return "failed compound het screen, no parents and both " \
+                       "missense or equivalent"
             elif (var1.pid != '.' and var2.pid != '.') and (
                     var1.pid == var2.pid):
-                logging.info(varid1 + " " + varid2 + " failed compound het "
-                                                     "screen, variants in cis")
-                return False
-
+                return "failed compound het screen, variants in cis"
             else:
-                return True
+                return None
         elif self.family.has_both_parents():
             if var1.chrom == 'X' and not self.family.dad.get_affected_status() and \
                     (var1.get_dad_genotype() == '0' or
                      var2.get_dad_genotype() == '0'):
-                logging.info(varid1 + " " + varid2
-                             + " failed compound het screen, X chrom and dad "
-                               "unaffected and hom ref for 1 variant")
-                return False
+                return "failed compound het screen, X chrom and dad " \
+                       "unaffected and hom ref for 1 variant"
             elif var1.triogenotype in ['201', '210'] or var1.triogenotype in [
                 '201', '210']:
                 # triogenotype of 201 or 210 only passes is one variant is a
@@ -125,27 +214,23 @@ class CompoundHetScreen(object):
                     varcnv = var2
                     varsnv = var1
                 else:
-                    logging.info(varid1 + " " + varid2
-                                 + " failed compound het screen, homozygous on "
-                                   "one alllle and other allele not CNV")
-                if varcnv.cn == '1':
+                    return "failed compound het screen, homozygous on one " \
+                           "alllle and other allele not CNV"
+                if varcnv.cn == 1:
                     if varsnv.triogenotype == '201' and \
                             varcnv.triogenotype == 'DELDELREF':
-                        return True
+                        return None
                     elif varsnv.triogenotype == '210' and \
                             varcnv.triogenotype == 'DELREFDEL':
-                        return True
+                        return None
                     else:
-                        logging.info(
-                            varid1 + " " + varid2
-                            + " failed compound het screen, CNV and SNV pair "
-                              "with triogenotypes not consistant with "
-                              "compound het")
+                        return "failed compound het screen, CNV and SNV " \
+                               "pair with triogenotypes not consistant with " \
+                               "compound het"
                 else:
-                    logging.info(varid1 + " " + varid2
-                                 + " failed compound het screen, homozygous on "
-                                   "one alllle and other allele not CNV with "
-                                   "copy number of 1")
+                    return "failed compound het screen, homozygous on one " \
+                           "alllle and other allele not CNV with copy " \
+                           "number of 1"
 
             elif (var1.get_mum_genotype() == '0' and
                   var2.get_mum_genotype() != '0' and
@@ -156,7 +241,7 @@ class CompoundHetScreen(object):
                      var2.get_dad_genotype() != '0' and
                      var1.get_dad_genotype() == '0'):
                 # one variant is inherited from each parent
-                return True
+                return None
             elif (var1.dnm == True and \
                   var2.get_mum_genotype() != '0' and \
                   var2.get_dad_genotype() == '0') or \
@@ -170,11 +255,9 @@ class CompoundHetScreen(object):
                      var1.get_mum_genotype() == '0' and \
                      var1.get_dad_genotype() != '0'):
                 # one variant is DNM and the other is inherited
-                return True
+                return None
             else:
-                logging.info(
-                    varid1 + " " + varid2 + " failed compound het screen")
-                return False
+                return "failed compound het screen"
 
         elif self.family.has_dad():
             pass
@@ -187,5 +270,4 @@ class CompoundHetScreen(object):
                 "one or no parents")
             logging.error("Can't parse compound hets - family error")
             exit(1)
-        logging.info(varid1 + " " + varid2 + " failed compound het screen")
-        return False
+        return "failed compound het screen"
@@ -21,62 +21,110 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-from file_loading.load_genes_and_regions import load_genes
-from file_loading.load_vcfs import load_variants
+from file_loading.load_genes_and_regions import panel_regions
+from file_loading.load_vcfs import load_variants, INFO_FIELDS, FORMAT_FIELDS
+from genes.gene_panel import GenePanel
 from variants.trio_genotype import add_trio_genotypes
-from filtering.preinheritance_filtering import PreInheritanceFiltering
+from filtering.preinheritance_filtering import PreInheritanceFiltering, \
+    RecordFilter, needs_parental_genotypes
 from filtering.inheritance_filtering import InheritanceFiltering
-from filtering.inheritance_cnv import CNVFiltering
+from filtering.inheritance_cnv import CNVFiltering, LARGE_CNV_LENGTH
 from filtering.postinheritance_filter import PostInheritanceFiltering
 from filtering.inheritance_report import InheritanceReport
 from filtering.compound_hets import CompoundHetScreen
 
+# bases either side of each panel gene that are loaded, covers the variants
+# VEP assigns to a gene up and downstream of it
+PANEL_REGION_PADDING = 5000
+
+
+def get_vcf_regions(genes, known_regions, trusted_variants,
+                    use_panel_regions=True):
+    """
+    if genes, regions or variants files are present we can create a list of
+    regions to load and therefore load fewer variants. Returns None if the
+    whole VCF must be loaded
+    """
+    vcfregions = None
+
+    if use_panel_regions and isinstance(genes, GenePanel):
+        # only variants in or near panel genes can pass the gene filters,
+        # apart from large CNVs which pass whatever genes they cover
+        vcfregions = panel_regions(genes, PANEL_REGION_PADDING,
+                                   LARGE_CNV_LENGTH)
+
+    if known_regions:
+        # TODO add regions to the vcfregions set
+        pass
+
+    if trusted_variants:
+        # TODO add trusted variants locations to the vcfregions set
+        pass
+
+    return vcfregions
+
+
+def get_record_filter(audit=False):
+    """
+    the pre-inheritance filters which depend on the child alone, applied as
+    the child's VCF is read. In audit mode every variant is loaded so that
+    the reason each one fails is logged, and None is returned
+    """
+    if audit:
+        return None
+    return RecordFilter(INFO_FIELDS, FORMAT_FIELDS)
+
 
 class Filter(object):
     """
     Class for filtering variants
     """
 
-    def __init__(self, family, known_genes, known_regions,
-                 trusted_variants, outdir):
+    def __init__(self, family, genes, known_regions,
+                 trusted_variants, outdir, vcf_reader='native',
+                 use_panel_regions=True, variant_cache=None, audit=False):
         self.family = family
-        self.known_genes = known_genes
+        # the gene panel is loaded once per run and shared between families
+        self.genes = genes
         self.known_regions = known_regions
         self.trusted_variants = trusted_variants
         self.outdir = outdir
+        self.vcf_reader = vcf_reader
+        self.use_panel_regions = use_panel_regions
+        self.variant_cache = variant_cache
+        self.audit = audit
         self.candidate_variants = None
         self.candidate_variants = {'single_variants': {}, 'compound_hets': {}}
         self.inhreport = None
         self.inhreport = InheritanceReport()
         self.screened_candidate_variants = {}
 
-    def filter_trio(self):
+    def filter_trio(self, variants=None):
         """
-        filter each trio
+        filter each trio. The trio's variants are loaded unless they are
+        given, eg when they have been loaded from a cohort VCF
         """
-        # if genes, regions or variants files are present we can create a list
-        # of regions to load and therefore load fewer variants
-        vcfregions = set()
-        genes = None
+        genes = self.genes
         regions = None
         trusted_variants = None
 
-        if self.known_genes:
-            genes = load_genes(self.known_genes)
-
         if self.known_regions:
-            # TODO add regions to the vcfregions set and populate regions variable
+            # TODO populate regions variable
             pass
 
         if self.trusted_variants:
-            # TODO add trusted variants locations to the vcfregions set and populate
-            # trusted_regions variable
+            # TODO populate trusted_regions variable
             pass
 
-        if len(vcfregions) > 0:
-            variants = load_variants(self.family, self.outdir, vcfregions)
-        else:
-            variants = load_variants(self.family, self.outdir)
+        if variants is None:
+            vcfregions = get_vcf_regions(genes, self.known_regions,
+                                         self.trusted_variants,
+                                         self.use_panel_regions)
+            variants = load_variants(self.family, vcfregions, self.vcf_reader,
+                                     cache=self.variant_cache,
+                                     parent_lookup=needs_parental_genotypes,
+                                     record_filter=get_record_filter(
+                                         self.audit))
 
         # add trio genotypes for each variant
         add_trio_genotypes(self.family, variants)
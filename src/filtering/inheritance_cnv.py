@@ -23,9 +23,13 @@ THE SOFTWARE.
 
 import logging
 
+from genes.gene_panel import GenePanel
 from utils.utils import add_single_var_to_candidates
 from utils.utils import add_compound_het_to_candidates
 
+# CNVs longer than this pass regardless of the genes they cover
+LARGE_CNV_LENGTH = 1000000
+
 
 class CNVFiltering(object):
     """
@@ -156,7 +160,7 @@ class CNVFiltering(object):
             varid].cnv_inh == 'maternal_inh' and self.mum_aff:
             return True
         elif self.variants['child'][varid].cnv_inh == 'biparental_inh' and \
-                self.variants['child'][varid].cn == '0':
+                self.variants['child'][varid].cn == 0:
             return True
         elif self.variants['child'][varid].cnv_inh == 'biparental_inh' and (
                 self.mum_aff or self.dad_aff):
@@ -173,7 +177,7 @@ class CNVFiltering(object):
         Identify CNVS which could be in compound hets
         """
         # return True or False for pass or fail
-        desired_cn = ['1', '3']
+        desired_cn = [1, 3]
         # could the CNV be part of a compound het? If so, add to candidate
         # compound hets
         if not self.variants['child'][varid].cn in desired_cn:
@@ -194,7 +198,7 @@ class CNVFiltering(object):
                                                    self.candidate_variants)
                 return True
             elif 'Hemizygous' in modes.keys() and self.variants['child'][
-                varid].cn == '1' and self.family.proband.sex == 'XY':
+                varid].cn == 1 and self.family.proband.sex == 'XY':
                 for hgncid in modes['Hemizygous']:
                     self.variants['child'][varid].reportable_symbol.append(
                         self.genes[hgncid]['symbol'])
@@ -213,7 +217,8 @@ class CNVFiltering(object):
         """
         CNVs of >1M pass regardless of gene content
         """
-        if int(self.variants['child'][varid].cnv_length) > 1000000:
+        cnv_length = self.variants['child'][varid].cnv_length
+        if cnv_length is not None and cnv_length > LARGE_CNV_LENGTH:
             add_single_var_to_candidates(varid, self.variants['child'][varid],
                                          '-', '-',
                                          self.candidate_variants)
@@ -226,14 +231,11 @@ class CNVFiltering(object):
         CNV DDG2P filter
         """
         cnvpass = False
+        cnvstart = int(self.variants['child'][varid].pos)
         # get all genes covered by the CNV and go through each one at a time to
         # see if any pass
-        hgncids = self.variants['child'][varid].hgnc_id_all.split("|")
-        for hid in hgncids:
+        for hgncid in self.get_cnv_genes(varid):
             surrounding_dup = False
-            hgncid = hid[5:]
-            if not hgncid in self.genes.keys():
-                continue
             # fail duplications completely surrounding surround monoallelic,
             # hemizygous and x-linked dominant genes with loss of function
             # mechanism
@@ -245,11 +247,10 @@ class CNVFiltering(object):
                     {"Monoallelic", "Hemizygous", "X-linked dominant"})
                 if "Loss of function" in self.genes[hgncid][
                     'mechanism'] and len(
-                    set.intersection(self.genes[hgncid]['mode'],
-                                     dupmodes)) > 0:
-                    if (int(self.variants['child'][varid].pos) < int(
+                    self.genes[hgncid]['mode'] & dupmodes) > 0:
+                    if (cnvstart < int(
                             self.genes[hgncid]['start'])) and (
-                            int(self.variants['child'][varid].cnv_end) > int(
+                            self.variants['child'][varid].cnv_end > int(
                         self.genes[hgncid]['end'])):
                         logging.info(
                             varid + " duplication completely surrounds "
@@ -260,12 +261,12 @@ class CNVFiltering(object):
 
             # Biallelic gene pass if copy number (CN) = 0 and mechanism in
             # "Uncertain", "Loss of function", "Dominant negative"
-            if int(self.variants['child'][varid].cn) == 0 and "Biallelic" in \
+            if self.variants['child'][varid].cn == 0 and "Biallelic" in \
                     self.genes[hgncid]['mode']:
                 biallelicmechs = set(
                     {"Uncertain", "Loss of function", "Dominant negative"})
-                if len(set.intersection(self.genes[hgncid]['mechanism'],
-                                        biallelicmechs)) > 0:
+                if len(self.genes[hgncid]['mechanism'] &
+                       biallelicmechs) > 0:
                     cnvpass = True
                     self.variants['child'][varid].reportable_symbol.append(
                         self.genes[hgncid]['symbol'])
@@ -278,7 +279,7 @@ class CNVFiltering(object):
                     return cnvpass
             # Monoallelic, X-linked dominant or Hemizygous in male pass if
             # CN=0, 1 or 3 and any mechanism
-            cns_wanted = ['0', '1', '3']
+            cns_wanted = [0, 1, 3]
             if not surrounding_dup == True:
                 if "Monoallelic" in self.genes[hgncid][
                     'mode'] or "X-linked dominant" in self.genes[hgncid][
@@ -315,7 +316,7 @@ class CNVFiltering(object):
                     'mode'] and self.family.proband.sex == 'XX' and \
                         "Increased gene dosage" in \
                         self.genes[hgncid]['mechanism'] and \
-                        self.variants['child'][varid].cn == '3':
+                        self.variants['child'][varid].cn == 3:
                     cnvpass = True
                     self.variants['child'][varid].reportable_symbol.append(
                         self.genes[hgncid]['symbol'])
@@ -334,9 +335,9 @@ class CNVFiltering(object):
                     'mode'] or "X-linked dominant" in self.genes[hgncid][
                         'mode']) and "Loss of function" in self.genes[hgncid][
                     'mechanism']:
-                    if int(self.variants['child'][varid].pos) > int(
-                            self.genes[hgncid]['start']) or int(
-                        self.variants['child'][varid].cnv_end) < int(
+                    if cnvstart > int(
+                            self.genes[hgncid]['start']) or \
+                            self.variants['child'][varid].cnv_end < int(
                         self.genes[hgncid]['end']):
                         cnvpass = True
                         self.variants['child'][varid].reportable_symbol.append(
@@ -356,13 +357,27 @@ class CNVFiltering(object):
     def get_ddg2p_modes(self, varid):
         modes = {}
         # when a gene list is given, find the modes of all
-        hgncids = self.variants['child'][varid].hgnc_id_all.split("|")
-        for hid in hgncids:
+        for hgncid in self.get_cnv_genes(varid):
+            genemodes = self.genes[hgncid]['mode']
+            for m in genemodes:
+                if m not in modes.keys():
+                    modes[m] = []
+                modes[m].append(hgncid)
+        return modes
+
+    def get_cnv_genes(self, varid):
+        """
+        Known genes covered by a CNV. With a gene panel these are found from
+        the CNV's coordinates, otherwise from its HGNC_ID_ALL annotation
+        """
+        var = self.variants['child'][varid]
+        if isinstance(self.genes, GenePanel):
+            start = int(var.pos)
+            end = var.cnv_end if var.cnv_end is not None else start
+            return self.genes.overlapping(var.chrom, start, end)
+        hgncids = []
+        for hid in var.hgnc_id_all.split("|"):
             hgncid = hid[5:]
             if hgncid in self.genes.keys():
-                genemodes = self.genes[hgncid]['mode']
-                for m in genemodes:
-                    if m not in modes.keys():
-                        modes[m] = []
-                    modes[m].append(hgncid)
-        return modes
+                hgncids.append(hgncid)
+        return hgncids
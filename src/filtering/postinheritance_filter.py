@@ -52,11 +52,11 @@ class PostInheritanceFiltering(object):
                     'variant'].ddd_af
                 max_af = self.candidate_variants['single_variants'][v][
                     'variant'].max_af
-                if ddd_af == '.':
-                    ddd_af = '0'
-                if max_af == '.':
-                    max_af = '0'
-                maximum_af = max(float(ddd_af), float(max_af))
+                if ddd_af is None:
+                    ddd_af = 0
+                if max_af is None:
+                    max_af = 0
+                maximum_af = max(ddd_af, max_af)
 
                 if self.family.has_both_parents() and maximum_af >= 0.0005:
                     del self.candidate_variants['single_variants'][v]
@@ -76,40 +76,31 @@ class PostInheritanceFiltering(object):
         Filter on AC_het and AC_hemi
         """
         for v in list(self.candidate_variants['single_variants'].keys()):
+            var = self.candidate_variants['single_variants'][v]['variant']
             if self.candidate_variants['single_variants'][v][
                 'mode'] == 'Monoallelic':
-                if int(self.candidate_variants['single_variants'][v][
-                           'variant'].AC_het) > 4:
+                if var.AC_het > 4:
                     del self.candidate_variants['single_variants'][v]
                     logging.info(
                         v + " failed post-inhertance AC_het filter for "
-                            "monoallelic genes " +
-                        self.candidate_variants['single_variants'][v][
-                            'variant'].AC_het)
+                            "monoallelic genes " + str(var.AC_het))
+                    continue
             if self.candidate_variants['single_variants'][v][
                 'mode'] == 'Hemizygous' and \
                     self.candidate_variants['single_variants'][v][
                         'sex'] == "XY":
-                if int(self.candidate_variants['single_variants'][v][
-                           'variant'].AC_hemi) > 0:
+                if var.AC_hemi > 0:
                     del self.candidate_variants['single_variants'][v]
                     logging.info(
                         v + " failed post-inhertance AC_hemi filter for "
-                            "monoallelic genes " +
-                        self.candidate_variants['single_variants'][v][
-                            'variant'].AC_hemi)
+                            "monoallelic genes " + str(var.AC_hemi))
+                    continue
             if self.candidate_variants['single_variants'][v][
                 'mode'] == 'X-linked dominant':
-                AC_total = int(self.candidate_variants['single_variants'][v][
-                                   'variant'].AC_het) + int(
-                    self.candidate_variants['single_variants'][v][
-                        'variant'].AC_hemi)
+                AC_total = var.AC_het + var.AC_hemi
                 if AC_total > 4:
                     del self.candidate_variants['single_variants'][v]
                     logging.info(
                         v + " failed post-inhertance AC_hemi filter for "
-                            "X linked dominant genes " +
-                        self.candidate_variants['single_variants'][v][
-                            'variant'].AC_het + " + " +
-                        self.candidate_variants['single_variants'][v][
-                            'variant'].AC_hemi)
+                            "X linked dominant genes " + str(var.AC_het) +
+                        " + " + str(var.AC_hemi))
@@ -23,7 +23,101 @@ THE SOFTWARE.
 
 import logging
 
-from utils.utils import common_elements
+from variants.consequences import FUNCTIONAL, MISSENSE, consequence_mask
+from variants.variant import parse_numeric
+
+# ALT alleles of CNVs, all other records are SNVs
+CNV_ALTS = ('<DEL>', '<DUP>')
+
+
+def needs_parental_genotypes(childvar):
+    """
+    Parental genotypes are only used for the child SNVs that pass the
+    pre-inheritance filters which depend on the child alone (all but the DNM
+    filter), so the parents' VCFs only need to be read at these
+    """
+    return childvar.is_snv() and quality_failure(childvar) is None and \
+        revel_failure(childvar) is None and X_maf_failure(childvar) is None
+
+
+class RecordFilter(object):
+    """
+    The pre-inheritance filters which depend on the child alone, compiled to
+    test the records read from the child's VCF so that variants which fail
+    them are never created. Records are CHROM, POS, REF, ALT, the INFO
+    fields then the FORMAT fields. The filters are the same functions as
+    used by PreInheritanceFiltering, applied to the record's values.
+    Malformed values are treated as missing without a warning, which is
+    logged once when a kept record is made into a variant
+    """
+
+    def __init__(self, infofields, formatfields):
+        info = {inf: i + 4 for i, inf in enumerate(infofields)}
+        self.consequence = info['Consequence']
+        self.max_af = info['MAX_AF']
+        self.ddd_af = info['DDD_AF']
+        self.ddd_father_af = info['DDD_father_AF']
+        self.revel = info['REVEL']
+        self.pp_trio_dnm2 = info['pp_trio_DNM2']
+        self.pp_dng = info['pp_DNG']
+        self.gq = 4 + len(infofields) + formatfields.index('GQ')
+
+    def keep_site(self, record):
+        """
+        does a record pass the filters on its INFO fields? The record only
+        needs CHROM, POS, REF, ALT and the INFO fields. CNVs are always kept,
+        they are filtered separately
+        """
+        if record[3] in CNV_ALTS:
+            return True
+        values = RecordValues(record[0])
+        values.consequence = record[self.consequence]
+        values.consequence_mask = consequence_mask(values.consequence)
+        values.max_af = parse_numeric('max_af', record[self.max_af], float,
+                                      False)
+        values.ddd_af = parse_numeric('ddd_af', record[self.ddd_af], float,
+                                      False)
+        values.ddd_father_af = parse_numeric(
+            'ddd_father_af', record[self.ddd_father_af], float, False)
+        values.revel = parse_numeric('revel', record[self.revel], float,
+                                     False)
+        values.dnm = record[self.pp_trio_dnm2] != '.' or \
+            record[self.pp_dng] != '.'
+        return quality_failure(values) is None and \
+            revel_failure(values) is None and X_maf_failure(values) is None
+
+    def keep_sample(self, record):
+        """
+        does a whole record, including the child's FORMAT fields, pass the
+        filters on the FORMAT fields?
+        """
+        if record[3] in CNV_ALTS:
+            return True
+        values = RecordValues(record[0])
+        values.gq = parse_numeric('gq', record[self.gq], int, False)
+        return gq_failure(values) is None
+
+
+class RecordValues(object):
+    """
+    The values of a VCF record used by the child's pre-inheritance filters,
+    in the same form as the attributes of a variant
+    """
+    __slots__ = ('chrom', 'consequence', 'consequence_mask', 'max_af',
+                 'ddd_af', 'ddd_father_af', 'revel', 'dnm', 'gq')
+
+    def __init__(self, chrom):
+        if chrom.startswith('Chr') or chrom.startswith('chr'):
+            chrom = chrom[3:]
+        self.chrom = chrom
+        self.consequence = '.'
+        self.consequence_mask = 0
+        self.max_af = None
+        self.ddd_af = None
+        self.ddd_father_af = None
+        self.revel = None
+        self.dnm = False
+        self.gq = None
 
 
 class PreInheritanceFiltering(object):
@@ -39,129 +133,115 @@ class PreInheritanceFiltering(object):
         self.variants = variants
 
     def preinheritance_filter(self):
-
-        variants_per_gene = self.create_variants_per_gene()
-        self.revel_filter(variants_per_gene)
-        self.dnms_filter(variants_per_gene)
-        self.X_maf_filter(variants_per_gene)
-        return variants_per_gene
-
-    def create_variants_per_gene(self):
+        """
+        apply all of the pre-inheritance filters to each child variant in a
+        single pass and group the variants that pass by hgnc_id
+        """
         variants_per_gene = {}
-        consequences = ['frameshift_variant', 'missense_variant',
-                        'splice_donor_variant', 'splice_acceptor_variant',
-                        'start_lost', 'stop_gained', 'protein_altering_variant',
-                        'transcript_ablation', 'transcript_amplification',
-                        'inframe_insertion', 'inframe_deletion', 'stop_lost']
+        mumvars = self.variants['mum']
+        dadvars = self.variants['dad']
 
-        for v in self.variants['child'].keys():
+        for v, childvar in self.variants['child'].items():
             # we only want SNVs in variants per gene
-            if not self.variants['child'][v].is_snv():
+            if not childvar.is_snv():
                 continue
-
-            # fail if child GQ < 40
-            if int(self.variants['child'][v].gq) < 40 and \
-                    self.variants['child'][
-                        v].chrom not in ['X', 'Y']:
-                logging.info(
-                    v + " failed low GQ: " + self.variants['child'][v].gq)
+            failure = quality_failure(childvar) or revel_failure(childvar) \
+                or dnm_failure(childvar) or X_maf_failure(childvar)
+            if failure is not None:
+                logging.info(v + " " + failure)
                 continue
 
-            # fail if DDD_AF > 0.005 (gnomAD AF variants above this threshold
-            # are not loaded)
-            if float(self.variants['child'][v].ddd_af) > 0.005:
-                logging.info(
-                    v + " failed high DDD AF: " + self.variants['child'][
-                        v].ddd_af)
-                continue
+            # genes are listed in the order of their first passing variant,
+            # so the result is the same whether variants which fail the
+            # child's filters were loaded or rejected as the VCF was read
+            hgncid = childvar.hgnc_id
+            genevars = variants_per_gene.get(hgncid)
+            if genevars is None:
+                genevars = variants_per_gene[hgncid] = {}
+            genevars[v] = {'child': childvar}
+            if v in mumvars:
+                genevars[v]['mum'] = mumvars[v]
+            if v in dadvars:
+                genevars[v]['dad'] = dadvars[v]
 
-            cqs = self.variants['child'][v].consequence.split('&')
-            coding_cqs = common_elements(cqs, consequences)
-            if len(coding_cqs) == 0:
-                logging.info(
-                    v + " failed, no functional consequences: " +
-                    self.variants['child'][
-                        v].consequence)
-                continue
+        return variants_per_gene
 
-            hgncid = cqs = self.variants['child'][v].hgnc_id
-            if not hgncid in variants_per_gene.keys():
-                variants_per_gene[hgncid] = {}
 
-            variants_per_gene[hgncid][v] = {}
-            variants_per_gene[hgncid][v]['child'] = self.variants['child'][v]
-            if v in self.variants['mum'].keys():
-                variants_per_gene[hgncid][v]['mum'] = self.variants['mum'][v]
-            if v in self.variants['dad'].keys():
-                variants_per_gene[hgncid][v]['dad'] = self.variants['dad'][v]
+def quality_failure(childvar):
+    """
+    Fail variants with GQ < 40 in an autosome, DDD_AF > 0.005 or no
+    functional consequence. Returns why the variant fails, None if it passes
+    """
+    failure = gq_failure(childvar)
+    if failure is not None:
+        return failure
 
-        return variants_per_gene
+    # fail if DDD_AF > 0.005 (gnomAD AF variants above this threshold
+    # are not loaded)
+    ddd_af = childvar.ddd_af
+    if ddd_af is not None and ddd_af > 0.005:
+        return "failed high DDD AF: " + str(ddd_af)
 
-    def revel_filter(self, variants_per_gene):
-        """
-        Remove missense variants with REVEL < 0.5 unless DNM
-        """
-        for gn in list(variants_per_gene.keys()):
-            for varid in list(variants_per_gene[gn].keys()):
-                childvar = variants_per_gene[gn][varid]['child']
-                if childvar.dnm == True:
-                    continue
-                elif childvar.consequence.find("missense_variant") == -1:
-                    continue
-                elif childvar.revel == '.':
-                    continue
-                else:
-                    revel = float(childvar.revel)
-                    if revel < 0.4:
-                        logging.info(
-                            varid + " failed REVEL filter: " + str(revel))
-                        del variants_per_gene[gn][varid]
-                        if len(variants_per_gene[gn].keys()) < 1:
-                            del variants_per_gene[gn]
-
-    def dnms_filter(self, variants_per_gene):
-        """
-        Remove DNMs that don't pass filters
-        """
-        for gn in list(variants_per_gene.keys()):
-            for varid in list(variants_per_gene[gn].keys()):
-                childvar = variants_per_gene[gn][varid]['child']
-                if (
-                        childvar.triogenotype == '100' or childvar.triogenotype == '200') and childvar.dnm == False:
-                    logging.info(
-                        varid + " triogenotype = " + childvar.triogenotype
-                        + " and failed DNM filter")
-                    del variants_per_gene[gn][varid]
-                    if len(variants_per_gene[gn].keys()) < 1:
-                        del variants_per_gene[gn]
-
-    def X_maf_filter(self, variants_per_gene):
-        """
-        Variants in X have more stringent allele frequencies - fail if
-        gnomad > 0.000001 or DDD unaffected father > 0
-        This is in a separate function for clarity and ease of modification
-        """
-        for gn in list(variants_per_gene.keys()):
-            for varid in list(variants_per_gene[gn].keys()):
-                childvar = variants_per_gene[gn][varid]['child']
-                if childvar.chrom == 'X':
-                    max_af = childvar.max_af
-                    if max_af == '.':
-                        max_af = '0'
-                    ddd_father_af = childvar.ddd_father_af
-                    if ddd_father_af == '.':
-                        ddd_father_af = '0'
-                    if float(max_af) > 0.000001:
-                        logging.info(varid + " failed X chromosome allele "
-                                             "frequency: gnomad AF = " + str(
-                            max_af))
-                        del variants_per_gene[gn][varid]
-                        if len(variants_per_gene[gn].keys()) < 1:
-                            del variants_per_gene[gn]
-                    elif float(ddd_father_af) > 0:
-                        logging.info(varid + " failed X chromosome allele "
-                                             "frequency: DDD unaffected father "
-                                             "AF = " + str(ddd_father_af))
-                        del variants_per_gene[gn][varid]
-                        if len(variants_per_gene[gn].keys()) < 1:
-                            del variants_per_gene[gn]
+    if not childvar.consequence_mask & FUNCTIONAL:
+        return "failed, no functional consequences: " + childvar.consequence
+
+    return None
+
+
+def gq_failure(childvar):
+    """
+    Fail variants with GQ < 40 in an autosome
+    """
+    gq = childvar.gq
+    if gq is not None and gq < 40 and childvar.chrom not in ['X', 'Y']:
+        return "failed low GQ: " + str(gq)
+    return None
+
+
+def revel_failure(childvar):
+    """
+    Fail missense variants with REVEL < 0.4 unless DNM
+    """
+    if childvar.dnm == True:
+        return None
+    elif not childvar.consequence_mask & MISSENSE:
+        return None
+    elif childvar.revel is None:
+        return None
+    elif childvar.revel < 0.4:
+        return "failed REVEL filter: " + str(childvar.revel)
+    return None
+
+
+def dnm_failure(childvar):
+    """
+    Fail DNMs that don't pass filters
+    """
+    if (childvar.triogenotype == '100' or
+            childvar.triogenotype == '200') and childvar.dnm == False:
+        return "triogenotype = " + childvar.triogenotype + \
+               " and failed DNM filter"
+    return None
+
+
+def X_maf_failure(childvar):
+    """
+    Variants in X have more stringent allele frequencies - fail if
+    gnomad > 0.000001 or DDD unaffected father > 0
+    This is in a separate function for clarity and ease of modification
+    """
+    if childvar.chrom != 'X':
+        return None
+    max_af = childvar.max_af
+    if max_af is None:
+        max_af = 0
+    ddd_father_af = childvar.ddd_father_af
+    if ddd_father_af is None:
+        ddd_father_af = 0
+    if max_af > 0.000001:
+        return "failed X chromosome allele frequency: gnomad AF = " + \
+               str(max_af)
+    elif ddd_father_af > 0:
+        return "failed X chromosome allele frequency: DDD unaffected " \
+               "father AF = " + str(ddd_father_af)
+    return None
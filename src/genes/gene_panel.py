@@ -0,0 +1,129 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from sys import intern
+
+
+class Gene(object):
+    """
+    Gene object: location, symbol and the status, modes and mechanisms from
+    all of the gene's entries in the gene list
+    """
+    __slots__ = ('chr', 'start', 'end', 'symbol', 'status', 'mode',
+                 'mechanism')
+
+    def __init__(self, chr, start, end, symbol, status, mode, mechanism):
+        self.chr = intern(chr)
+        self.start = int(start)
+        self.end = int(end)
+        self.symbol = symbol
+        self.status = frozenset(status)
+        self.mode = frozenset(mode)
+        self.mechanism = frozenset(mechanism)
+
+    def __reduce__(self):
+        # pickle as constructor arguments, much smaller and faster to load
+        # than the slot state
+        return (Gene, (self.chr, self.start, self.end, self.symbol,
+                       self.status, self.mode, self.mechanism))
+
+    def __repr__(self):
+        return 'Gene(chr="{}", start={}, end={}, symbol="{}", status={}, ' \
+               'mode={}, mechanism={})'.format(self.chr, self.start, self.end,
+                                               self.symbol, set(self.status),
+                                               set(self.mode),
+                                               set(self.mechanism))
+
+    def __getitem__(self, key):
+        # genes can be used in the same way as a dict of gene data
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        return self.chr == other.chr and \
+               self.start == other.start and \
+               self.end == other.end and \
+               self.symbol == other.symbol and \
+               self.status == other.status and \
+               self.mode == other.mode and \
+               self.mechanism == other.mechanism
+
+
+class GenePanel(Mapping):
+    """
+    Read-only mapping of HGNC id to Gene. A panel is loaded once per run and
+    shared by every family. intervals holds each chromosome's genes as
+    (start, end, hgnc_id) sorted by position, indexed by their starts and
+    the running maximum of their ends for overlap queries
+    """
+
+    def __init__(self, genes):
+        self.genes = dict(genes)
+        intervals = {}
+        for hgncid, gene in self.genes.items():
+            intervals.setdefault(gene.chr, []).append(
+                (gene.start, gene.end, hgncid))
+        self.intervals = {chrom: tuple(sorted(chromintervals))
+                          for chrom, chromintervals in intervals.items()}
+        self.starts = {}
+        self.max_ends = {}
+        for chrom, chromintervals in self.intervals.items():
+            self.starts[chrom] = [i[0] for i in chromintervals]
+            maxend = 0
+            maxends = []
+            for i in chromintervals:
+                maxend = max(maxend, i[1])
+                maxends.append(maxend)
+            self.max_ends[chrom] = maxends
+
+    def __repr__(self):
+        return 'GenePanel({} genes)'.format(len(self.genes))
+
+    def __getitem__(self, hgncid):
+        return self.genes[hgncid]
+
+    def __iter__(self):
+        return iter(self.genes)
+
+    def __len__(self):
+        return len(self.genes)
+
+    def __contains__(self, hgncid):
+        return hgncid in self.genes
+
+    def overlapping(self, chrom, start, end):
+        """
+        HGNC ids of the genes overlapping start-end (inclusive) in position
+        order. Genes before the first whose running maximum end reaches start
+        and from the first starting after end can't overlap, so only the
+        genes between them are checked
+        """
+        if chrom not in self.intervals:
+            return []
+        chromintervals = self.intervals[chrom]
+        first = bisect_left(self.max_ends[chrom], start)
+        last = bisect_right(self.starts[chrom], end)
+        return [i[2] for i in chromintervals[first:last] if i[1] >= start]
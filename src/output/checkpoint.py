@@ -0,0 +1,168 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+from urllib.parse import quote
+
+from file_loading.gene_panel_cache import source_checksum
+
+# bump when the checkpointed results change so that old checkpoints are not
+# used
+CHECKPOINT_VERSION = 1
+MANIFEST = 'manifest.jsonl'
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def code_version():
+    """
+    sha256 of the filtering code, results from other versions of the code are
+    not reused
+    """
+    checksum = hashlib.sha256()
+    for root, dirs, files in sorted(os.walk(SRC_DIR)):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                checksum.update(os.path.relpath(path, SRC_DIR).encode())
+                with open(path, 'rb') as f:
+                    checksum.update(f.read())
+    return checksum.hexdigest()
+
+
+def run_fingerprint(genes_file, options, input_files=None):
+    """
+    the parts of a run that all families' results depend on: the code, the
+    gene list, the options which change the results and any other input
+    files, a dict of option: file. Files are fingerprinted by their contents
+    """
+    files = {}
+    if input_files is not None:
+        for option, filename in input_files.items():
+            files[option] = source_checksum(filename) if filename else None
+    return {'version': CHECKPOINT_VERSION, 'code': code_version(),
+            'genes': source_checksum(genes_file) if genes_file else None,
+            'options': options, 'files': files}
+
+
+def vcf_fingerprint(path):
+    """
+    a VCF is taken to be unchanged if it has the same size and mtime
+    """
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+class Checkpoint(object):
+    """
+    Saves the results of each family in a checkpoint directory so that an
+    interrupted run can be resumed. Each family's results are pickled to
+    their own file and recorded in a manifest with a fingerprint of
+    everything they depend on. Results are only reused if the fingerprint
+    still matches
+    """
+
+    def __init__(self, checkpoint_dir, run):
+        self.checkpoint_dir = checkpoint_dir
+        self.run = run
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def fingerprint(self, family):
+        vcfs = []
+        for person in (family.proband, family.mum, family.dad):
+            if person is not None:
+                vcfs.append(vcf_fingerprint(person.get_vcf_path()))
+        return dict(self.run, family=repr(family), vcfs=vcfs)
+
+    def results_file(self, famid):
+        return os.path.join(self.checkpoint_dir,
+                            quote(famid, safe='') + '.pickle')
+
+    def load(self, families):
+        """
+        the saved results of families whose checkpoint is still valid
+        """
+        manifest = os.path.join(self.checkpoint_dir, MANIFEST)
+        if not os.path.exists(manifest):
+            return {}
+        entries = {}
+        with open(manifest) as m:
+            for line in m:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # an entry cut short when a run was killed
+                    continue
+                entries[entry['family']] = entry
+
+        results = {}
+        for famid, family in families.items():
+            if famid not in entries:
+                continue
+            fingerprint = self.fingerprint(family)
+            if entries[famid]['fingerprint'] != fingerprint:
+                logging.info(famid + " checkpoint is out of date")
+                continue
+            try:
+                with open(self.results_file(famid), 'rb') as f:
+                    saved = pickle.load(f)
+            except Exception as e:
+                logging.info(famid + " can't read checkpoint: " + str(e))
+                continue
+            if saved['fingerprint'] == fingerprint:
+                logging.info(famid + " results loaded from checkpoint")
+                results[famid] = saved['result']
+        return results
+
+    def save(self, famid, family, result):
+        """
+        save a family's results and add them to the manifest. The results are
+        written to a temporary file and moved into place so a killed run
+        never leaves partial results
+        """
+        fingerprint = self.fingerprint(family)
+        results_file = self.results_file(famid)
+        with tempfile.NamedTemporaryFile(
+                dir=self.checkpoint_dir,
+                prefix=os.path.basename(results_file) + '.',
+                delete=False) as f:
+            pickle.dump({'fingerprint': fingerprint, 'result': result}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, results_file)
+
+        entry = json.dumps({'family': famid, 'fingerprint': fingerprint,
+                            'results': os.path.basename(results_file)}) + "\n"
+        with open(os.path.join(self.checkpoint_dir, MANIFEST), 'a+b') as m:
+            # start a new line after an entry cut short when a run was
+            # killed, rather than joining this entry to it
+            if m.seek(0, os.SEEK_END) > 0:
+                m.seek(-1, os.SEEK_END)
+                if m.read(1) != b"\n":
+                    entry = "\n" + entry
+            m.write(entry.encode())
@@ -22,16 +22,34 @@ THE SOFTWARE.
 """
 
 import json
+import logging
 
+HEADER = ['family_id', 'proband', 'sex', 'mum', 'dad', 'mum_aff', 'dad_aff',
+          'triogenotype', 'chrom', 'pos', 'ref', 'alt', 'DNM', 'symbol',
+          'hgnc_id', 'transcript', 'canonical', 'MANE_SELECT',
+          'MANE_PLUS_CLINICAL', 'consequence', 'HGVSc', 'HGVSp',
+          'protein_position', 'polyphen', 'REVEL', 'max_af', 'ddd_af', 'GT',
+          'GQ', 'AD', 'cnv_length', 'cnv_copy_number', 'result', 'mode',
+          'mnv', 'phased_15bp', 'phased_any']
 
-def create_output(families, variants, inheritance_reports, outdir):
+
+def create_output(families, variants, inheritance_reports, outdir,
+                  report_format='json'):
     """
     Create output file
     Identify variants in both compound het and single variants dicts
     Identify and flag possible MNVs
     Flag variants in cis in monoallelic genes
     """
+    with ResultsWriter(families, outdir, report_format) as writer:
+        for fam in variants.keys():
+            writer.write_family(fam, variants[fam], inheritance_reports[fam])
+
 
+def output_files(families, outdir):
+    """
+    paths of the results and inheritance report files
+    """
     if len(families.keys()) > 1:
         outfile = outdir + "/" + "clinical_filter.txt"
         inhreportfile = outdir + "/" + "clinical_filter_inheritance_report.txt"
@@ -40,86 +58,124 @@ def create_output(families, variants, inheritance_reports, outdir):
         outfile = outdir + "/" + proband + "_clinical_filter.txt"
         inhreportfile = outdir + "/" + proband \
                         + "_clinical_filter_inheritance_report.txt"
+    return outfile, inhreportfile
 
-    header = ['family_id', 'proband', 'sex', 'mum', 'dad', 'mum_aff', 'dad_aff',
-              'triogenotype', 'chrom', 'pos', 'ref', 'alt', 'DNM', 'symbol',
-              'hgnc_id', 'transcript', 'canonical', 'MANE_SELECT',
-              'MANE_PLUS_CLINICAL', 'consequence', 'HGVSc', 'HGVSp',
-              'protein_position', 'polyphen', 'REVEL', 'max_af', 'ddd_af', 'GT',
-              'GQ', 'AD', 'cnv_length', 'cnv_copy_number', 'result', 'mode',
-              'mnv', 'phased_15bp', 'phased_any']
 
-    results = {}
-    inhreports = {}
+class ResultsWriter(object):
+    """
+    Writes the results of each family as soon as it has been filtered.
+    Each family's lines are written and flushed together so the output
+    always ends with a complete family. With the jsonl report format the
+    inheritance report is also written a family at a time, one JSON object
+    per line, otherwise the reports are written as one JSON object when the
+    writer is closed
+    """
 
-    for fam in variants.keys():
-        phasedvars, phased_varids = identify_phased_variants(variants[fam])
+    def __init__(self, families, outdir, report_format='json'):
+        if report_format not in ['json', 'jsonl']:
+            raise ValueError("Unknown report format: " + report_format +
+                             " should be 'json' or 'jsonl'")
+        self.families = families
+        self.report_format = report_format
+        self.inhreports = {}
+        outfile, inhreportfile = output_files(families, outdir)
+        self.out = open(outfile, 'w')
+        self.out.write(("\t").join(HEADER) + "\n")
+        self.out.flush()
+        self.reportout = open(inhreportfile, 'w')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(complete=exc_type is None)
+
+    def write_family(self, fam, filtered_variants, inheritance_report):
+        """
+        write the results and inheritance report of a family
+        """
+        variants = {fam: filtered_variants}
+        phasedvars, phased_varids = identify_phased_variants(filtered_variants)
         mnvs = identify_mnvs(phasedvars)
         variants_in_cis = identify_close_vars(phasedvars, 15)
+        results = create_output_data(fam, self.families, variants, mnvs,
+                                     variants_in_cis, phased_varids)
+        self.out.write("".join(format_line(results[var]) + "\n"
+                               for var in results.keys()))
+        self.out.flush()
+
+        if self.report_format == 'jsonl':
+            self.reportout.write(
+                json.dumps({fam: inheritance_report.__dict__}) + "\n")
+            self.reportout.flush()
+        else:
+            self.inhreports[fam] = inheritance_report.__dict__
+
+    def write_families(self, family_ids, results):
+        """
+        write the results of families as they are filtered, results are
+        (filtered variants, inheritance report) for each family in turn
+        """
+        for fam, result in zip(family_ids, results):
+            filtered_variants, inheritance_report = result
+            self.write_family(fam, filtered_variants, inheritance_report)
+
+    def close(self, complete=True):
+        """
+        finish the output. If the run failed (complete is False) the json
+        report isn't written, so that a partial report can't be mistaken
+        for a complete one
+        """
+        if self.report_format == 'json':
+            if complete:
+                self.reportout.write(json.dumps(self.inhreports) + "\n")
+            else:
+                logging.error("Run failed, inheritance report not written")
+        self.out.close()
+        self.reportout.close()
 
-        results[fam] = create_output_data(fam, families, variants, mnvs,
-                                          variants_in_cis,
-                                          phased_varids)
-
-        inhreports[fam] = inheritance_reports[fam].__dict__
-
-    print_output(results, header, outfile)
-    print_inh_reports(inhreports, inhreportfile)
-
-
-def print_output(results, header, outfile):
-    with open(outfile, 'w') as o:
-        o.write(("\t").join(header))
-        o.write("\n")
-
-        for fam in results.keys():
-            for var in results[fam].keys():
-                line = ("\t").join([results[fam][var]['family_id'],
-                                    results[fam][var]['proband'],
-                                    results[fam][var]['sex'],
-                                    results[fam][var]['mum'],
-                                    results[fam][var]['dad'],
-                                    results[fam][var]['mum_aff'],
-                                    results[fam][var]['dad_aff'],
-                                    results[fam][var]['triogenotype'],
-                                    results[fam][var]['chrom'],
-                                    results[fam][var]['pos'],
-                                    results[fam][var]['ref'],
-                                    results[fam][var]['alt'],
-                                    results[fam][var]['DNM'],
-                                    results[fam][var]['symbol'],
-                                    results[fam][var]['hgnc_id'],
-                                    results[fam][var]['transcript'],
-                                    results[fam][var]['canonical'],
-                                    results[fam][var]['MANE_SELECT'],
-                                    results[fam][var]['MANE_PLUS_CLINICAL'],
-                                    results[fam][var]['consequence'],
-                                    results[fam][var]['HGVSc'],
-                                    results[fam][var]['HGVSp'],
-                                    results[fam][var]['protein_position'],
-                                    results[fam][var]['polyphen'],
-                                    results[fam][var]['REVEL'],
-                                    results[fam][var]['max_af'],
-                                    results[fam][var]['ddd_af'],
-                                    results[fam][var]['GT'],
-                                    results[fam][var]['GQ'],
-                                    results[fam][var]['AD'],
-                                    results[fam][var]['cnv_length'],
-                                    results[fam][var]['cn'],
-                                    (",").join(results[fam][var]['result']),
-                                    (",").join(results[fam][var]['mode']),
-                                    results[fam][var]['mnv'],
-                                    str(results[fam][var]['phased_15bp']),
-                                    str(results[fam][var]['phased_any'])])
-                o.write(line)
-                o.write("\n")
-
-
-def print_inh_reports(inhreports, inhreportfile):
-    inhjson = json.dumps(inhreports)
-    with open(inhreportfile, 'w') as o:
-        o.write(inhjson)
-        o.write("\n")
+
+def format_line(result):
+    """
+    format the output line for a variant
+    """
+    return ("\t").join([result['family_id'],
+                        result['proband'],
+                        result['sex'],
+                        result['mum'],
+                        result['dad'],
+                        result['mum_aff'],
+                        result['dad_aff'],
+                        result['triogenotype'],
+                        result['chrom'],
+                        result['pos'],
+                        result['ref'],
+                        result['alt'],
+                        result['DNM'],
+                        result['symbol'],
+                        result['hgnc_id'],
+                        result['transcript'],
+                        result['canonical'],
+                        result['MANE_SELECT'],
+                        result['MANE_PLUS_CLINICAL'],
+                        result['consequence'],
+                        result['HGVSc'],
+                        result['HGVSp'],
+                        result['protein_position'],
+                        result['polyphen'],
+                        result['REVEL'],
+                        result['max_af'],
+                        result['ddd_af'],
+                        result['GT'],
+                        result['GQ'],
+                        result['AD'],
+                        result['cnv_length'],
+                        result['cn'],
+                        (",").join(result['result']),
+                        (",").join(result['mode']),
+                        result['mnv'],
+                        str(result['phased_15bp']),
+                        str(result['phased_any'])])
 
 
 def create_output_data(fam, families, variants, mnvs, variants_in_cis,
@@ -227,46 +283,48 @@ def identify_phased_variants(variants):
 
 def identify_close_vars(phasedvars, distance):
     """
-    Identify variants in cis and in close proximity
+    Identify variants in cis and in close proximity. The variants in each
+    phase set are sorted by position so each only needs to be compared with
+    the nearest variants at other positions
     """
     close_vars = {}
-    if len(phasedvars.keys()) >= 1:
-        for pid in phasedvars.keys():
-            if len(phasedvars[pid].keys()) > 1:
-                for v1 in phasedvars[pid].keys():
-                    pos1 = int(phasedvars[pid][v1]['position'])
-                    for v2 in phasedvars[pid].keys():
-                        pos2 = int(phasedvars[pid][v2]['position'])
-                        if pos1 == pos2:
-                            continue
-                        else:
-                            posdiff = abs(pos1 - pos2)
-                            if posdiff <= distance:
-                                close_vars[v1] = 1
-                                close_vars[v2] = 1
+    for pid in phasedvars.keys():
+        if len(phasedvars[pid].keys()) < 2:
+            continue
+        varids_at = {}
+        for v in phasedvars[pid].keys():
+            varids_at.setdefault(int(phasedvars[pid][v]['position']),
+                                 []).append(v)
+        positions = sorted(varids_at.keys())
+        for i, pos in enumerate(positions):
+            if (i > 0 and pos - positions[i - 1] <= distance) or \
+                    (i + 1 < len(positions) and
+                     positions[i + 1] - pos <= distance):
+                for v in varids_at[pos]:
+                    close_vars[v] = 1
 
     return close_vars
 
 
 def identify_mnvs(phasedvars):
     """
-    Identify MNVS which are in the same codon
+    Identify MNVS which are in the same codon, ie variants at different
+    positions in a phase set with the same protein position
     """
     mnvs = {}
     for vargroup in phasedvars.keys():
-        if len(phasedvars[vargroup].keys()) >= 2:
-            for v1 in phasedvars[vargroup].keys():
-                pos1 = phasedvars[vargroup][v1]['position']
-                pp1 = phasedvars[vargroup][v1]['protein_position']
-                for v2 in phasedvars[vargroup].keys():
-                    pos2 = phasedvars[vargroup][v2]['position']
-                    pp2 = phasedvars[vargroup][v2]['protein_position']
-                    if pos1 == pos2:
-                        continue
-                    else:
-                        if pp1 == pp2:
-                            mnvs[v1] = 1
-                            mnvs[v2] = 1
+        if len(phasedvars[vargroup].keys()) < 2:
+            continue
+        codons = {}
+        for v in phasedvars[vargroup].keys():
+            codons.setdefault(phasedvars[vargroup][v]['protein_position'],
+                              []).append(v)
+        for varids in codons.values():
+            positions = set(phasedvars[vargroup][v]['position']
+                            for v in varids)
+            if len(positions) > 1:
+                for v in varids:
+                    mnvs[v] = 1
 
     return mnvs
 
@@ -299,14 +357,14 @@ def get_variant_info(var, varid, mnvs, variants_in_cis, phased_varids):
     res['consequence'] = var['variant'].consequence
     res['protein_position'] = var['variant'].protein_position
     res['polyphen'] = var['variant'].polyphen
-    res['REVEL'] = var['variant'].revel
-    res['max_af'] = var['variant'].max_af
-    res['ddd_af'] = var['variant'].ddd_af
+    res['REVEL'] = var['variant'].numeric_text('revel')
+    res['max_af'] = var['variant'].numeric_text('max_af')
+    res['ddd_af'] = var['variant'].numeric_text('ddd_af')
     res['GT'] = var['variant'].gt
-    res['GQ'] = var['variant'].gq
+    res['GQ'] = var['variant'].numeric_text('gq')
     res['AD'] = var['variant'].ad
-    res['cnv_length'] = var['variant'].cnv_length
-    res['cn'] = var['variant'].cn
+    res['cnv_length'] = var['variant'].numeric_text('cnv_length')
+    res['cn'] = var['variant'].numeric_text('cn')
     res['triogenotype'] = var['variant'].triogenotype
     res['DNM'] = str(var['variant'].dnm)
 
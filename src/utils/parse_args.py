@@ -45,11 +45,20 @@ def get_options():
     parser.add_argument("--dad-aff",
                         help="Father's affected status (1=unaffected, or "
                              "2=affected).")
+    parser.add_argument("--cohort-vcf",
+                        help="Path to a joint VCF for everyone in the ped "
+                             "file, samples are found by person id and the "
+                             "VCF paths in the ped file aren't used.")
     parser.add_argument("--proband-list",
                         help="List of probands to be analysed.")
     parser.add_argument("--known-genes",
                         help="Path to file of known disease causative genes.")
 
+    parser.add_argument("--no-gene-cache", action="store_true",
+                        help="Always parse the known genes file rather than "
+                             "using or writing the compiled copy next to "
+                             "it.")
+
     parser.add_argument("--known-regions",
                         help="Path to file of known disease causative regions.")
 
@@ -59,6 +68,59 @@ def get_options():
 
     parser.add_argument("--outdir", help="Output directory.")
 
+    parser.add_argument("--report-format", choices=['json', 'jsonl'],
+                        default='json',
+                        help="Write the inheritance report as one JSON "
+                             "object (json, default) or as one line per "
+                             "family, written as each family is filtered "
+                             "(jsonl).")
+
+    parser.add_argument("--vcf-reader", choices=['native', 'bcftools'],
+                        default='native',
+                        help="Read VCFs in-process (native, default) or with "
+                             "bcftools. BCF files are always read with "
+                             "bcftools.")
+
+    parser.add_argument("--whole-vcf", action="store_true",
+                        help="Load variants from the whole of each child's "
+                             "VCF rather than only the regions around the "
+                             "known genes.")
+
+    parser.add_argument("--audit", action="store_true",
+                        help="Load every variant in the child's VCF so that "
+                             "the reason each one fails pre-inheritance "
+                             "filtering is logged. By default variants "
+                             "which fail the filters that depend on the "
+                             "child alone are skipped as the VCF is read.")
+
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of families to filter in parallel "
+                             "(default 1).")
+
+    parser.add_argument("--concurrent-loading", action="store_true",
+                        help="Load the parents' VCFs at the same time and "
+                             "load the next family's VCFs while the current "
+                             "family is filtered.")
+
+    parser.add_argument("--variant-cache",
+                        help="Directory to cache each sample's parsed "
+                             "variants in, so that VCFs are only read once "
+                             "across families and runs.")
+
+    parser.add_argument("--variant-cache-size", type=int, default=10240,
+                        help="Maximum size of the variant cache in MB "
+                             "(default 10240), the least recently used "
+                             "samples are removed first.")
+
+    parser.add_argument("--checkpoint-dir",
+                        help="Directory to save each family's results in as "
+                             "it is filtered.")
+
+    parser.add_argument("--resume", action="store_true",
+                        help="Reuse the results saved in --checkpoint-dir "
+                             "for families whose input files, gene list and "
+                             "options haven't changed.")
+
     args = parser.parse_args()
 
     if args.child is not None:
@@ -69,6 +131,18 @@ def get_options():
         if args.sex is None:
             parser.error("--sex must also be used if --child is used")
 
+    if args.cohort_vcf is not None and args.ped is None:
+        parser.error("--cohort-vcf can only be used with --ped")
+
+    if args.resume and args.checkpoint_dir is None:
+        parser.error("--resume can only be used with --checkpoint-dir")
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.jobs > 1 and args.concurrent_loading:
+        parser.error("--concurrent-loading can't be used with --jobs, "
+                     "families are already loaded in parallel")
+
     if args.outdir is None:
         args.outdir = os.getcwd()
 
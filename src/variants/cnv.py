@@ -27,6 +27,7 @@ class CNV(Variant):
     """
     CNVs
     """
+    __slots__ = ('reportable_symbol', 'reportable_hgnc_id')
 
     def __init__(self, vardata):
         super().__init__(vardata)
@@ -70,14 +71,14 @@ class CNV(Variant):
         return True
 
     def get_mum_genotype(self):
-        if self.triogenotype[3:6] == 'REF':
+        if self.triogenotype.startswith('REF', 3):
             mum_genotype = '0'
         else:
             mum_genotype = '1'
         return mum_genotype
 
     def get_dad_genotype(self):
-        if self.triogenotype[6:9] == 'REF':
+        if self.triogenotype.startswith('REF', 6):
             dad_genotype = '0'
         else:
             dad_genotype = '1'
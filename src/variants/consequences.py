@@ -0,0 +1,92 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+from functools import reduce
+
+# Sequence Ontology terms used by VEP for variant consequences. Each term is
+# given one bit so that the &-separated consequences of a variant can be
+# stored as a single integer and tested against groups of terms with bit
+# operations
+SO_TERMS = ('transcript_ablation', 'splice_acceptor_variant',
+            'splice_donor_variant', 'stop_gained', 'frameshift_variant',
+            'stop_lost', 'start_lost', 'transcript_amplification',
+            'feature_elongation', 'feature_truncation', 'inframe_insertion',
+            'inframe_deletion', 'missense_variant', 'protein_altering_variant',
+            'splice_donor_5th_base_variant', 'splice_region_variant',
+            'splice_donor_region_variant',
+            'splice_polypyrimidine_tract_variant',
+            'incomplete_terminal_codon_variant', 'start_retained_variant',
+            'stop_retained_variant', 'synonymous_variant',
+            'coding_sequence_variant', 'mature_miRNA_variant',
+            '5_prime_UTR_variant', '3_prime_UTR_variant',
+            'non_coding_transcript_exon_variant', 'intron_variant',
+            'NMD_transcript_variant', 'non_coding_transcript_variant',
+            'coding_transcript_variant', 'upstream_gene_variant',
+            'downstream_gene_variant', 'TFBS_ablation', 'TFBS_amplification',
+            'TF_binding_site_variant', 'regulatory_region_ablation',
+            'regulatory_region_amplification', 'regulatory_region_variant',
+            'intergenic_variant', 'sequence_variant')
+
+SO_TERM_BITS = {term: 1 << i for i, term in enumerate(SO_TERMS)}
+
+
+def terms_mask(terms):
+    """
+    bitmask of a collection of SO terms
+    """
+    return reduce(lambda mask, term: mask | SO_TERM_BITS[term], terms, 0)
+
+
+# consequences which are functional, a variant needs at least one of them to
+# pass pre-inheritance filtering
+FUNCTIONAL = terms_mask(
+    ['frameshift_variant', 'missense_variant', 'splice_donor_variant',
+     'splice_acceptor_variant', 'start_lost', 'stop_gained',
+     'protein_altering_variant', 'transcript_ablation',
+     'transcript_amplification', 'inframe_insertion', 'inframe_deletion',
+     'stop_lost'])
+
+MISSENSE = SO_TERM_BITS['missense_variant']
+
+# consequences which are treated like missense when pairing compound hets
+MISSENSE_EQUIVALENT = terms_mask(['missense_variant', 'inframe_deletion',
+                                  'inframe_insertion'])
+
+# consequence strings are shared between variants so each distinct string is
+# only split and encoded once
+mask_cache = {}
+
+
+def consequence_mask(consequence):
+    """
+    encode an &-separated consequence string as a bitmask. Terms which are
+    not in SO_TERMS don't set any bits
+    """
+    mask = mask_cache.get(consequence)
+    if mask is None:
+        mask = 0
+        if isinstance(consequence, str):
+            for term in consequence.split('&'):
+                mask |= SO_TERM_BITS.get(term, 0)
+        mask_cache[consequence] = mask
+    return mask
@@ -24,10 +24,40 @@ from variants.variant import Variant
 import logging
 
 
+def genotype_code(gt):
+    """
+    Converts a genotype to 0/1/2
+    """
+    if len(gt) != 3:
+        raise ValueError("genotype should be three characters")
+    if gt[0] == "0" and gt[2] == "0":
+        return "0"
+    elif gt[0] == gt[2]:
+        return "2"
+    return "1"
+
+
+def standardise_gt(gt):
+    """
+    Reformat a genotype so that the lowest number allele is first and the
+    separator is /. Raises ValueError if the genotype isn't two called
+    alleles, eg ./.
+    """
+    gt = gt.replace('|', '/')
+    if len(gt) != 3 or gt[1] != '/' or not gt[0].isdigit() or \
+            not gt[2].isdigit():
+        raise ValueError("Invalid genotype " + gt +
+                         ", should be two called alleles")
+    if int(gt[0]) > int(gt[2]):
+        gt = gt[2] + "/" + gt[0]
+    return gt
+
+
 class SNV(Variant):
     """
     SNVs
     """
+    __slots__ = ('AC_het', 'AC_hemi')
 
     def __init__(self, vardata):
         super().__init__(vardata)
@@ -56,21 +86,12 @@ class SNV(Variant):
         """
         AC_hemi = 0
         AC_het = 0
-        #change all '.' to '0'
-        if self.ac_XX == '.':
-            self.ac_XX = '0'
-        if self.ac_XY == '.':
-            self.ac_XY = '0'
-        if self.nhomalt_XX == '.':
-            self.nhomalt_XX = '0'
-        if self.nhomalt_XY == '.':
-            self.nhomalt_XY = '0'
-
+        # missing counts are treated as 0
         if self.chrom == 'X' or self.chrom == 'Y':
-            AC_hemi = int(self.nhomalt_XY)
+            AC_hemi = self.nhomalt_XY or 0
         else:
-            total_AC = int(self.ac_XX) + int(self.ac_XY)
-            total_nhom = int(self.nhomalt_XX) + int(self.nhomalt_XY)
+            total_AC = (self.ac_XX or 0) + (self.ac_XY or 0)
+            total_nhom = (self.nhomalt_XX or 0) + (self.nhomalt_XY or 0)
             AC_het = total_AC - (2 * total_nhom)
 
         if AC_het < 0 or AC_hemi < 0:
@@ -78,35 +99,21 @@ class SNV(Variant):
                          + self.chrom + " " + self.pos + " AC_het="
                          + str(AC_het) + " AC_hemi=" + str(AC_hemi))
 
-        self.AC_het = str(AC_het)
-        self.AC_hemi = str(AC_hemi)
+        self.AC_het = AC_het
+        self.AC_hemi = AC_hemi
 
     def standardise_gt(self):
         """
         Reformat gt to ensure that lowest number allele is first and that
         the separator is /
         """
-        newgt = self.gt
-        newgt = newgt.replace('|', '/')
-        gtsplit = list(newgt)
-        if int(gtsplit[0]) > int(gtsplit[2]):
-            newgt = gtsplit[2] + "/" + gtsplit[0]
-        self.gt = newgt
+        self.gt = standardise_gt(self.gt)
 
     def set_genotype(self):
         """
         Converts genotype to 0/1/2
         """
-        if len(self.gt) != 3:
-            raise ValueError("genotype should be three characters")
-        else:
-            gtsplit = list(self.gt)
-            if gtsplit[0] == "0" and gtsplit[2] == "0":
-                self.genotype = "0"
-            elif gtsplit[0] == gtsplit[2]:
-                self.genotype = "2"
-            else:
-                self.genotype = "1"
+        self.genotype = genotype_code(self.gt)
 
     def get_genotype(self):
         return self.genotype
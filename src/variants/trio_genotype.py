@@ -20,12 +20,59 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
+
 import logging
+from sys import intern
+
+# genotype codes of SNVs, and of parents, who are NA if they are missing
+GENOTYPES = ('0', '1', '2')
+PARENT_GENOTYPES = ('0', '1', '2', 'NA')
+
+# trio genotypes of SNVs by child, mum and dad genotype. Every variant with
+# the same trio genotype shares one string rather than each building its own
+SNV_TRIO_GENOTYPES = {
+    child: {mum: {dad: intern(child + mum + dad) for dad in PARENT_GENOTYPES}
+            for mum in PARENT_GENOTYPES}
+    for child in GENOTYPES}
+
+# parents' part of the trio genotype of a CNV by CIFER inheritance, % is
+# replaced by the CNV's type (DEL or DUP)
+CNV_PARENT_GENOTYPES = {'not_inherited': 'REFREF', 'maternal_inh': '%REF',
+                        'paternal_inh': 'REF%', 'biparental_inh': '%%'}
+
+# trio genotypes of CNVs by ALT and CIFER inheritance when both parents are
+# present, or by ALT alone with NA for the parents, shared between variants
+CNV_TRIO_GENOTYPES = {}
+
+
+def cnv_trio_genotype(v, cnv, both_parents):
+    """
+    trio genotype of a CNV. With both parents it is determined from CIFER
+    inheritance, otherwise the parents are NA
+    """
+    inh = cnv.cnv_inh if both_parents else None
+    triogenotype = CNV_TRIO_GENOTYPES.get((cnv.alt, inh))
+    if triogenotype is not None:
+        return triogenotype
+    childgeno = cnv.alt[1:4]
+    if not both_parents:
+        parentgeno = 'NANA'
+    elif inh in CNV_PARENT_GENOTYPES:
+        parentgeno = CNV_PARENT_GENOTYPES[inh].replace('%', childgeno)
+    else:
+        logging.info(v + " Error: trio genotype for CNV can't be "
+                         "determined, CNV inh = " + cnv.cnv_inh)
+        # not cached so that every CNV with unknown inheritance is logged
+        return childgeno + 'NANA'
+    triogenotype = CNV_TRIO_GENOTYPES[(cnv.alt, inh)] = \
+        intern(childgeno + parentgeno)
+    return triogenotype
 
 
 def add_trio_genotypes(family, variants):
     """
-    Add trio genotypes to all child variants for a family
+    Add trio genotypes to all child variants for a family. The parents'
+    variants are their genotype codes (0/1/2) by variant id
     """
     if family.has_both_parents():
         #if parents are present we assume positions not present are ref/ref
@@ -44,112 +91,54 @@ def add_trio_genotypes(family, variants):
         exit(1)
 
 
+def assign_trio_genotypes(childvars, mumgenos, dadgenos, mumdefault,
+                          daddefault, both_parents):
+    """
+    Set the trio genotypes of all of a child's variants in one pass. A
+    parent's genotype is looked up in their genotype codes by variant id,
+    and is the default if they don't have the variant
+    """
+    for v, var in childvars.items():
+        if var.is_snv():
+            var.set_triogenotype(SNV_TRIO_GENOTYPES[var.genotype][
+                mumgenos.get(v, mumdefault)][dadgenos.get(v, daddefault)])
+        elif var.is_cnv():
+            var.set_triogenotype(cnv_trio_genotype(v, var, both_parents))
+        else:
+            logging.error(v + " unrecognised variant type")
+            raise ValueError("Unrecognised variant type " + v)
+
+
 def add_trio_genotypes_both_parents(variants):
     """
     Add trio genotypes in a dict of variants where there are both parents
     """
-    for v in variants['child'].keys():
-        if variants['child'][v].is_snv():
-            childgeno = variants['child'][v].genotype
-            mumgeno = '0'
-            dadgeno = '0'
-            if v in variants['mum'].keys():
-                mumgeno = variants['mum'][v].genotype
-            if v in variants['dad'].keys():
-                dadgeno = variants['dad'][v].genotype
-            triogenotype = childgeno + mumgeno + dadgeno
-            variants['child'][v].set_triogenotype(triogenotype)
-        elif variants['child'][v].is_cnv():
-            # for a CNV trio genotype is determined from cifer inheritance
-            childgeno = variants['child'][v].alt[1:4]
-            if variants['child'][v].cnv_inh == 'not_inherited':
-                parentgeno = 'REFREF'
-            elif variants['child'][v].cnv_inh == 'maternal_inh':
-                parentgeno = childgeno + 'REF'
-            elif variants['child'][v].cnv_inh == 'paternal_inh':
-                parentgeno = 'REF' + childgeno
-            elif variants['child'][v].cnv_inh == 'biparental_inh':
-                parentgeno = childgeno + childgeno
-            else:
-                logging.info(v + " Error: trio genotype for CNV can't be "
-                                 "determined, CNV inh = "
-                             + variants['child'][v].cnv_inh)
-                parentgeno = 'NANA'
-            triogenotype = childgeno + parentgeno
-            variants['child'][v].set_triogenotype(triogenotype)
-        else:
-            print("Error: unrecognised variant type " + v)
-            exit(1)
+    assign_trio_genotypes(variants['child'], variants['mum'],
+                          variants['dad'], '0', '0', True)
 
 
 def add_trio_genotypes_no_parents(variants):
     """
     Add trio genotypes in a dict of variants where there are no parents
     """
-    for v in variants['child'].keys():
-        if variants['child'][v].is_snv():
-            childgeno = variants['child'][v].genotype
-        elif variants['child'][v].is_cnv():
-            childgeno = variants['child'][v].alt[1:4]
-        else:
-            print("Error: unrecognised variant type " + v)
-            exit(1)
-        mumgeno = 'NA'
-        dadgeno = 'NA'
-        triogenotype = childgeno + mumgeno + dadgeno
-        variants['child'][v].set_triogenotype(triogenotype)
+    assign_trio_genotypes(variants['child'], {}, {}, 'NA', 'NA', False)
 
 
 def add_trio_genotypes_mum_only(variants):
     """
     Add trio genotypes in a dict of variants where there is mum only
     """
-    for v in variants['child'].keys():
-        if variants['child'][v].is_snv():
-            childgeno = variants['child'][v].genotype
-            mumgeno = '0'
-            dadgeno = 'NA'
-            if v in variants['mum'].keys():
-                mumgeno = variants['mum'][v].genotype
-            triogenotype = childgeno + mumgeno + dadgeno
-            variants['child'][v].set_triogenotype(triogenotype)
-        elif variants['child'][v].is_cnv():
-            # todo improve when there is better inheritence prediction
-            # for single parent CNVs
-            childgeno = variants['child'][v].alt[1:4]
-            mumgeno = 'NA'
-            dadgeno = 'NA'
-            triogenotype = childgeno + mumgeno + dadgeno
-            variants['child'][v].set_triogenotype(triogenotype)
-        else:
-            print("Error: unrecognised variant type " + v)
-            exit(1)
+    # todo improve CNVs when there is better inheritence prediction
+    # for single parent CNVs
+    assign_trio_genotypes(variants['child'], variants['mum'], {}, '0', 'NA',
+                          False)
 
 
 def add_trio_genotypes_dad_only(variants):
     """
     Add trio genotype in a dict of variants where there is dad only
     """
-    for v in variants['child'].keys():
-        if variants['child'][v].is_snv():
-            childgeno = variants['child'][v].genotype
-            mumgeno = 'NA'
-            dadgeno = '0'
-            if v in variants['dad'].keys():
-                dadgeno = variants['dad'][v].genotype
-            triogenotype = childgeno + mumgeno + dadgeno
-            variants['child'][v].set_triogenotype(triogenotype)
-        elif variants['child'][v].is_cnv():
-            #todo improve when there is better inheritence prediction
-            # for single parent CNVs
-            childgeno = variants['child'][v].alt[1:4]
-            mumgeno = 'NA'
-            dadgeno = 'NA'
-            triogenotype = childgeno + mumgeno + dadgeno
-            variants['child'][v].set_triogenotype(triogenotype)
-        else:
-            print("Error: unrecognised variant type " + v)
-            exit(1)
-
-
-
+    # todo improve CNVs when there is better inheritence prediction
+    # for single parent CNVs
+    assign_trio_genotypes(variants['child'], {}, variants['dad'], 'NA', '0',
+                          False)
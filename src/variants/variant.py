@@ -22,15 +22,111 @@ THE SOFTWARE.
 """
 
 
+import logging
+
+from sys import intern
+
+from variants.consequences import consequence_mask
+
+# fields read from the VCF for each variant. Fields which are not given are
+# set to '.'
+VARIANT_FIELDS = ('chrom', 'pos', 'ref', 'alt', 'consequence', 'ensg',
+                  'symbol', 'feature', 'canonical', 'mane', 'mane_clinical',
+                  'hgnc_id', 'max_af', 'max_af_pops', 'ddd_af',
+                  'ddd_father_af', 'revel', 'polyphen', 'protein_position',
+                  'hgvsc', 'hgvsp', 'sex', 'pp_trio_dnm2', 'pp_dng', 'vaf',
+                  'cnv_end', 'cnv_type', 'cnv_length', 'cnv_filter',
+                  'hgnc_id_all', 'symbol_all', 'ac_XX', 'an_XX', 'nhomalt_XX',
+                  'ac_XY', 'an_XY', 'nhomalt_XY', 'gt', 'gq', 'pid', 'ad',
+                  'cnv_inh', 'cn', 'dnm')
+
+# fields with few distinct values which are shared between variants rather
+# than stored once per variant
+INTERNED_FIELDS = frozenset(['chrom', 'ref', 'alt', 'consequence', 'ensg',
+                             'symbol', 'feature', 'canonical', 'mane',
+                             'mane_clinical', 'hgnc_id', 'max_af_pops',
+                             'polyphen', 'sex', 'cnv_type', 'cnv_filter',
+                             'cnv_inh', 'gt', 'pid'])
+
+# numeric fields and their types. These are converted once when a variant is
+# created, missing and malformed values become None. Where the text read from
+# the VCF can't be rebuilt from the value (eg 0 for a float) it is kept for
+# output
+NUMERIC_FIELDS = {'max_af': float, 'ddd_af': float, 'ddd_father_af': float,
+                  'revel': float, 'gq': int, 'cn': int, 'cnv_length': int,
+                  'cnv_end': int, 'ac_XX': int, 'an_XX': int,
+                  'nhomalt_XX': int, 'ac_XY': int, 'an_XY': int,
+                  'nhomalt_XY': int}
+
+
+def variant_id(chrom, pos, ref, alt):
+    """
+    The id of a variant, CHROM_POS_REF_ALT with the VCF's chromosome name.
+    Ids are interned so that the child's and parents' ids for a variant are
+    the same string, which compares by identity when they are joined
+    """
+    return intern(chrom + "_" + pos + "_" + ref + "_" + alt)
+
+
+def split_variant_id(varid):
+    """
+    The CHROM, POS, REF and ALT of a variant id
+    """
+    return varid.rsplit('_', 3)
+
+
+def parse_numeric(field, value, numtype, warn=True):
+    """
+    Convert the value of a numeric field, returns None if the value is missing
+    or malformed. Malformed values are logged unless warn is False
+    """
+    if value is None or value == '.' or value == '':
+        return None
+    try:
+        return numtype(value)
+    except (TypeError, ValueError):
+        if warn:
+            logging.warning("Invalid " + field + " value: " + str(value) +
+                            " should be " + numtype.__name__ +
+                            ", treated as missing")
+        return None
+
+
+def format_numeric(value):
+    """
+    The text of a parsed numeric value, '.' if missing
+    """
+    if value is None:
+        return '.'
+    return str(value)
+
+
 class Variant(object):
     """
     Generic variant class, inherited by more specific classes such as CNV
      and SNV
      """
+    __slots__ = VARIANT_FIELDS + ('consequence_mask', 'genotype',
+                                  'triogenotype', 'text')
 
     def __init__(self, vardata):
-        for key in vardata:
-            setattr(self, key, vardata[key])
+        text = None
+        for key in VARIANT_FIELDS:
+            value = vardata.get(key, '.')
+            if key in NUMERIC_FIELDS:
+                raw = value
+                value = parse_numeric(key, raw, NUMERIC_FIELDS[key])
+                if raw is not None and raw != format_numeric(value):
+                    if text is None:
+                        text = ()
+                    text += (key, raw)
+            elif key in INTERNED_FIELDS and type(value) is str:
+                value = intern(value)
+            setattr(self, key, value)
+        self.text = text
+        if self.dnm == '.':
+            self.dnm = False
+        self.consequence_mask = consequence_mask(self.consequence)
 
         self.genotype = None
         self.triogenotype = None
@@ -44,21 +140,27 @@ class Variant(object):
                self.ref == other.ref and \
                self.alt == other.alt
 
+    def __hash__(self):
+        return hash((self.chrom, self.pos, self.ref, self.alt))
+
+    def numeric_text(self, field):
+        """
+        The text of a numeric field as read from the VCF, '.' if missing
+        """
+        if self.text is not None and field in self.text[::2]:
+            return self.text[self.text.index(field) + 1]
+        return format_numeric(getattr(self, field))
+
     def standardise_chromosome(self):
         """
         Ensure chromosome is 1-22,X,Y
         """
         if self.chrom.startswith('Chr') or self.chrom.startswith('chr'):
-            self.chrom = self.chrom[3:]
+            self.chrom = intern(self.chrom[3:])
 
     def parse_hgnc_id(self):
         """
         Strip HGNC: from hgnc_id
         """
         if self.hgnc_id.startswith('HGNC:'):
-            self.hgnc_id = self.hgnc_id[5:]
-
-
-
-
-
+            self.hgnc_id = intern(self.hgnc_id[5:])
@@ -0,0 +1,99 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+import tempfile
+import os
+
+from tests.test_utils import create_test_person
+from tests.test_utils import create_test_family
+from output.checkpoint import Checkpoint, run_fingerprint, MANIFEST
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.vcf = os.path.join(self.tmpdir.name, 'child.vcf')
+        with open(self.vcf, 'w') as v:
+            v.write("##fileformat=VCFv4.2\n")
+        self.checkpoint_dir = os.path.join(self.tmpdir.name, 'checkpoint')
+        child = create_test_person('fam1', 'child1', '0', '0', 'XX', '2',
+                                   self.vcf)
+        self.families = {'fam1_child1': create_test_family(child, None, None)}
+        self.run = run_fingerprint(None, {'whole_vcf': False})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_resume(self):
+        # saved results are reused while the fingerprint matches
+        checkpoint = Checkpoint(self.checkpoint_dir, self.run)
+        checkpoint.save('fam1_child1', self.families['fam1_child1'],
+                        ({'single_variants': {}, 'compound_hets': {}}, None))
+        # a manifest line cut short by a killed run is ignored, and doesn't
+        # spoil the next entry
+        with open(os.path.join(self.checkpoint_dir, MANIFEST), 'w') as m:
+            m.write('{"family": "fam1_chi')
+        self.assertEqual(checkpoint.load(self.families), {})
+        checkpoint.save('fam1_child1', self.families['fam1_child1'],
+                        ({'single_variants': {}, 'compound_hets': {}}, None))
+        self.assertEqual(checkpoint.load(self.families), {'fam1_child1': (
+            {'single_variants': {}, 'compound_hets': {}}, None)})
+
+        other_run = run_fingerprint(None, {'whole_vcf': True})
+        self.assertEqual(
+            Checkpoint(self.checkpoint_dir, other_run).load(self.families),
+            {})
+
+    def test_changed_input_file(self):
+        # results are not reused once the contents of an input file change,
+        # even if its path is the same
+        regions = os.path.join(self.tmpdir.name, 'regions.txt')
+        with open(regions, 'w') as r:
+            r.write("1\t100\t200\n")
+        run = run_fingerprint(None, {'whole_vcf': False},
+                              {'known_regions': regions})
+        Checkpoint(self.checkpoint_dir, run).save(
+            'fam1_child1', self.families['fam1_child1'], ({}, None))
+        self.assertEqual(Checkpoint(self.checkpoint_dir, run_fingerprint(
+            None, {'whole_vcf': False}, {'known_regions': regions})).load(
+            self.families), {'fam1_child1': ({}, None)})
+        with open(regions, 'w') as r:
+            r.write("1\t100\t300\n")
+        self.assertEqual(Checkpoint(self.checkpoint_dir, run_fingerprint(
+            None, {'whole_vcf': False}, {'known_regions': regions})).load(
+            self.families), {})
+
+    def test_changed_vcf(self):
+        # results are not reused once the VCF has changed
+        checkpoint = Checkpoint(self.checkpoint_dir, self.run)
+        checkpoint.save('fam1_child1', self.families['fam1_child1'],
+                        ({}, None))
+        with open(self.vcf, 'a') as v:
+            v.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
+        self.assertEqual(checkpoint.load(self.families), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,6 +29,7 @@ from tests.test_utils import create_test_family
 from tests.test_utils import create_test_cnv
 
 from filtering.filter import CNVFiltering
+from genes.gene_panel import Gene, GenePanel
 
 class TestAutosomalInheritanceFilter(unittest.TestCase):
 
@@ -280,6 +281,39 @@ class TestAutosomalInheritanceFilter(unittest.TestCase):
         cnvfilter7.cnv_filter()
         self.assertEqual(cnvfilter7.passddg2p, True)
 
+    def test_ddg2p_filter_gene_panel(self):
+        # with a gene panel the genes covered by a CNV come from its
+        # coordinates rather than its HGNC_ID_ALL annotation
+        panel = GenePanel({
+            '1234': Gene('1', '10971836', '10984446', 'MECP2',
+                         {'Probable DD gene'}, {'Biallelic'},
+                         {'Loss of function'}),
+            '5678': Gene('1', '20000000', '20010000', 'OTHER',
+                         {'Probable DD gene'}, {'Biallelic'},
+                         {'Loss of function'})})
+        cn0vardata = copy.deepcopy(self.cn0vardata_bi)
+        cn0vardata['hgnc_id_all'] = 'HGNC:5678'
+        testcnv0 = create_test_cnv(cn0vardata)
+        testvars0 = {'child': {'1_10971936_A_DEL': testcnv0}}
+        cnvfilter0 = CNVFiltering(testvars0, self.family_dad_aff, panel, None,
+                                  None, self.candidate_variants)
+        self.assertEqual(cnvfilter0.get_cnv_genes('1_10971936_A_DEL'),
+                         ['1234'])
+        cnvfilter0.cnv_filter()
+        self.assertEqual(cnvfilter0.passddg2p, True)
+        self.assertEqual(testcnv0.reportable_hgnc_id, ['1234'])
+
+        # CNV that doesn't overlap any panel gene
+        cn0vardata['pos'] = '10990000'
+        cn0vardata['cnv_end'] = '11000000'
+        testcnv1 = create_test_cnv(cn0vardata)
+        testvars1 = {'child': {'1_10990000_A_DEL': testcnv1}}
+        cnvfilter1 = CNVFiltering(testvars1, self.family_dad_aff, panel, None,
+                                  None, self.candidate_variants)
+        self.assertEqual(cnvfilter1.get_cnv_genes('1_10990000_A_DEL'), [])
+        cnvfilter1.cnv_filter()
+        self.assertEqual(cnvfilter1.passddg2p, False)
+
     def test_candidate_compound_het_filter(self):
         # add var to candidate compound hets if:
         # cn = 1 or 3 and biallelic and DDG2P gene
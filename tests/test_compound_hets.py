@@ -0,0 +1,148 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+import random
+import logging
+
+from tests.test_utils import create_test_person
+from tests.test_utils import create_test_family
+from tests.test_utils import create_test_snv
+from tests.test_utils import create_test_cnv
+from tests.test_utils import screen_each_pair
+
+from filtering.compound_hets import CompoundHetScreen
+
+SNV_TRIOGENOTYPES = ['100', '110', '101', '111', '201', '210', '211']
+CNV_TRIOGENOTYPES = ['DELREFREF', 'DELDELREF', 'DELREFDEL', 'DUPREFREF']
+CONSEQUENCES = ['missense_variant', 'stop_gained', 'inframe_deletion',
+                'frameshift_variant&splice_region_variant']
+
+
+class TestCompoundHetScreen(unittest.TestCase):
+
+    def setUp(self):
+        self.maxDiff = None
+        self.child = create_test_person('fam', 'child_id', 'dad_id', 'mum_id',
+                                        'XY', '2', '/vcf/path')
+        self.mum = create_test_person('fam', 'mum_id', '0', '0', 'XX', '1',
+                                      '/vcf/path')
+        self.dad = create_test_person('fam', 'dad_id', '0', '0', 'XY', '1',
+                                      '/vcf/path')
+        self.dad_aff = create_test_person('fam', 'dad_id', '0', '0', 'XY', '2',
+                                          '/vcf/path')
+        self.vardata = {'chrom': '1', 'pos': '100000', 'ref': 'A', 'alt': 'G',
+                        'consequence': 'missense_variant', 'hgnc_id': '123',
+                        'gt': '0/1', 'gq': '50', 'pid': '.'}
+        self.cnvdata = {'chrom': '1', 'pos': '90000', 'ref': 'A',
+                        'alt': '<DEL>', 'consequence': 'transcript_ablation',
+                        'hgnc_id': '123', 'cn': '1', 'cnv_end': '200000'}
+        logging.disable(logging.INFO)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def random_candidates(self, rng, n_genes, n_vars, phased):
+        candidates = {}
+        for g in range(n_genes):
+            gn = str(g)
+            chrom = rng.choice(['1', 'X'])
+            candidates[gn] = {}
+            for i in range(rng.randrange(n_vars)):
+                if rng.random() < 0.1:
+                    vardata = dict(self.cnvdata, chrom=chrom, pos=str(i),
+                                   cn=rng.choice(['1', '3']))
+                    var = create_test_cnv(vardata)
+                    var.set_triogenotype(rng.choice(CNV_TRIOGENOTYPES))
+                else:
+                    vardata = dict(self.vardata, chrom=chrom, pos=str(i),
+                                   consequence=rng.choice(CONSEQUENCES),
+                                   dnm=rng.choice(['.', '.', True]))
+                    if phased:
+                        vardata['pid'] = rng.choice(['.', '1', '2', '3'])
+                    var = create_test_snv(vardata)
+                    var.set_triogenotype(rng.choice(SNV_TRIOGENOTYPES))
+                varid = chrom + '_' + str(i) + '_A_G'
+                candidates[gn][varid] = {'variant': var, 'mode': {'Biallelic'},
+                                         'hgncid': gn}
+        return candidates
+
+    def test_cis_pair_without_parents(self):
+        # with no parents variants in the same phase set fail
+        family = create_test_family(self.child, None, None)
+        var1 = create_test_snv(dict(self.vardata, pid='1',
+                                    consequence='stop_gained'))
+        var2 = create_test_snv(dict(self.vardata, pos='100010', pid='1'))
+        var3 = create_test_snv(dict(self.vardata, pos='100020', pid='2'))
+        candidates = {'single_variants': {}, 'compound_hets': {'123': {
+            '1_100000_A_G': {'variant': var1, 'mode': {'Biallelic'}},
+            '1_100010_A_G': {'variant': var2, 'mode': {'Biallelic'}},
+            '1_100020_A_G': {'variant': var3, 'mode': {'Biallelic'}}}}}
+        CompoundHetScreen(candidates, family).screen_compound_hets()
+        self.assertEqual(list(candidates['compound_hets']['123'].keys()),
+                         ['1_100000_A_G', '1_100020_A_G'])
+
+    def test_cnv_deletion_pair(self):
+        # a hom alt SNV pairs with a deletion with copy number 1 from the
+        # other parent, a hom alt SNV without a CNV fails and doesn't stop
+        # the screen
+        family = create_test_family(self.child, self.mum, self.dad)
+        snv = create_test_snv(dict(self.vardata, gt='1/1'))
+        snv.set_triogenotype('201')
+        snv2 = create_test_snv(dict(self.vardata, pos='100010', gt='1/1'))
+        snv2.set_triogenotype('210')
+        cnv = create_test_cnv(self.cnvdata)
+        cnv.set_triogenotype('DELDELREF')
+        candidates = {'single_variants': {}, 'compound_hets': {'123': {
+            '1_100000_A_G': {'variant': snv, 'mode': {'Biallelic'}},
+            '1_100010_A_G': {'variant': snv2, 'mode': {'Biallelic'}},
+            '1_90000_A_<DEL>': {'variant': cnv, 'mode': {'Biallelic'}}}}}
+        CompoundHetScreen(candidates, family).screen_compound_hets()
+        self.assertEqual(list(candidates['compound_hets']['123'].keys()),
+                         ['1_100000_A_G', '1_90000_A_<DEL>'])
+
+    def test_same_as_each_pair(self):
+        # the pairing gives the same passes, in the same order, as screening
+        # every pair
+        rng = random.Random(0)
+        for family, phased in [
+                (create_test_family(self.child, self.mum, self.dad), False),
+                (create_test_family(self.child, self.mum, self.dad_aff),
+                 False),
+                (create_test_family(self.child, None, None), True),
+                (create_test_family(self.child, self.mum, None), False)]:
+            for n_vars in [3, 8, 30]:
+                candidates = self.random_candidates(rng, 40, n_vars, phased)
+                expected = screen_each_pair(candidates, family)
+                variants = {'single_variants': {},
+                            'compound_hets': candidates}
+                CompoundHetScreen(variants, family).screen_compound_hets()
+                self.assertEqual(variants['compound_hets'], expected)
+                self.assertEqual(
+                    [(gn, list(v.keys())) for gn, v in
+                     variants['compound_hets'].items()],
+                    [(gn, list(v.keys())) for gn, v in expected.items()])
+
+
+if __name__ == '__main__':
+    unittest.main()
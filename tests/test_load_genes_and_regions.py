@@ -21,10 +21,14 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import os
+import pickle
 import unittest
 import tempfile
 
-from file_loading.load_genes_and_regions import load_genes
+from file_loading.load_genes_and_regions import load_genes, load_gene_panel
+from file_loading.gene_panel_cache import read_panel_cache, panel_cache_path
+from genes.gene_panel import Gene, GenePanel
 
 
 class TestLoadGenesRegions(unittest.TestCase):
@@ -46,11 +50,62 @@ class TestLoadGenesRegions(unittest.TestCase):
 
     def test_load_genes(self):
         '''load genes from file'''
-        self.assertEqual(load_genes(self.path), {
-            '5017': {'chr': '4', 'start': '8846076', 'end': '8871839',
-                     'symbol': 'HMX1', 'mode': {'Biallelic'},
-                     'mechanism': {'Loss of function'},
-                     'status': {'Probable DD gene'}}})
+        genes = load_genes(self.path)
+        self.assertEqual(genes, {
+            '5017': Gene('4', '8846076', '8871839', 'HMX1',
+                         {'Probable DD gene'}, {'Biallelic'},
+                         {'Loss of function'})})
+        # genes can also be used like a dict of gene data
+        self.assertEqual(genes['5017']['mode'], {'Biallelic'})
+        self.assertEqual(genes['5017']['start'], 8846076)
+        self.assertEqual(genes.intervals, {'4': ((8846076, 8871839, '5017'),)})
+
+    def test_gene_panel_overlapping(self):
+        '''genes overlapping a region, including nested genes'''
+        panel = GenePanel({
+            '1': Gene('1', '100', '1000', 'A', set(), set(), set()),
+            '2': Gene('1', '200', '300', 'B', set(), set(), set()),
+            '3': Gene('1', '500', '600', 'C', set(), set(), set()),
+            '4': Gene('1', '2000', '3000', 'D', set(), set(), set()),
+            '5': Gene('2', '100', '200', 'E', set(), set(), set())})
+        self.assertEqual(panel.overlapping('1', 400, 450), ['1'])
+        self.assertEqual(panel.overlapping('1', 300, 500), ['1', '2', '3'])
+        self.assertEqual(panel.overlapping('1', 1000, 2000), ['1', '4'])
+        self.assertEqual(panel.overlapping('1', 1001, 1999), [])
+        self.assertEqual(panel.overlapping('1', 1, 5000),
+                         ['1', '2', '3', '4'])
+        self.assertEqual(panel.overlapping('2', 1, 99), [])
+        self.assertEqual(panel.overlapping('3', 1, 5000), [])
+
+    def test_gene_panel_cache(self):
+        '''compiled panel is written, reused and rebuilt when the file changes'''
+        with tempfile.TemporaryDirectory() as tmpdir:
+            genesfile = os.path.join(tmpdir, 'genes.txt')
+            with open(self.path) as f, open(genesfile, 'w') as g:
+                g.write(f.read())
+            self.assertIsNone(read_panel_cache(genesfile))
+
+            genes = load_gene_panel(genesfile)
+            self.assertTrue(os.path.exists(panel_cache_path(genesfile)))
+            self.assertEqual(read_panel_cache(genesfile), genes)
+
+            # touched but unchanged, still fresh and the new mtime is stored
+            os.utime(genesfile, ns=(0, 0))
+            self.assertEqual(read_panel_cache(genesfile), genes)
+            with open(panel_cache_path(genesfile), 'rb') as f:
+                self.assertEqual(pickle.load(f)['mtime'], 0)
+
+            # changed
+            with open(genesfile, 'a') as g:
+                g.write(("\t").join(
+                    ['4', '8846076', '8871839', 'HMX1', '5017',
+                     'Probable DD gene', 'Monoallelic', 'Loss of function',
+                     'OCULOAURICULAR SYNDROME']) + "\n")
+            self.assertIsNone(read_panel_cache(genesfile))
+            genes = load_gene_panel(genesfile)
+            self.assertEqual(genes['5017']['mode'],
+                             {'Biallelic', 'Monoallelic'})
+            self.assertEqual(read_panel_cache(genesfile), genes)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -23,10 +23,18 @@ THE SOFTWARE.
 
 import unittest
 import tempfile
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
+from family.families import Person, Family
 from variants.snv import SNV
 from variants.cnv import CNV
-from file_loading.load_vcfs import readvcf
+from file_loading.load_vcfs import readvcf, load_variants, streamcommand, \
+    get_cohort_vcf
+from file_loading.regions import Regions
+from file_loading.variant_cache import VariantCache
+from filtering.filter import get_record_filter
 
 
 class TestLoadVariants(unittest.TestCase):
@@ -36,6 +44,7 @@ class TestLoadVariants(unittest.TestCase):
         ''' construct the bare minimum of lines for a VCF file to enable test
         load of variants'''
         self.maxDiff = None
+        self.vcfs = []
         self.vcfheader = "##fileformat=VCFv4.2\n" + \
                     '##contig=<ID=1,length=248956422,assembly=GRCh38>' + "\n" + \
                     '##FORMAT=<ID=GQ,Number=1,Type=Integer,Description="Genotype Quality">' + "\n" + \
@@ -100,6 +109,27 @@ class TestLoadVariants(unittest.TestCase):
         self.cnvline = ("\t").join(['1', '123456', '.', 'T', '<DEL>', '.', '.',
                         self.cnvinfofields, 'CN:CIFER_INHERITANCE', '1:maternal_inh'])
 
+    def tearDown(self):
+        for vcf in self.vcfs:
+            vcf.close()
+
+    def create_trio(self, childlines, mumlines, dadlines):
+        '''write a VCF for each member of a trio from their variant lines
+        and return the family'''
+        paths = []
+        for lines in (childlines, mumlines, dadlines):
+            vcf = tempfile.NamedTemporaryFile(mode="w")
+            vcf.write(self.vcfheader)
+            vcf.writelines(lines)
+            vcf.flush()
+            self.vcfs.append(vcf)
+            paths.append(vcf.name)
+        child = Person('fam1', 'sample1', 'dad1', 'mum1', 'XY', '2',
+                       paths[0])
+        mum = Person('fam1', 'sample1', '0', '0', 'XX', '1', paths[1])
+        dad = Person('fam1', 'sample1', '0', '0', 'XY', '1', paths[2])
+        return Family(child, mum, dad)
+
     def test_load_snv(self):
         '''load two variant lines - the common variant is ignored'''
         self.tempfile = tempfile.NamedTemporaryFile(mode="w")
@@ -147,5 +177,203 @@ class TestLoadVariants(unittest.TestCase):
              'symbol_all': 'MECP1|MECP2|MECP3', 'sex': 'XY', 'cn': '1',
              'cnv_inh':'maternal_inh'})})
 
+    def test_load_genotypes(self):
+        '''parents are loaded as genotype codes, common variants and CNVs
+        are skipped'''
+        self.tempfile = tempfile.NamedTemporaryFile(mode="w")
+        self.tempfile.write(self.vcfheader)
+        self.tempfile.write(self.variantline)
+        self.tempfile.write(self.commonvariantline)
+        self.tempfile.write(self.var3variantline.replace('1/1:99', '0|1:99'))
+        self.tempfile.write(self.cnvline)
+        self.tempfile.flush()
+
+        self.assertEqual(readvcf(self.tempfile.name, None, 'F',
+                                 genotypes_only=True),
+                         {'1_1339911_A_G': '2', '1_1449915_A_G': '1'})
+
+    def test_load_missing_genotype(self):
+        '''a parent's missing call is an error rather than a genotype'''
+        for gt in ['./.', '.|.', '1/.']:
+            vcf = tempfile.NamedTemporaryFile(mode="w")
+            vcf.write(self.vcfheader)
+            vcf.write(self.variantline.replace('1/1:99', gt + ':99'))
+            vcf.flush()
+            with self.assertLogs(level='ERROR'), \
+                    self.assertRaises(ValueError):
+                readvcf(vcf.name, None, 'F', genotypes_only=True)
+            vcf.close()
+
+    def test_load_parents_concurrently(self):
+        '''loading the parents in a thread pool gives the same variants'''
+        family = self.create_trio(
+            [self.variantline, self.var3variantline], [self.variantline],
+            [self.var3variantline])
+
+        expected = load_variants(family)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            variants = load_variants(family, executor=executor)
+        self.assertEqual(variants, expected)
+        self.assertEqual(list(variants['mum'].keys()), ['1_1339911_A_G'])
+        self.assertEqual(list(variants['dad'].keys()), ['1_1449915_A_G'])
+
+    def test_parent_lookup(self):
+        '''parental variants are only loaded at the positions of the child
+        variants picked by parent_lookup'''
+        lines = [self.variantline, self.var3variantline]
+        family = self.create_trio(lines, lines, lines)
+
+        variants = load_variants(
+            family, parent_lookup=lambda var: var.pos == '1449915')
+        self.assertEqual(list(variants['child'].keys()),
+                         ['1_1339911_A_G', '1_1449915_A_G'])
+        self.assertEqual(list(variants['mum'].keys()), ['1_1449915_A_G'])
+        self.assertEqual(list(variants['dad'].keys()), ['1_1449915_A_G'])
+
+        variants = load_variants(family, parent_lookup=lambda var: False)
+        self.assertEqual(variants['mum'], {})
+        self.assertEqual(variants['dad'], {})
+
+    def test_record_filter(self):
+        '''child variants which fail the child's pre-inheritance filters
+        aren't loaded, and nor are parental variants at their positions'''
+        lowrevel = self.var3variantline.replace('REVEL=0.8', 'REVEL=0.1')
+        lines = [self.variantline, lowrevel, self.cnvline]
+        family = self.create_trio(lines, lines, lines)
+
+        variants = load_variants(family, record_filter=get_record_filter())
+        self.assertEqual(list(variants['child'].keys()),
+                         ['1_1339911_A_G', '1_123456_T_<DEL>'])
+        self.assertNotIn('1_1449915_A_G', variants['mum'])
+
+        variants = load_variants(family,
+                                 record_filter=get_record_filter(audit=True))
+        self.assertEqual(list(variants['child'].keys()),
+                         ['1_1339911_A_G', '1_1449915_A_G',
+                          '1_123456_T_<DEL>'])
+
+    def test_record_filter_malformed_value(self):
+        '''a malformed value in a record kept by the record filter is
+        logged once, when the variant is made'''
+        vcf = tempfile.NamedTemporaryFile(mode="w")
+        vcf.write(self.vcfheader)
+        vcf.write(self.variantline.replace('MAX_AF=0.0003', 'MAX_AF=high'))
+        vcf.flush()
+        with self.assertLogs(level='WARNING') as logs:
+            variants = readvcf(vcf.name, None, 'XY',
+                               record_filter=get_record_filter())
+        self.assertIsNone(variants['1_1339911_A_G'].max_af)
+        self.assertEqual(len([l for l in logs.output if 'max_af' in l]), 1)
+
+    def test_chr_prefixed_regions(self):
+        '''regions without a chr prefix, as made from the gene panel, load
+        variants from a VCF whose chromosomes have one'''
+        vcf = tempfile.NamedTemporaryFile(mode="w")
+        vcf.write(self.vcfheader)
+        vcf.writelines([line.replace('1', 'chr1', 1) for line in
+                        [self.variantline, self.var3variantline]])
+        vcf.flush()
+        regions = Regions()
+        regions.add('1', 1449900, 1450000)
+        variants = readvcf(vcf.name, regions, 'XY')
+        self.assertEqual(list(variants.keys()), ['chr1_1449915_A_G'])
+        self.assertEqual(variants['chr1_1449915_A_G'].chrom, '1')
+
+    def test_chr_prefixed_trio(self):
+        '''parental variants are loaded from chr-prefixed VCFs'''
+        lines = [line.replace('1', 'chr1', 1) for line in
+                 [self.variantline, self.var3variantline]]
+        family = self.create_trio(lines, lines, lines)
+
+        variants = load_variants(family)
+        self.assertEqual(variants['mum'], {'chr1_1339911_A_G': '2',
+                                           'chr1_1449915_A_G': '2'})
+        self.assertEqual(variants['dad'], variants['mum'])
+
+    def test_get_cohort_vcf(self):
+        '''families are only read as a cohort from a shared VCF with a
+        sample for every person, or from the VCF given'''
+        single = tempfile.NamedTemporaryFile(mode="w", suffix='.vcf')
+        single.write(self.vcfheader)
+        single.flush()
+        joint = tempfile.NamedTemporaryFile(mode="w", suffix='.vcf')
+        joint.write(self.vcfheader.replace('sample1\n',
+                                           'child\tmum\tdad\n'))
+        joint.flush()
+
+        # a proband-only run on a single sample VCF
+        child = Person('fam1', 'child', '0', '0', 'XY', '2', single.name)
+        families = {'fam1': Family(child, None, None)}
+        self.assertIsNone(get_cohort_vcf(families))
+        self.assertEqual(get_cohort_vcf(families, single.name), single.name)
+
+        # a trio in a joint VCF
+        child = Person('fam1', 'child', 'dad', 'mum', 'XY', '2', joint.name)
+        mum = Person('fam1', 'mum', '0', '0', 'XX', '1', joint.name)
+        dad = Person('fam1', 'dad', '0', '0', 'XY', '1', joint.name)
+        families = {'fam1': Family(child, mum, dad)}
+        self.assertEqual(get_cohort_vcf(families), joint.name)
+
+        # a person who isn't in the joint VCF
+        families['fam2'] = Family(Person('fam2', 'child2', '0', '0', 'XY',
+                                         '2', joint.name), None, None)
+        self.assertIsNone(get_cohort_vcf(families))
+
+    def test_variant_cache(self):
+        '''variants read through the cache are the same as from the VCF,
+        whatever the regions'''
+        vcf = tempfile.NamedTemporaryFile(mode="w", suffix='.vcf')
+        vcf.write(self.vcfheader)
+        vcf.writelines([self.cnvline, self.variantline, self.var3variantline])
+        vcf.flush()
+        regions = Regions()
+        regions.add('1', 1449900, 1450000)
+
+        with tempfile.TemporaryDirectory() as cachedir:
+            cache = VariantCache(cachedir, 1024 * 1024)
+            for r in [None, regions, regions, None]:
+                self.assertEqual(readvcf(vcf.name, r, 'XY', cache=cache),
+                                 readvcf(vcf.name, r, 'XY'))
+            self.assertEqual(len(os.listdir(cachedir)), 1)
+            self.assertEqual(list(readvcf(vcf.name, regions, 'XY',
+                                          cache=cache).keys()),
+                             ['1_1449915_A_G'])
+
+            # the VCF changing gives a new entry
+            vcf.write(self.commonvariantline)
+            vcf.flush()
+            readvcf(vcf.name, None, 'XY', cache=cache)
+            self.assertEqual(len(os.listdir(cachedir)), 2)
+
+    def test_variant_cache_eviction(self):
+        '''the least recently used entries are removed first'''
+        with tempfile.TemporaryDirectory() as cachedir:
+            cache = VariantCache(cachedir, 1024 * 1024)
+            for i, key in enumerate(['a', 'b', 'c']):
+                cache.put(key, {key: 'x' * 300000})
+                os.utime(cache.path(key), ns=(i, i))
+            self.assertEqual(len(os.listdir(cachedir)), 3)
+            # using an entry makes it the most recently used
+            self.assertEqual(cache.get('a'), {'a': 'x' * 300000})
+            cache.put('d', {'d': 'x' * 300000})
+            self.assertIsNone(cache.get('b'))
+            for key in ['a', 'c', 'd']:
+                self.assertIsNotNone(cache.get(key))
+
+    def test_streamcommand_failure(self):
+        '''a command which fails anywhere in its pipeline raises rather than
+        giving partial output, stopping early isn't a failure'''
+        self.assertEqual(list(streamcommand("printf 'a\\tb\\n'", 'test')),
+                         [['a', 'b']])
+        with self.assertRaises(subprocess.CalledProcessError):
+            list(streamcommand("printf 'a\\tb\\n'; exit 1", 'test'))
+        with self.assertRaises(subprocess.CalledProcessError):
+            list(streamcommand("false | cat", 'test'))
+
+        lines = streamcommand("yes a", 'test')
+        self.assertEqual(next(lines), ['a'])
+        lines.close()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -24,7 +24,9 @@ THE SOFTWARE.
 import unittest
 
 from tests.test_utils import create_test_snv
-from filtering.preinheritance_filtering import PreInheritanceFiltering
+from file_loading.load_vcfs import INFO_FIELDS, FORMAT_FIELDS, add_variant
+from filtering.preinheritance_filtering import PreInheritanceFiltering, \
+    RecordFilter
 
 
 class TestPreInheritanceFilter(unittest.TestCase):
@@ -111,6 +113,83 @@ class TestPreInheritanceFilter(unittest.TestCase):
         variants_per_gene = preinheritancefilter.preinheritance_filter()
         self.assertEqual(variants_per_gene, {})
 
+    def test_dnm_filter(self):
+        # apparent de novos fail unless they are flagged as DNMs
+        testvar = create_test_snv(self.vardata)
+        testvar.set_triogenotype('100')
+        variants = {'child': {'1_100000_A_G': testvar},
+                    'mum': {}, 'dad': {}}
+        preinheritancefilter = PreInheritanceFiltering(variants)
+        variants_per_gene = preinheritancefilter.preinheritance_filter()
+        self.assertEqual(variants_per_gene, {})
+
+        self.vardata['dnm'] = True
+        testvar = create_test_snv(self.vardata)
+        testvar.set_triogenotype('100')
+        variants = {'child': {'1_100000_A_G': testvar},
+                    'mum': {}, 'dad': {}}
+        preinheritancefilter = PreInheritanceFiltering(variants)
+        variants_per_gene = preinheritancefilter.preinheritance_filter()
+        self.assertEqual(variants_per_gene, {'123': {'1_100000_A_G': {
+            'child': variants['child']['1_100000_A_G']}}})
+
+    def test_X_maf_filter(self):
+        # X variants fail if seen in unaffected DDD fathers, and genes are
+        # listed in the order of their first passing variant
+        self.vardataX['hgnc_id'] = '456'
+        xvar = create_test_snv(self.vardataX)
+        self.vardataX['pos'] = '200000'
+        self.vardataX['ddd_father_af'] = '0'
+        xvar2 = create_test_snv(self.vardataX)
+        autosomal = create_test_snv(self.vardata)
+        variants = {'child': {'X_100000_A_G': xvar,
+                              '1_100000_A_G': autosomal,
+                              'X_200000_A_G': xvar2},
+                    'mum': {}, 'dad': {'X_200000_A_G': xvar2}}
+        preinheritancefilter = PreInheritanceFiltering(variants)
+        variants_per_gene = preinheritancefilter.preinheritance_filter()
+        self.assertEqual(variants_per_gene, {
+            '456': {'X_200000_A_G': {'child': xvar2, 'dad': xvar2}},
+            '123': {'1_100000_A_G': {'child': autosomal}}})
+        self.assertEqual(list(variants_per_gene.keys()), ['123', '456'])
+
+    def test_record_filter(self):
+        # records are rejected as they are read when the variant made from
+        # them would fail the child's pre-inheritance filters
+        def record(chrom='1', alt='G', **values):
+            fields = {'Consequence': 'missense_variant', 'HGNC_ID': '123',
+                      'MAX_AF': '0', 'DDD_AF': '0', 'REVEL': '0.8',
+                      'GT': '0/1', 'GQ': '50'}
+            fields.update(values)
+            return [chrom, '100', 'A', alt] + \
+                [fields.get(f, '.') for f in INFO_FIELDS + FORMAT_FIELDS]
+
+        records = [record(), record(GQ='30'), record(chrom='X', GQ='30'),
+                   record(DDD_AF='0.01'),
+                   record(Consequence='synonymous_variant'),
+                   record(Consequence='synonymous_variant&missense_variant'),
+                   record(REVEL='0.2'), record(REVEL='0.2', pp_DNG='0.9'),
+                   record(chrom='chrX', MAX_AF='0.001'),
+                   record(chrom='X', DDD_father_AF='0.01'),
+                   record(chrom='X'), record(REVEL='0.1,0.2'),
+                   record(GQ='high')]
+        recordfilter = RecordFilter(INFO_FIELDS, FORMAT_FIELDS)
+        for r in records:
+            childvars = {}
+            add_variant(childvars, r, 'XY')
+            for var in childvars.values():
+                var.set_triogenotype('110')
+            variants = {'child': childvars, 'mum': {}, 'dad': {}}
+            passes = len(PreInheritanceFiltering(
+                variants).preinheritance_filter()) > 0
+            self.assertEqual(recordfilter.keep_site(r) and
+                             recordfilter.keep_sample(r), passes, r)
+
+        # CNVs are filtered separately
+        cnv = record(alt='<DEL>', Consequence='intron_variant', GQ='10')
+        self.assertTrue(recordfilter.keep_site(cnv))
+        self.assertTrue(recordfilter.keep_sample(cnv))
+
 
 if __name__ == '__main__':
     unittest.main()
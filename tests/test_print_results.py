@@ -0,0 +1,128 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+import tempfile
+import json
+import os
+
+from tests.test_utils import create_test_person
+from tests.test_utils import create_test_family
+from tests.test_utils import create_test_snv
+from filtering.inheritance_report import InheritanceReport
+from output.print_results import identify_close_vars, identify_mnvs, \
+    ResultsWriter
+
+
+class TestPrintResults(unittest.TestCase):
+
+    def setUp(self):
+        self.phasedvars = {
+            '1': {'1_100_A_G': {'position': '100', 'protein_position': '10'},
+                  '1_100_A_T': {'position': '100', 'protein_position': '10'},
+                  '1_102_C_G': {'position': '102', 'protein_position': '10'},
+                  '1_200_C_G': {'position': '200', 'protein_position': '44'},
+                  '1_214_C_G': {'position': '214', 'protein_position': '49'}},
+            '2': {'1_103_C_T': {'position': '103', 'protein_position': '10'}},
+            '3': {'1_300_A_G': {'position': '300', 'protein_position': '70'},
+                  '1_300_A_C': {'position': '300', 'protein_position': '70'}}}
+
+    def test_close_vars(self):
+        # variants at other positions in the same phase set within the
+        # distance, variants at the same position don't count
+        self.assertEqual(
+            set(identify_close_vars(self.phasedvars, 15).keys()),
+            {'1_100_A_G', '1_100_A_T', '1_102_C_G', '1_200_C_G', '1_214_C_G'})
+        self.assertEqual(
+            set(identify_close_vars(self.phasedvars, 2).keys()),
+            {'1_100_A_G', '1_100_A_T', '1_102_C_G'})
+
+    def test_mnvs(self):
+        # variants at different positions in the same phase set and codon
+        self.assertEqual(set(identify_mnvs(self.phasedvars).keys()),
+                         {'1_100_A_G', '1_100_A_T', '1_102_C_G'})
+
+    def test_results_writer(self):
+        # each family is written as soon as it is given, the jsonl report
+        # has a line per family
+        families = {}
+        filtered = {}
+        for famid in ['fam1_child1', 'fam2_child2']:
+            child = create_test_person(famid.split('_')[0],
+                                       famid.split('_')[1], '0', '0', 'XX',
+                                       '2', '/vcf/path')
+            families[famid] = create_test_family(child, None, None)
+            var = create_test_snv({'chrom': '1', 'pos': '100', 'ref': 'A',
+                                   'alt': 'G', 'hgnc_id': '123',
+                                   'consequence': 'stop_gained', 'gt': '0/1',
+                                   'gq': '50'})
+            var.set_triogenotype('1NANA')
+            filtered[famid] = {'single_variants': {'1_100_A_G': {
+                'variant': var, 'mode': {'Monoallelic'}, 'hgncid': '123'}},
+                'compound_hets': {}}
+
+        with tempfile.TemporaryDirectory() as outdir:
+            outfile = os.path.join(outdir, 'clinical_filter.txt')
+            reportfile = os.path.join(
+                outdir, 'clinical_filter_inheritance_report.txt')
+            with ResultsWriter(families, outdir, 'jsonl') as writer:
+                writer.write_family('fam1_child1', filtered['fam1_child1'],
+                                    InheritanceReport())
+                with open(outfile) as f:
+                    lines = f.readlines()
+                self.assertEqual(len(lines), 2)
+                fields = lines[1].rstrip("\n").split("\t")
+                self.assertEqual(fields[:3], ['fam1', 'child1', 'XX'])
+                self.assertEqual(fields[-5:], ['single_variant', 'Monoallelic',
+                                               'False', 'False', 'False'])
+                with open(reportfile) as f:
+                    self.assertEqual(list(json.loads(f.readline()).keys()),
+                                     ['fam1_child1'])
+                writer.write_family('fam2_child2', filtered['fam2_child2'],
+                                    InheritanceReport())
+
+            with open(outfile) as f:
+                self.assertEqual(len(f.readlines()), 3)
+            with open(reportfile) as f:
+                self.assertEqual([list(json.loads(l).keys())[0] for l in f],
+                                 ['fam1_child1', 'fam2_child2'])
+
+            # the json report is only written if every family was filtered
+            with ResultsWriter(families, outdir, 'json') as writer:
+                writer.write_family('fam1_child1', filtered['fam1_child1'],
+                                    InheritanceReport())
+            with open(reportfile) as f:
+                self.assertEqual(list(json.load(f).keys()), ['fam1_child1'])
+            with self.assertLogs(level='ERROR'), \
+                    self.assertRaises(RuntimeError):
+                with ResultsWriter(families, outdir, 'json') as writer:
+                    writer.write_family('fam1_child1',
+                                        filtered['fam1_child1'],
+                                        InheritanceReport())
+                    raise RuntimeError("filtering failed")
+            with open(reportfile) as f:
+                self.assertEqual(f.read(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import gzip
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+from file_loading.tabix import BgzfReader, TabixIndex, reg2bins, \
+    merge_chunks, find_index
+from file_loading.vcf_reader import VcfReader
+from file_loading.regions import Regions
+
+
+def bgzf_block(data):
+    """
+    compress data as a single BGZF block
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    header = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' + \
+             struct.pack('<H', 18 + len(cdata) + 8 - 1)
+    return header + cdata + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+def reg2bin(beg, end):
+    """
+    smallest tabix bin containing beg-end (0-based, end exclusive)
+    """
+    end -= 1
+    for shift, offset in ((14, 4681), (17, 585), (20, 73), (23, 9), (26, 1)):
+        if beg >> shift == end >> shift:
+            return offset + (beg >> shift)
+    return 0
+
+
+class TestTabix(unittest.TestCase):
+    """write small bgzipped VCFs with tabix indexes and read regions"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'test.vcf.gz')
+        self.write_vcf('')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_vcf(self, prefix):
+        """
+        write the records and their index, with prefix added to the
+        chromosome names
+        """
+        header = "##fileformat=VCFv4.2\n" + \
+            '##INFO=<ID=END,Number=1,Type=Integer,Description="END">' + "\n" + \
+            '##FORMAT=<ID=GT,Number=1,Type=String,Description="GT">' + "\n" + \
+            '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\ts1\n'
+        self.records = [
+            (prefix + '1', 100, 100, 'A', 'G', '.'),
+            (prefix + '1', 200, 200, 'A', 'G', '.'),
+            (prefix + '1', 20000, 20000, 'A', 'G', '.'),
+            (prefix + '2', 1000, 3000000, 'T', '<DEL>', 'END=3000000'),
+            (prefix + '2', 4000000, 4000000, 'C', 'T', '.')]
+        # one block for the header, then a block per record except that the
+        # third record is split across two blocks
+        blocks = [header.encode()]
+        for chrom, pos, end, ref, alt, info in self.records:
+            blocks.append(("\t").join([chrom, str(pos), '.', ref, alt, '.',
+                                       '.', info, 'GT', '0/1']).encode() +
+                          b"\n")
+        blocks[3:4] = [blocks[3][:10], blocks[3][10:]]
+        offset = 0
+        self.block_offsets = []
+        with open(self.path, 'wb') as f:
+            for b in blocks:
+                self.block_offsets.append(offset)
+                block = bgzf_block(b)
+                f.write(block)
+                offset += len(block)
+            f.write(bgzf_block(b''))
+        # virtual offsets of the start of each record and the end of the last
+        starts = [self.block_offsets[i] << 16 for i in (1, 2, 3, 5, 6)] + \
+                 [offset << 16]
+        self.write_tbi(starts, [prefix + '1', prefix + '2'])
+
+    def write_tbi(self, starts, names):
+        refs = {name: {} for name in names}
+        for i, (chrom, pos, end, ref, alt, info) in enumerate(self.records):
+            binno = reg2bin(pos - 1, end)
+            refs[chrom].setdefault(binno, []).append((starts[i],
+                                                      starts[i + 1]))
+        names_data = b''.join(n.encode() + b'\x00' for n in names)
+        data = b'TBI\x01' + struct.pack('<i', len(names)) + \
+            struct.pack('<iiiiii', 2, 1, 2, 0, ord('#'), 0) + \
+            struct.pack('<i', len(names_data)) + names_data
+        for name in names:
+            data += struct.pack('<i', len(refs[name]))
+            for binno, chunks in refs[name].items():
+                data += struct.pack('<Ii', binno, len(chunks))
+                for chunk in chunks:
+                    data += struct.pack('<QQ', *chunk)
+            # no linear index, every chunk in the bins is checked
+            data += struct.pack('<i', 0)
+        with open(self.path + '.tbi', 'wb') as f:
+            f.write(gzip.compress(data))
+
+    def test_reg2bins(self):
+        self.assertEqual(reg2bins(0, 1, 14, 5), [0, 1, 9, 73, 585, 4681])
+        self.assertEqual(reg2bins(16383, 16385, 14, 5),
+                         [0, 1, 9, 73, 585, 4681, 4682])
+
+    def test_merge_chunks(self):
+        self.assertEqual(merge_chunks([(10, 20), (1, 5), (15, 30), (30, 40),
+                                       (50, 60)]),
+                         [(1, 5), (10, 40), (50, 60)])
+
+    def test_bgzf_lines(self):
+        '''lines can be read from a virtual offset, including lines split
+        across blocks'''
+        reader = BgzfReader(self.path)
+        lines = list(reader.lines(self.block_offsets[2] << 16,
+                                  self.block_offsets[5] << 16))
+        reader.close()
+        self.assertEqual([l.split("\t")[1] for l in lines], ['200', '20000'])
+
+    def test_read_index(self):
+        self.assertEqual(find_index(self.path), self.path + '.tbi')
+        index = TabixIndex.from_file(self.path + '.tbi')
+        self.assertEqual(index.names, ['1', '2'])
+        self.assertEqual(len(index.chunks('1', 150, 250)), 2)
+        self.assertEqual(index.chunks('3', 150, 250), [])
+
+    def test_indexed_query(self):
+        '''reading regions with the index gives the same records as reading
+        the whole file'''
+        regionlist = [[('1', 150, 250)], [('1', 1, 100000)],
+                      [('2', 2000000, 2000001)], [('2', 3500000, 5000000)],
+                      [('1', 200, 200), ('2', 1, 1)], [('3', 1, 1000)]]
+        for r in regionlist:
+            for large_span in (None, 1000000):
+                regions = Regions(large_span)
+                for chrom, start, end in r:
+                    regions.add(chrom, start, end)
+                with VcfReader(self.path) as reader:
+                    self.assertIsNotNone(reader.load_index())
+                    indexed = list(reader.query([], ['GT'], regions))
+                with VcfReader(self.path) as reader:
+                    unindexed = [rec for rec in reader.query([], ['GT'])
+                                 if regions.includes(rec[0], int(rec[1]),
+                                                     int(rec[1]))
+                                 or rec[3] == '<DEL>' and
+                                 regions.includes(rec[0], int(rec[1]),
+                                                  3000000)]
+                self.assertEqual(indexed, unindexed)
+
+        regions = Regions(1000000)
+        regions.add('1', 150, 250)
+        with VcfReader(self.path) as reader:
+            self.assertEqual([rec[:2] for rec in
+                              reader.query([], ['GT'], regions)],
+                             [['1', '200'], ['2', '1000']])
+
+    def test_chr_prefixed(self):
+        '''regions without a chr prefix find the records of a VCF whose
+        chromosomes have one'''
+        self.write_vcf('chr')
+        index = TabixIndex.from_file(self.path + '.tbi')
+        self.assertEqual(len(index.chunks('1', 150, 250)), 2)
+        regions = Regions()
+        regions.add('1', 150, 250)
+        regions.add('2', 3500000, 5000000)
+        with VcfReader(self.path) as reader:
+            self.assertEqual([rec[:2] for rec in
+                              reader.query([], ['GT'], regions)],
+                             [['chr1', '200'], ['chr2', '4000000']])
+
+
+if __name__ == '__main__':
+    unittest.main()
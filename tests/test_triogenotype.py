@@ -24,6 +24,7 @@ THE SOFTWARE.
 import unittest
 
 from tests.test_utils import create_test_snv
+from tests.test_utils import create_test_cnv
 from tests.test_utils import create_test_person
 from tests.test_utils import create_test_family
 
@@ -67,6 +68,7 @@ class TestTrioGenotypes(unittest.TestCase):
                          'nhomalt_XX': '379', 'nhomalt_XY': '4',
                          'ddd_father_af': '.'}
         self.homaltvar = create_test_snv(homaltvardata)
+        self.hetvar_data = hetvardata
         self.hetvar = create_test_snv(hetvardata)
         self.homrefvar = create_test_snv(homrefvardata)
 
@@ -87,13 +89,11 @@ class TestTrioGenotypes(unittest.TestCase):
             for mumv_g in geno_to_var.keys():
                 for dadv_g in geno_to_var.keys():
                     childv = geno_to_var[childv_g]
-                    mumv = geno_to_var[mumv_g]
-                    dadv = geno_to_var[dadv_g]
                     triostring = childv_g + mumv_g + dadv_g
                     self.childvar = childv
                     variants = {'child': {'1_100000_A_G': self.childvar},
-                                'mum': {'1_100000_A_G': mumv},
-                                'dad': {'1_100000_A_G': dadv}}
+                                'mum': {'1_100000_A_G': mumv_g},
+                                'dad': {'1_100000_A_G': dadv_g}}
                     add_trio_genotypes(family, variants)
                     self.assertEqual(self.childvar.triogenotype, triostring)
 
@@ -106,11 +106,10 @@ class TestTrioGenotypes(unittest.TestCase):
         for childv_g in ['1', '2']:
             for dadv_g in geno_to_var.keys():
                 childv = geno_to_var[childv_g]
-                dadv = geno_to_var[dadv_g]
                 triostring = childv_g + "NA" + dadv_g
                 self.childvar = childv
                 variants = {'child': {'1_100000_A_G': self.childvar},
-                            'mum': {}, 'dad': {'1_100000_A_G': dadv}}
+                            'mum': {}, 'dad': {'1_100000_A_G': dadv_g}}
                 add_trio_genotypes(family, variants)
                 self.assertEqual(self.childvar.triogenotype, triostring)
 
@@ -123,11 +122,10 @@ class TestTrioGenotypes(unittest.TestCase):
         for childv_g in ['1', '2']:
             for mumv_g in geno_to_var.keys():
                 childv = geno_to_var[childv_g]
-                mumv = geno_to_var[mumv_g]
                 triostring = childv_g + mumv_g + "NA"
                 self.childvar = childv
                 variants = {'child': {'1_100000_A_G': self.childvar},
-                            'mum': {'1_100000_A_G': mumv}, 'dad': {}}
+                            'mum': {'1_100000_A_G': mumv_g}, 'dad': {}}
                 add_trio_genotypes(family, variants)
                 self.assertEqual(self.childvar.triogenotype, triostring)
 
@@ -145,6 +143,62 @@ class TestTrioGenotypes(unittest.TestCase):
             add_trio_genotypes(family, variants)
             self.assertEqual(self.childvar.triogenotype, triostring)
 
+    def test_triogenotype_cnv(self):
+        # CNV trio genotypes come from CIFER inheritance if both parents are
+        # present, the parents' genotypes are read from the trio genotype
+        cnvdata = {'chrom': '1', 'pos': '100000', 'ref': 'T', 'alt': '<DEL>',
+                   'consequence': 'transcript_ablation', 'hgnc_id': '123',
+                   'cnv_end': '200000', 'cn': '1'}
+        expected = {'not_inherited': ('DELREFREF', '0', '0'),
+                    'maternal_inh': ('DELDELREF', '1', '0'),
+                    'paternal_inh': ('DELREFDEL', '0', '1'),
+                    'biparental_inh': ('DELDELDEL', '1', '1'),
+                    'unknown': ('DELNANA', '1', '1')}
+        family = create_test_family(self.child, self.mum, self.dad)
+        for inh, (triostring, mumgeno, dadgeno) in expected.items():
+            cnvdata['cnv_inh'] = inh
+            cnv = create_test_cnv(cnvdata)
+            variants = {'child': {'1_100000_T_<DEL>': cnv}, 'mum': {},
+                        'dad': {}}
+            add_trio_genotypes(family, variants)
+            self.assertEqual(cnv.triogenotype, triostring)
+            self.assertEqual(cnv.get_mum_genotype(), mumgeno)
+            self.assertEqual(cnv.get_dad_genotype(), dadgeno)
+
+        cnvdata['cnv_inh'] = 'maternal_inh'
+        cnv = create_test_cnv(cnvdata)
+        family = create_test_family(self.child, self.mum, None)
+        add_trio_genotypes(family, {'child': {'1_100000_T_<DEL>': cnv},
+                                    'mum': {}, 'dad': {}})
+        self.assertEqual(cnv.triogenotype, 'DELNANA')
+
+    def test_shared_triogenotypes(self):
+        # variants with the same trio genotype share one string
+        family = create_test_family(self.child, self.mum, self.dad)
+        hetvar2 = create_test_snv(self.hetvar_data)
+        variants = {'child': {'1_100000_A_G': self.hetvar,
+                              '1_100001_A_G': hetvar2},
+                    'mum': {'1_100000_A_G': '1', '1_100001_A_G': '1'},
+                    'dad': {}}
+        add_trio_genotypes(family, variants)
+        self.assertEqual(self.hetvar.triogenotype, '110')
+        self.assertIs(self.hetvar.triogenotype, hetvar2.triogenotype)
+
+    def test_unrecognised_variant(self):
+        # a variant which is neither an SNV nor a CNV is an error
+        class OtherVariant(object):
+            def is_snv(self):
+                return False
+
+            def is_cnv(self):
+                return False
+
+        family = create_test_family(self.child, self.mum, self.dad)
+        variants = {'child': {'1_100000_A_G': OtherVariant()}, 'mum': {},
+                    'dad': {}}
+        with self.assertLogs(level='ERROR'), \
+                self.assertRaises(ValueError):
+            add_trio_genotypes(family, variants)
 
 if __name__ == '__main__':
     unittest.main()
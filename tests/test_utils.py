@@ -23,11 +23,14 @@ THE SOFTWARE.
 
 # methods to create person, family and variant objects to use in tests
 
-from variants.snv import SNV
+from itertools import combinations
+
+from variants.snv import SNV, genotype_code
 from variants.cnv import CNV
 from family.families import Person
 from family.families import Family
 from variants.trio_genotype import add_trio_genotypes
+from filtering.compound_hets import CompoundHetScreen
 
 def create_test_person(family_id, person_id, dad_id, mum_id, sex, affected, path):
     person = Person(family_id, person_id, dad_id, mum_id, sex, affected, path)
@@ -78,16 +81,15 @@ def create_test_variants_per_gene(variants, family):
         variant = SNV
         var = variant(variants['child'][vid])
         familyvariants['child'][vid] = var
+    # parents' variants are loaded as their genotype codes
     if 'mum' in variants.keys():
         for vid in variants['mum'].keys():
-            variant = SNV
-            var = variant(variants['mum'][vid])
-            familyvariants['mum'][vid] = var
+            familyvariants['mum'][vid] = genotype_code(
+                variants['mum'][vid]['gt'])
     if 'dad' in variants.keys():
         for vid in variants['dad'].keys():
-            variant = SNV
-            var = variant(variants['dad'][vid])
-            familyvariants['dad'][vid] = var
+            familyvariants['dad'][vid] = genotype_code(
+                variants['dad'][vid]['gt'])
     add_trio_genotypes(family, familyvariants)
 
     for vid in familyvariants['child'].keys():
@@ -105,5 +107,21 @@ def create_test_variants_per_gene(variants, family):
 
     return(variants_per_gene)
 
-
-
+def screen_each_pair(candidates, family):
+    """
+    screen every pair of candidates in each gene in turn, the result the
+    pairing should match
+    """
+    screen = CompoundHetScreen(None, family)
+    passes = {}
+    for gn in candidates.keys():
+        for v1, v2 in combinations(candidates[gn].keys(), 2):
+            if screen.is_compound_pair(v1, candidates[gn][v1]['variant'],
+                                       v2, candidates[gn][v2]['variant']):
+                passes.setdefault(gn, {})
+                for v in (v1, v2):
+                    if v not in passes[gn]:
+                        passes[gn][v] = {
+                            'variant': candidates[gn][v]['variant'],
+                            'mode': candidates[gn][v]['mode']}
+    return passes
@@ -0,0 +1,139 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import unittest
+
+from tests.test_utils import create_test_snv
+from tests.test_utils import create_test_cnv
+from variants.consequences import FUNCTIONAL, MISSENSE, \
+    MISSENSE_EQUIVALENT, SO_TERM_BITS
+from variants.variant import variant_id, split_variant_id
+
+
+class TestVariant(unittest.TestCase):
+
+    def setUp(self):
+        self.vardata = {'chrom': 'chr1', 'pos': '100000', 'ref': 'A',
+                        'alt': 'G', 'consequence': 'missense_variant',
+                        'symbol': 'KMTD2', 'hgnc_id': 'HGNC:123',
+                        'max_af': '0.0001', 'ddd_af': '.', 'revel': '0.5',
+                        'gt': '0/1', 'gq': '50', 'ac_XX': '6', 'ac_XY': '3',
+                        'nhomalt_XX': '1', 'nhomalt_XY': '.'}
+
+    def test_numeric_fields(self):
+        # numeric fields are converted once, missing values are None
+        var = create_test_snv(self.vardata)
+        self.assertEqual(var.chrom, '1')
+        self.assertEqual(var.hgnc_id, '123')
+        self.assertEqual(var.max_af, 0.0001)
+        self.assertEqual(var.revel, 0.5)
+        self.assertEqual(var.gq, 50)
+        self.assertIsNone(var.ddd_af)
+        self.assertIsNone(var.cn)
+        self.assertEqual(var.AC_het, 7)
+        self.assertEqual(var.AC_hemi, 0)
+        # fields which are not given are missing
+        self.assertEqual(var.polyphen, '.')
+        self.assertEqual(var.dnm, False)
+
+    def test_hemizygous_allele_count(self):
+        self.vardata['chrom'] = 'X'
+        self.vardata['nhomalt_XY'] = '2'
+        var = create_test_snv(self.vardata)
+        self.assertEqual(var.AC_het, 0)
+        self.assertEqual(var.AC_hemi, 2)
+
+    def test_cnv_numeric_fields(self):
+        self.vardata.update({'alt': '<DEL>', 'gt': '.', 'cn': '1',
+                             'cnv_end': '200000', 'cnv_length': '100000'})
+        var = create_test_cnv(self.vardata)
+        self.assertEqual(var.cn, 1)
+        self.assertEqual(var.cnv_end, 200000)
+        self.assertEqual(var.cnv_length, 100000)
+
+    def test_malformed_value(self):
+        # malformed and multi-valued fields are logged and treated as missing
+        self.vardata['gq'] = 'high'
+        self.vardata['revel'] = '0.1,0.2'
+        with self.assertLogs(level='WARNING'):
+            var = create_test_snv(self.vardata)
+        self.assertIsNone(var.gq)
+        self.assertIsNone(var.revel)
+        self.assertEqual(var.numeric_text('revel'), '0.1,0.2')
+
+    def test_numeric_text(self):
+        # numeric fields are output as they were written in the VCF
+        self.vardata['max_af'] = '0.00001'
+        self.vardata['revel'] = '0.500'
+        var = create_test_snv(self.vardata)
+        self.assertEqual(var.max_af, 0.00001)
+        self.assertEqual(var.numeric_text('max_af'), '0.00001')
+        self.assertEqual(var.numeric_text('revel'), '0.500')
+        self.assertEqual(var.numeric_text('ddd_af'), '.')
+        self.assertEqual(var.numeric_text('cn'), '.')
+        self.assertEqual(var.numeric_text('gq'), '50')
+        # only text which can't be rebuilt from the value is kept
+        self.assertEqual(var.text, ('max_af', '0.00001', 'revel', '0.500'))
+        self.assertIsNone(create_test_snv(dict(
+            self.vardata, max_af='0.0001', revel='0.5')).text)
+
+    def test_consequence_mask(self):
+        # each consequence term sets its own bit, unknown terms set none
+        self.vardata['consequence'] = 'splice_region_variant&missense_variant'
+        var = create_test_snv(self.vardata)
+        self.assertEqual(var.consequence_mask,
+                         SO_TERM_BITS['splice_region_variant'] | MISSENSE)
+        self.assertTrue(var.consequence_mask & FUNCTIONAL)
+
+        self.vardata['consequence'] = 'inframe_deletion&not_a_term'
+        var = create_test_snv(self.vardata)
+        self.assertEqual(var.consequence_mask,
+                         SO_TERM_BITS['inframe_deletion'])
+        self.assertTrue(var.consequence_mask & MISSENSE_EQUIVALENT)
+        self.assertFalse(var.consequence_mask & MISSENSE)
+
+        self.vardata['consequence'] = 'synonymous_variant'
+        var = create_test_snv(self.vardata)
+        self.assertFalse(var.consequence_mask & FUNCTIONAL)
+
+    def test_hash(self):
+        # variants which are equal have the same hash so can be used in sets
+        var = create_test_snv(self.vardata)
+        self.vardata['gt'] = '1/1'
+        same = create_test_snv(self.vardata)
+        self.vardata['alt'] = 'T'
+        other = create_test_snv(self.vardata)
+        self.assertEqual(var, same)
+        self.assertEqual(hash(var), hash(same))
+        self.assertEqual(len({var, same, other}), 2)
+
+    def test_variant_id(self):
+        # ids keep the VCF's chromosome name and are shared between variants
+        varid = variant_id('chr1', '100000', 'A', 'G')
+        self.assertEqual(varid, 'chr1_100000_A_G')
+        self.assertIs(varid, variant_id('chr1', '100000', 'A', 'G'))
+        self.assertEqual(split_variant_id('chrUn_KI270742v1_100_A_G'),
+                         ['chrUn_KI270742v1', '100', 'A', 'G'])
+
+if __name__ == '__main__':
+    unittest.main()
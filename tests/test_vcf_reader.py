@@ -0,0 +1,198 @@
+"""
+Copyright (c) 2021 Genome Research Limited
+Author: Ruth Eberhardt <re3@sanger.ac.uk>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import gzip
+import io
+import unittest
+import tempfile
+
+from file_loading.vcf_reader import VcfReader, split_gt, is_ref, \
+    sample_column
+from file_loading.regions import Regions
+
+
+class TestVcfReader(unittest.TestCase):
+    """make temporary VCFs and test the native reader"""
+
+    def setUp(self):
+        self.maxDiff = None
+        self.vcfheader = "##fileformat=VCFv4.2\n" + \
+            '##INFO=<ID=MAX_AF,Number=A,Type=Float,Description="MAX_AF">' + "\n" + \
+            '##INFO=<ID=SYMBOL,Number=.,Type=String,Description="SYMBOL">' + "\n" + \
+            '##INFO=<ID=END,Number=1,Type=Integer,Description="END">' + "\n" + \
+            '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">' + "\n" + \
+            '##FORMAT=<ID=AD,Number=R,Type=Integer,Description="AD">' + "\n" + \
+            '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tsample1\n'
+        self.lines = [
+            ['1', '100', '.', 'A', 'G', '.', '.', 'MAX_AF=0.0001;SYMBOL=ABC',
+             'GT:AD', '0/1:10,5'],
+            ['1', '200', '.', 'A', 'G', '.', '.', 'MAX_AF=0.01;SYMBOL=ABC',
+             'GT:AD', '0/1:10,5'],
+            ['1', '300', '.', 'A', 'G,T', '.', '.',
+             'MAX_AF=0.0001,0.0002;SYMBOL=ABC', 'GT:AD', '1|2:0,5,6'],
+            ['1', '400', '.', 'A', 'G,T', '.', '.', 'MAX_AF=0.0001,0.1',
+             'GT:AD', '0/1:10,5,0'],
+            ['1', '500', '.', 'A', 'G', '.', '.', 'MAX_AF=0.0001', 'GT:AD',
+             '0/0:10,0'],
+            ['2', '1000', '.', 'T', '<DEL>', '.', '.', 'END=5000', 'GT', '0/1']]
+
+    def write_vcf(self, compress=False):
+        self.tempfile = tempfile.NamedTemporaryFile(suffix='.vcf.gz')
+        text = self.vcfheader + ("").join(
+            [("\t").join(l) + "\n" for l in self.lines])
+        if compress:
+            self.tempfile.write(gzip.compress(text.encode()))
+        else:
+            self.tempfile.write(text.encode())
+        self.tempfile.flush()
+        return self.tempfile.name
+
+    def test_query(self):
+        '''split multiallelics and exclude common and ref variants'''
+        path = self.write_vcf()
+        with VcfReader(path) as reader:
+            records = list(reader.query(['SYMBOL', 'MAX_AF', 'CSQ'],
+                                        ['GT', 'AD', 'GQ']))
+        self.assertEqual(records, [
+            ['1', '100', 'A', 'G', 'ABC', '0.0001', '.', '0/1', '10,5', '.'],
+            ['1', '300', 'A', 'G', 'ABC', '0.0001', '.', '1|0', '0,5', '.'],
+            ['1', '300', 'A', 'T', 'ABC', '0.0002', '.', '0|1', '0,6', '.'],
+            ['1', '400', 'A', 'G', '.', '0.0001', '.', '0/1', '10,5', '.'],
+            ['2', '1000', 'T', '<DEL>', '.', '.', '.', '0/1', '.', '.']])
+        # a single sample VCF is read whatever the sample is called
+        with VcfReader(path) as reader:
+            self.assertEqual(
+                sample_column(reader.samples, 'child', path), 0)
+
+    def test_query_gzipped(self):
+        '''gzipped VCFs give the same records as uncompressed VCFs'''
+        path = self.write_vcf()
+        with VcfReader(path) as reader:
+            plain = list(reader.query(['SYMBOL', 'MAX_AF'], ['GT']))
+        path = self.write_vcf(compress=True)
+        with VcfReader(path) as reader:
+            self.assertEqual(reader.samples, ['sample1'])
+            self.assertEqual(list(reader.query(['SYMBOL', 'MAX_AF'], ['GT'])),
+                             plain)
+
+    def test_query_regions(self):
+        '''only return records overlapping regions, including CNVs which
+        start before a region'''
+        regions = Regions()
+        regions.add('1', 300)
+        regions.add('2', 4000, 4500)
+        path = self.write_vcf()
+        with VcfReader(path) as reader:
+            records = list(reader.query(['SYMBOL'], ['GT'], regions))
+        self.assertEqual([r[:4] for r in records],
+                         [['1', '300', 'A', 'G'], ['1', '300', 'A', 'T'],
+                          ['2', '1000', 'T', '<DEL>']])
+
+    def test_query_samples(self):
+        '''read several samples in one pass, samples are found by name and
+        each only gets the records where its genotype isn't ref'''
+        self.vcfheader = self.vcfheader.replace('sample1\n',
+                                                'sample1\tdad\tmum\n')
+        self.lines = [
+            ['1', '100', '.', 'A', 'G', '.', '.', 'MAX_AF=0.0001', 'GT:AD',
+             '0/1:10,5', '0/0:10,0', '1/1:0,10'],
+            ['1', '300', '.', 'A', 'G,T', '.', '.', 'MAX_AF=0.0001,0.1',
+             'GT:AD', '1|2:0,5,6', '0/2:5,0,5', '0/1:5,5,0']]
+        path = self.write_vcf()
+        with VcfReader(path) as reader:
+            columns = [sample_column(reader.samples, 'mum', path),
+                       sample_column(reader.samples, 'dad', path)]
+            self.assertEqual(columns, [2, 1])
+            with self.assertRaises(ValueError):
+                sample_column(reader.samples, 'child', path)
+            records = list(reader.query_samples(['MAX_AF'], ['GT', 'AD'],
+                                                None, columns))
+        self.assertEqual(records, [
+            (0, ['1', '100', 'A', 'G', '0.0001', '1/1', '0,10']),
+            (0, ['1', '300', 'A', 'G', '0.0001', '0/1', '5,5'])])
+
+    def test_query_trios(self):
+        '''read several trios in one pass, parents are only returned for
+        the alleles their child has'''
+        self.vcfheader = self.vcfheader.replace(
+            'sample1\n', 'child1\tmum1\tdad1\tchild2\tmum2\n')
+        self.lines = [
+            ['1', '100', '.', 'A', 'G', '.', '.', 'MAX_AF=0.0001', 'GT:AD',
+             '0/1:10,5', '0/1:10,5', '0/0:10,0', '0/0:10,0', '0/1:10,5'],
+            ['1', '300', '.', 'A', 'G,T', '.', '.', 'MAX_AF=0.0001,0.0001',
+             'GT:AD', '0/2:5,0,5', '0/1:5,5,0', '0/2:5,0,5', '1/1:0,5,0',
+             '1/2:0,5,5']]
+        path = self.write_vcf()
+        with VcfReader(path) as reader:
+            records = list(reader.query_trios(['MAX_AF'], ['GT'], None,
+                                              [(0, 1, 2), (3, 4, None)]))
+        self.assertEqual(records, [
+            (0, 0, ['1', '100', 'A', 'G', '0.0001', '0/1']),
+            (0, 1, ['1', '100', 'A', 'G', '0.0001', '0/1']),
+            (1, 0, ['1', '300', 'A', 'G', '0.0001', '1/1']),
+            (1, 1, ['1', '300', 'A', 'G', '0.0001', '1/0']),
+            (0, 0, ['1', '300', 'A', 'T', '0.0001', '0/1']),
+            (0, 2, ['1', '300', 'A', 'T', '0.0001', '0/1'])])
+
+    def test_regions(self):
+        '''regions are merged, including adjacent positions, and written in
+        natural chromosome order'''
+        regions = Regions()
+        for chrom, pos in [('10', 5), ('2', 8), ('X', 1), ('2', 7), ('2', 20),
+                           ('1', 4)]:
+            regions.add(chrom, pos)
+        regions.add('2', 9, 12)
+        self.assertEqual(regions.chroms(), ['1', '2', '10', 'X'])
+        self.assertEqual(len(regions), 5)
+        self.assertTrue(regions.overlaps('2', 10, 10))
+        self.assertFalse(regions.overlaps('2', 13, 19))
+        out = io.StringIO()
+        regions.write(out)
+        self.assertEqual(out.getvalue(), "1\t4\t4\n2\t7\t12\n2\t20\t20\n"
+                                         "10\t5\t5\nX\t1\t1\n")
+
+        # chromosomes match with or without a chr prefix
+        regions = Regions()
+        regions.add('chr2', 7, 12)
+        self.assertEqual(regions.chroms(), ['2'])
+        self.assertTrue(regions.overlaps('2', 10, 10))
+        self.assertTrue(regions.overlaps('chr2', 10, 10))
+        out = io.StringIO()
+        regions.write(out, prefixed=True)
+        self.assertEqual(out.getvalue(), "2\t7\t12\nchr2\t7\t12\n")
+
+    def test_split_gt(self):
+        self.assertEqual(split_gt('1/2', 1), '1/0')
+        self.assertEqual(split_gt('1/2', 2), '0/1')
+        self.assertEqual(split_gt('0|12', 12), '0|1')
+        self.assertEqual(split_gt('./2', 1), './0')
+
+    def test_is_ref(self):
+        self.assertTrue(is_ref('0/0'))
+        self.assertTrue(is_ref('0'))
+        self.assertFalse(is_ref('./.'))
+        self.assertFalse(is_ref('0|1'))
+
+
+if __name__ == '__main__':
+    unittest.main()